@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+
+import data_collection
+from data_collection import collect_and_store_data, build_device_ids, create_database, BatchWriter
+
+SIMULATOR_PORT = 8080
+DEFAULT_SCALES = "200,2000,20000"
+FLEET_RATIO = {"cctv_logs": 200, "access_control_logs": 50, "intercom_logs": 20}  # production camera:door:intercom mix
+
+
+# Split a total device count across families in the production ratio
+def split_fleet(total_devices):
+    ratio_total = sum(FLEET_RATIO.values())
+    counts = {table: total_devices * share // ratio_total for table, share in FLEET_RATIO.items()}
+    counts["cctv_logs"] += total_devices - sum(counts.values())
+    return counts
+
+
+# Writer stand-in that counts rows instead of writing them, to measure the collector on its own
+class DiscardWriter:
+    def __init__(self):
+        self.rows = 0
+
+    def start(self):
+        pass
+
+    async def submit(self, collected):
+        self.rows += sum(len(rows) for rows in collected.values())
+
+    async def close(self):
+        pass
+
+
+# Child mode: run the real collector loop for a fixed number of cycles at one fleet size
+def run_scale(total_devices, cycles, with_db):
+    data_collection.DATA_COLLECTION_INTERVAL = 0  # back-to-back cycles
+    counts = split_fleet(total_devices)
+    if with_db:
+        create_database()
+    writer = BatchWriter() if with_db else DiscardWriter()
+
+    start = time.perf_counter()
+    cycle_stats = asyncio.run(collect_and_store_data(build_device_ids(counts), writer, cycles))
+    elapsed = time.perf_counter() - start
+
+    cycle_seconds = [stat["seconds"] for stat in cycle_stats]
+    rows = sum(stat["queued"] for stat in cycle_stats)
+    return {
+        "devices": total_devices,
+        "cycles": len(cycle_stats),
+        "mean_cycle_s": sum(cycle_seconds) / max(len(cycle_seconds), 1),
+        "max_cycle_s": max(cycle_seconds, default=0),
+        "requests_per_s": total_devices * len(cycle_stats) / elapsed,
+        "rows_per_s": rows / elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+# Start device_simulator.py sized for the largest scale and wait until it answers
+def start_simulator(max_devices, args):
+    counts = split_fleet(max_devices)
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "device_simulator.py"), "--port", str(args.port),
+               "--cameras", str(counts["cctv_logs"]), "--doors", str(counts["access_control_logs"]),
+               "--intercoms", str(counts["intercom_logs"]),
+               "--latency-distribution", args.latency_distribution, "--latency-mean-ms", str(args.latency_mean_ms),
+               "--error-rate", str(args.error_rate), "--offline-ratio", str(args.offline_ratio)]
+    simulator = subprocess.Popen(command)
+    for _ in range(50):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{args.port}/stats", timeout=1)
+            return simulator
+        except OSError:
+            time.sleep(0.2)
+    simulator.terminate()
+    raise RuntimeError("Device simulator did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collector throughput benchmark against the local device simulator")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated total device counts")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--with-db", action="store_true", help="write rows to PostgreSQL instead of discarding them")
+    parser.add_argument("--port", type=int, default=SIMULATOR_PORT)
+    parser.add_argument("--latency-distribution", default="lognormal")
+    parser.add_argument("--latency-mean-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--offline-ratio", type=float, default=0.05)
+    parser.add_argument("--run-scale", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scale:
+        print(json.dumps(run_scale(args.run_scale, args.cycles, args.with_db)))
+        return
+
+    scales = [int(scale) for scale in args.scales.split(",")]
+    simulator = start_simulator(max(scales), args)
+    env = dict(os.environ, DEVICE_API_URL=f"http://127.0.0.1:{args.port}")
+    results = []
+    try:
+        # One process per scale so peak RSS is measured per fleet size
+        for scale in scales:
+            command = [sys.executable, __file__, "--run-scale", str(scale), "--cycles", str(args.cycles)]
+            if args.with_db:
+                command.append("--with-db")
+            output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        simulator.terminate()
+        simulator.wait()
+
+    print(f"{'devices':>8}{'mean cycle s':>14}{'max cycle s':>13}{'requests/s':>12}{'rows/s':>10}{'peak RSS MB':>13}")
+    for result in results:
+        print(f"{result['devices']:>8}{result['mean_cycle_s']:>14.2f}{result['max_cycle_s']:>13.2f}"
+              f"{result['requests_per_s']:>12,.0f}{result['rows_per_s']:>10,.0f}{result['peak_rss_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import feature_store
+
+# Logging configuration
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TRAINING_COLUMNS = ['motion_detected', 'is_online', 'hour_of_day', 'label_failure']
+
+
+# Synthetic processed CCTV frame shaped like data_preparation_for_ml.py output, spread over days
+def generate_frame(row_count, days):
+    rng = np.random.default_rng(42)
+    timestamps = pd.Timestamp(datetime(2024, 10, 1)) + pd.to_timedelta(
+        np.sort(rng.integers(0, days * 86400, row_count)), unit='s')
+    online = rng.random(row_count) > 0.05
+    return pd.DataFrame({
+        'timestamp': timestamps,
+        'camera_id': pd.Categorical([f"CAM_{i % 200 + 1:03}" for i in range(row_count)]),
+        'status': pd.Categorical(np.where(online, 'online', 'offline')),
+        'motion_detected': rng.integers(0, 2, row_count).astype('int8'),
+        'status_encoded': online.astype('int8'),
+        'hour_of_day': timestamps.hour.astype('int8'),
+        'is_online': online.astype('int8'),
+        'label_failure': (~online).astype('int8')
+    })
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the CSV outputs with the Parquet/Arrow feature store")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows in the synthetic CCTV dataset")
+    parser.add_argument("--days", type=int, default=30, help="days the rows are spread over")
+    args = parser.parse_args()
+
+    frame = generate_frame(args.rows, args.days)
+    workdir = tempfile.mkdtemp(prefix='feature-store-bench-')
+    try:
+        csv_path = os.path.join(workdir, 'processed_cctv_data.csv')
+        store = os.path.join(workdir, 'store')
+        last_day = frame['timestamp'].max().normalize()
+
+        results = [
+            ("csv write", *timed(lambda: frame.to_csv(csv_path, index=False))),
+            ("csv read (full)", *timed(lambda: pd.read_csv(csv_path, parse_dates=['timestamp']))),
+            ("csv read (4 columns)", *timed(lambda: pd.read_csv(csv_path, usecols=TRAINING_COLUMNS))),
+            ("parquet write", *timed(lambda: feature_store.write_frame(frame, 'cctv', store))),
+            ("parquet read (full)", *timed(lambda: feature_store.load_frame('cctv', root=store))),
+            ("parquet read (4 columns)", *timed(lambda: feature_store.load_frame('cctv', TRAINING_COLUMNS, root=store))),
+            ("parquet read (last day)", *timed(lambda: feature_store.load_frame('cctv', start=last_day, root=store))),
+            ("arrow export", *timed(lambda: feature_store.export_training_file('cctv', TRAINING_COLUMNS, store))),
+            ("arrow mmap load", *timed(lambda: feature_store.load_training_frame('cctv', root=store))),
+        ]
+        csv_size = directory_size(csv_path)
+        parquet_size = directory_size(store) - directory_size(feature_store.training_file('cctv', store))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'step':<28}{'seconds':>10}{'rows':>12}")
+    for name, seconds, result in results:
+        rows = len(result) if isinstance(result, pd.DataFrame) else args.rows
+        print(f"{name:<28}{seconds:>10.3f}{rows:>12,}")
+    print(f"\ncsv size:     {csv_size / 1e6:>8.1f} MB")
+    print(f"parquet size: {parquet_size / 1e6:>8.1f} MB ({feature_store.COMPRESSION})")
+
+
+if __name__ == "__main__":
+    main()
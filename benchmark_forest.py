@@ -0,0 +1,66 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from feature_pipeline import FEATURE_COLUMNS
+from forest_compiler import CompiledForest, COMPILED_MAX_PAIRS
+
+# Logging configuration
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BATCH_SIZES = [1, 100, 100000]
+
+
+# Synthetic scaled feature rows with a non-linear failure label, so the trees grow to realistic depths
+def generate_data(row_count, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(row_count, len(FEATURE_COLUMNS))).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(scale=0.5, size=row_count) > 0).astype(int)
+    return X, y
+
+
+# Mean seconds per call, repeating small batches so each measurement covers at least min_seconds
+def time_call(func, min_seconds=0.5):
+    calls, start = 0, time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sklearn RandomForest predictions with the compiled forest")
+    parser.add_argument("--trees", type=int, default=500, help="trees in the forest (the notebook searches up to 500)")
+    parser.add_argument("--depth", type=int, default=50, help="maximum tree depth (the notebook searches up to 50)")
+    parser.add_argument("--train-rows", type=int, default=20000, help="rows the forest is trained on")
+    args = parser.parse_args()
+
+    X_train, y_train = generate_data(args.train_rows, seed=0)
+    model = RandomForestClassifier(n_estimators=args.trees, max_depth=args.depth, n_jobs=1, random_state=42)
+    model.fit(X_train, y_train)
+    start = time.perf_counter()
+    forest = CompiledForest(model)
+    compile_seconds = time.perf_counter() - start
+    print(f"{args.trees} trees, {len(forest.threshold):,} nodes, compiled in {compile_seconds:.2f}s\n")
+
+    print(f"{'batch':>8}{'sklearn ms':>12}{'compiled ms':>13}{'speed-up':>10}{'sklearn rows/s':>16}{'compiled rows/s':>17}"
+          f"{'identical':>11}")
+    for batch_size in BATCH_SIZES:
+        X, _ = generate_data(batch_size, seed=batch_size)
+        identical = np.array_equal(model.predict_proba(X), forest.compiled_proba(X))
+        sklearn_seconds = time_call(lambda: model.predict(X))
+        compiled_seconds = time_call(lambda: forest.compiled_proba(X))
+        print(f"{batch_size:>8,}{sklearn_seconds * 1000:>12.2f}{compiled_seconds * 1000:>13.2f}"
+              f"{sklearn_seconds / compiled_seconds:>9.1f}x{batch_size / sklearn_seconds:>16,.0f}"
+              f"{batch_size / compiled_seconds:>17,.0f}{str(identical):>11}")
+    print(f"\nCompiledForest.predict walks the compiled arrays for batches up to {COMPILED_MAX_PAIRS // forest.n_trees} "
+          f"rows (COMPILED_MAX_PAIRS) and hands larger batches to sklearn")
+
+
+if __name__ == "__main__":
+    main()
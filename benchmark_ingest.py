@@ -0,0 +1,86 @@
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+from data_collection import get_db_connection, copy_insert, values_insert, TABLE_COLUMNS
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('IngestBenchmark')
+
+LEGACY_BATCH_SIZE = 50  # chunk size used by the original executemany path
+
+
+# Synthetic CCTV rows shaped like the collector output
+def generate_rows(row_count):
+    start = datetime.now()
+    return [
+        {
+            "timestamp": start + timedelta(milliseconds=i),
+            "camera_id": f"CAM_{i % 200 + 1:03}",
+            "status": "offline" if i % 17 == 0 else "online",
+            "motion_detected": i % 2
+        }
+        for i in range(row_count)
+    ]
+
+
+# Original write path: executemany in chunks of 50 rows
+def executemany_insert(cursor, table, data):
+    columns = TABLE_COLUMNS[table]
+    placeholders = ", ".join(["%s"] * len(columns))
+    for i in range(0, len(data), LEGACY_BATCH_SIZE):
+        cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                           [tuple(d[column] for column in columns) for d in data[i:i + LEGACY_BATCH_SIZE]])
+
+
+WRITE_PATHS = {
+    "executemany": executemany_insert,
+    "execute_values": values_insert,
+    "copy": copy_insert
+}
+
+
+# Time one write path, including the per-cycle commit
+def run_benchmark(conn, write_func, rows, repeat):
+    cursor = conn.cursor()
+    timings = []
+    for _ in range(repeat):
+        cursor.execute("TRUNCATE cctv_logs")
+        conn.commit()
+        start = time.perf_counter()
+        write_func(cursor, "cctv_logs", rows)
+        conn.commit()
+        timings.append(time.perf_counter() - start)
+    cursor.close()
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bulk-ingest paths against a local PostgreSQL instance")
+    parser.add_argument("--rows", type=int, default=20000, help="rows written per run")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per write path (best run is reported)")
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows)
+    conn = get_db_connection()
+    try:
+        # Session-local table shadows public.cctv_logs so the benchmark never touches real data
+        cursor = conn.cursor()
+        cursor.execute("CREATE TEMP TABLE cctv_logs (timestamp TIMESTAMP, camera_id TEXT, status TEXT, motion_detected INTEGER)")
+        conn.commit()
+        cursor.close()
+
+        results = {name: run_benchmark(conn, func, rows, args.repeat) for name, func in WRITE_PATHS.items()}
+    finally:
+        conn.close()
+
+    baseline = results["executemany"]
+    print(f"{'path':<16}{'seconds':>10}{'rows/sec':>14}{'speedup':>10}")
+    for name, seconds in results.items():
+        print(f"{name:<16}{seconds:>10.3f}{args.rows / seconds:>14,.0f}{baseline / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
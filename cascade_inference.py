@@ -0,0 +1,61 @@
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
+# Prediction mode (can be set via environment variables for Docker): 'forest', the default, is the existing
+# path of running the random forest and the logistic regression on every batch and keeping the one with the
+# higher mean prediction; 'cascade' scores every row with the logistic regression and sends only uncertain
+# rows to the random forest. The cascade is opt-in: enable it once evaluate_cascade.py shows parity on real data.
+PREDICTION_MODE = os.getenv('PREDICTION_MODE', 'forest')
+CASCADE_LOW = float(os.getenv('CASCADE_LOW', 0.1))  # LR failure probabilities in (low, high) go to the forest
+CASCADE_HIGH = float(os.getenv('CASCADE_HIGH', 0.9))
+
+logger = logging.getLogger(__name__)
+
+
+def take_rows(X, mask):
+    return X.iloc[mask] if hasattr(X, 'iloc') else X[mask]
+
+
+# Predictions for X from the cascade, plus a boolean mask of the rows the forest decided. Rows the
+# logistic regression is confident about keep its prediction (same rule as lr_model.predict).
+def cascade_predict(lr_model, rf_model, X, low=CASCADE_LOW, high=CASCADE_HIGH):
+    failure_proba = lr_model.predict_proba(X)[:, list(lr_model.classes_).index(1)]
+    predictions = np.where(failure_proba > 0.5, 1, 0)
+    escalated = (failure_proba > low) & (failure_proba < high)
+    if escalated.any():
+        predictions[escalated] = rf_model.predict(take_rows(X, escalated))
+    return predictions, escalated
+
+
+def scores(y, predictions):
+    return {
+        'accuracy': accuracy_score(y, predictions),
+        'precision': precision_score(y, predictions, zero_division=0),
+        'recall': recall_score(y, predictions, zero_division=0),
+        'f1': f1_score(y, predictions, zero_division=0)
+    }
+
+
+# Offline comparison of the single models with the cascade at each (low, high) band: scores, the share
+# of rows the forest had to score and wall time
+def evaluate_cascade(lr_model, rf_model, X, y, bands):
+    results = []
+
+    def run(name, predict):
+        start = time.perf_counter()
+        predictions, forest_rows = predict()
+        results.append({'model': name, **scores(y, predictions), 'forest_rows': forest_rows / len(y),
+                        'seconds': time.perf_counter() - start})
+
+    run('logistic regression', lambda: (lr_model.predict(X), 0))
+    run('random forest', lambda: (rf_model.predict(X), len(y)))
+    for low, high in bands:
+        def predict(low=low, high=high):
+            predictions, escalated = cascade_predict(lr_model, rf_model, X, low, high)
+            return predictions, int(escalated.sum())
+        run(f"cascade ({low:g}, {high:g})", predict)
+    return pd.DataFrame(results)
@@ -0,0 +1,113 @@
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# Dashboard series configuration (can be set via environment variables for Docker)
+DASHBOARD_HISTORY_HOURS = float(os.getenv('DASHBOARD_HISTORY_HOURS', 24))  # time span shown on the chart
+DASHBOARD_MAX_POINTS = int(os.getenv('DASHBOARD_MAX_POINTS', 1440))  # points per chart; sets the bucket width
+DASHBOARD_REFRESH_SECONDS = float(os.getenv('DASHBOARD_REFRESH_SECONDS', 30))  # min time between database reads
+
+logger = logging.getLogger(__name__)
+
+# Initial load: prediction_logs aggregated into fixed-width time buckets in PostgreSQL, so only
+# DASHBOARD_MAX_POINTS rows cross the wire however many predictions the table holds
+BUCKET_QUERY = """
+SELECT floor(extract(epoch FROM timestamp) / %(width)s)::bigint AS bucket,
+       count(*) AS row_count, sum(predictions) AS failure_count, max(timestamp) AS newest
+FROM prediction_logs
+WHERE timestamp > NOW() - make_interval(secs => %(history)s)
+GROUP BY bucket
+ORDER BY bucket
+"""
+
+# Afterwards only rows newer than the newest timestamp already counted are read
+NEW_ROWS_QUERY = """
+SELECT timestamp, predictions FROM prediction_logs WHERE timestamp > %(since)s ORDER BY timestamp
+"""
+
+
+# In-memory, downsampled prediction series shared by every dashboard client. Predictions are counted
+# into buckets of history / max_points seconds (aligned to the epoch, so new rows fold into the same
+# buckets the database produced); a chart point is a bucket's start and its predicted failure rate.
+# Only complete buckets are served, so clients can append them with extendData and never need to
+# redraw a point.
+class PredictionSeries:
+    def __init__(self, history_hours=DASHBOARD_HISTORY_HOURS, max_points=DASHBOARD_MAX_POINTS,
+                 refresh_seconds=DASHBOARD_REFRESH_SECONDS):
+        self.history_seconds = history_hours * 3600
+        self.max_points = max_points
+        self.width = max(1, int(self.history_seconds // max_points))  # bucket width in seconds
+        self.refresh_seconds = refresh_seconds
+        self.buckets = np.empty(0, dtype=np.int64)  # bucket numbers (epoch seconds // width), ascending
+        self.rows = np.empty(0, dtype=np.int64)
+        self.failures = np.empty(0, dtype=np.int64)
+        self.watermark = None  # newest prediction timestamp counted
+        self.last_refresh = None
+        self.lock = threading.Lock()
+
+    # Bring the series up to date; connect is a context manager yielding a database connection. Calls
+    # within refresh_seconds of the previous read are served from memory, however many clients poll.
+    def refresh(self, connect, force=False):
+        with self.lock:
+            if not force and self.last_refresh is not None and time.monotonic() - self.last_refresh < self.refresh_seconds:
+                return False
+            with connect() as conn:
+                if self.watermark is None:
+                    frame = pd.read_sql_query(BUCKET_QUERY, conn,
+                                              params={'width': self.width, 'history': self.history_seconds})
+                    self.load_buckets(frame)
+                else:
+                    frame = pd.read_sql_query(NEW_ROWS_QUERY, conn, params={'since': self.watermark})
+                    self.add_rows(frame['timestamp'], frame['predictions'])
+            self.last_refresh = time.monotonic()
+            return True
+
+    def load_buckets(self, frame):
+        if frame.empty:
+            return
+        self.buckets = frame['bucket'].to_numpy(np.int64)
+        self.rows = frame['row_count'].to_numpy(np.int64)
+        self.failures = frame['failure_count'].fillna(0).to_numpy(np.int64)
+        self.watermark = pd.Timestamp(frame['newest'].max())
+        logger.info(f"Dashboard series loaded: {self.rows.sum()} predictions in {len(self.buckets)} buckets")
+
+    # Fold new prediction rows into the buckets and drop buckets that fell out of the chart
+    def add_rows(self, timestamps, predictions):
+        if len(timestamps) == 0:
+            return
+        timestamps = pd.to_datetime(timestamps)
+        times = timestamps.to_numpy().astype('datetime64[s]').astype(np.int64)
+        new_buckets, inverse = np.unique(times // self.width, return_inverse=True)
+        new_rows = np.bincount(inverse, minlength=len(new_buckets))
+        new_failures = np.bincount(inverse, weights=np.asarray(predictions, dtype=np.float64),
+                                   minlength=len(new_buckets)).astype(np.int64)
+
+        buckets = np.union1d(self.buckets, new_buckets)
+        rows = np.zeros(len(buckets), dtype=np.int64)
+        failures = np.zeros(len(buckets), dtype=np.int64)
+        for source_buckets, source_rows, source_failures in ((self.buckets, self.rows, self.failures),
+                                                             (new_buckets, new_rows, new_failures)):
+            positions = np.searchsorted(buckets, source_buckets)
+            rows[positions] += source_rows
+            failures[positions] += source_failures
+
+        keep = buckets > buckets[-1] - self.max_points
+        self.buckets, self.rows, self.failures = buckets[keep], rows[keep], failures[keep]
+        newest = pd.Timestamp(timestamps.max())
+        self.watermark = newest if self.watermark is None else max(self.watermark, newest)
+
+    # Complete buckets as (x, y) lists: bucket start times and failure rates, optionally only after a
+    # bucket start a client already has. A bucket is complete once a newer prediction has been counted.
+    def points(self, after=None):
+        with self.lock:
+            if self.watermark is None:
+                return [], []
+            complete = self.buckets < self.watermark.value // 10**9 // self.width
+            if after is not None:
+                complete &= self.buckets > pd.Timestamp(after).value // 10**9 // self.width
+            starts = pd.to_datetime(self.buckets[complete] * self.width, unit='s')
+            rates = self.failures[complete] / self.rows[complete]
+        return [start.isoformat() for start in starts], rates.round(4).tolist()
@@ -1,29 +1,99 @@
 import psycopg2
 import asyncio
+import io
+import csv
 import aiohttp
 import logging
+import os
+import json
 from datetime import datetime
-from aiohttp import ClientSession
+from aiohttp import ClientSession, web
+from psycopg2.extras import execute_values
+from prometheus_client import start_http_server, Summary, Counter, Gauge
+from concurrent.futures import ThreadPoolExecutor
+from sharding import ConsistentHashRing, resolve_shard_index, SHARD_COUNT
+from telemetry_spool import TelemetrySpool, SPOOL_DIR
+from schema_management import create_schema, TABLE_COLUMNS, COLUMN_TYPES
+import multiprocessing
+import argparse
+import heapq
 import time
 
-# PostgreSQL connection details
-DB_HOST = 'localhost'
-DB_PORT = '5432'
-DB_NAME = 'security_systems'
-DB_USER = 'your_user'
-DB_PASSWORD = 'your_password'
+# PostgreSQL connection details (can be set via environment variables for Docker)
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_PORT = os.getenv('DB_PORT', '5432')
+DB_NAME = os.getenv('DB_NAME', 'security_systems')
+DB_USER = os.getenv('DB_USER', 'your_user')
+DB_PASSWORD = os.getenv('DB_PASSWORD', 'your_password')
 
 # Configuration for devices
 CAMERA_COUNT = 200
 DOOR_COUNT = 50
 INTERCOM_COUNT = 20
-BATCH_SIZE = 50
+BATCH_SIZE = 1000  # rows per statement for the execute_values fallback
 DATA_COLLECTION_INTERVAL = 60  # seconds between data collection cycles
 
+# Device API base URL (point at device_simulator.py for local load tests)
+DEVICE_API_URL = os.getenv('DEVICE_API_URL', 'http://api.example.com')  # Replace with actual API endpoint
+
+# Poll scheduler configuration (can be set via environment variables for Docker)
+MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', 500))  # global in-flight request cap
+FAMILY_CONCURRENCY = {
+    "cctv_logs": int(os.getenv('CCTV_CONCURRENCY', 300)),
+    "access_control_logs": int(os.getenv('ACCESS_CONTROL_CONCURRENCY', 100)),
+    "intercom_logs": int(os.getenv('INTERCOM_CONCURRENCY', 50))
+}
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 5))  # seconds per device request
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', 2))
+KEEPALIVE_TIMEOUT = 75  # seconds an idle connection is kept open for reuse
+DNS_CACHE_TTL = 300
+
+# Delta ingestion: write a row only when a tracked field changes, plus a periodic heartbeat
+DELTA_MODE = os.getenv('DELTA_MODE', 'false').lower() == 'true'
+HEARTBEAT_INTERVAL = int(os.getenv('HEARTBEAT_INTERVAL', 900))  # seconds between unchanged rows per device
+# Seconds without a row after which a device's state is unknown (stale): a heartbeat plus one poll cycle.
+# Raise it with ADAPTIVE_POLLING, where a stable device may only be polled every MAX_POLL_INTERVAL.
+STALE_AFTER = int(os.getenv('STALE_AFTER', HEARTBEAT_INTERVAL + DATA_COLLECTION_INTERVAL))
+
+# Adaptive polling: per-device intervals shrink on change or error and back off while stable
+ADAPTIVE_POLLING = os.getenv('ADAPTIVE_POLLING', 'false').lower() == 'true'
+MIN_POLL_INTERVAL = float(os.getenv('MIN_POLL_INTERVAL', 15))  # seconds, for changed or erroring devices
+MAX_POLL_INTERVAL = float(os.getenv('MAX_POLL_INTERVAL', 600))  # seconds, for long-stable devices
+POLL_BACKOFF_FACTOR = 2.0
+ADAPTIVE_TICK = 1.0  # minimum wait between scheduler wake-ups, so nearly-due devices share one batch
+
+# Push ingestion endpoint for devices and gateways that can send their own events
+PUSH_INGEST_ENABLED = os.getenv('PUSH_INGEST_ENABLED', 'false').lower() == 'true'
+PUSH_INGEST_HOST = os.getenv('PUSH_INGEST_HOST', '0.0.0.0')
+PUSH_INGEST_PORT = int(os.getenv('PUSH_INGEST_PORT', 8081))
+PUSH_FLUSH_INTERVAL = 0.5  # seconds pushed events wait before being handed to the writer
+PUSH_MAX_BUFFERED = 5000  # pushed events that force an early flush
+PUSH_MAX_BODY_BYTES = 4 * 1024 * 1024
+
+# Writer stage configuration
+WRITE_QUEUE_SIZE = int(os.getenv('WRITE_QUEUE_SIZE', 4))  # pending cycle batches before polling is back-pressured
+METRICS_PORT = int(os.getenv('COLLECTOR_METRICS_PORT', 8002))
+SPOOL_ENABLED = os.getenv('SPOOL_ENABLED', 'true').lower() == 'true'  # spool batches locally when PostgreSQL is down or slow
+SPOOL_REPLAY_INTERVAL = 30  # seconds of writer idle time between spool replay attempts
+# Write errors a later retry can fix (database unreachable), which are spooled; batches failing with the
+# permanent errors are quarantined instead, since replaying them would fail forever and block the spool
+TRANSIENT_WRITE_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+PERMANENT_WRITE_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError, psycopg2.ProgrammingError)
+
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('SecuritySystemsLogger')
 
+# Prometheus metrics
+write_queue_depth = Gauge('collector_write_queue_depth', 'Cycle batches waiting for the database writer')
+write_latency = Summary('collector_write_latency_seconds', 'Time spent writing and committing one cycle batch')
+backpressure_wait = Summary('collector_backpressure_wait_seconds', 'Time pollers waited for space in the write queue')
+rows_written = Counter('collector_rows_written', 'Total number of rows written to PostgreSQL')
+write_failures = Counter('collector_write_failures', 'Total number of failed batch writes')
+push_events_accepted = Counter('collector_push_events_accepted', 'Total number of pushed events accepted')
+push_events_rejected = Counter('collector_push_events_rejected', 'Total number of pushed events rejected by validation')
+batches_spooled = Counter('collector_batches_spooled', 'Total number of cycle batches diverted to the local spool')
+
 # PostgreSQL Database connection
 def get_db_connection():
     try:
@@ -39,88 +109,170 @@ def get_db_connection():
         logger.error(f"Error connecting to PostgreSQL: {e}")
         raise e
 
-# PostgreSQL table creation (if not exists)
+# PostgreSQL table creation (if not exists): time-partitioned log tables with query-matched
+# indexes, migrating older plain tables in place (see schema_management.py)
 def create_database():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''CREATE TABLE IF NOT EXISTS cctv_logs (
-                        timestamp TIMESTAMP, 
-                        camera_id TEXT, 
-                        status TEXT, 
-                        motion_detected INTEGER)''')
-
-    cursor.execute('''CREATE TABLE IF NOT EXISTS access_control_logs (
-                        timestamp TIMESTAMP, 
-                        door_id TEXT, 
-                        access_granted INTEGER)''')
-
-    cursor.execute('''CREATE TABLE IF NOT EXISTS intercom_logs (
-                        timestamp TIMESTAMP, 
-                        intercom_id TEXT, 
-                        status TEXT)''')
+    create_schema(cursor)
+    create_dense_functions(cursor)
 
     conn.commit()
     cursor.close()
     conn.close()
 
-# Function to store data in PostgreSQL in batches
+# Device state fields per table; in delta mode a row is written when any of these change
+TRACKED_FIELDS = {
+    "cctv_logs": ("status", "motion_detected"),
+    "access_control_logs": ("access_granted",),
+    "intercom_logs": ("status",)
+}
+
+# SQL functions <table>_dense(start_ts, end_ts, step, stale_after) that rebuild a regular per-device time
+# series from change-only rows by carrying each device's last known state forward onto a time grid, for
+# at most stale_after: a grid point with no row in the stale_after before it has NULL state and logged_at
+# (unknown), so a device that stopped reporting is neither online nor still offline. logged_at is the
+# timestamp of the row the state came from. Every lookup is bounded below by start_ts - stale_after, so
+# only the partitions covering the requested range are read, however much history is retained.
+def dense_function_sql(table):
+    columns = TABLE_COLUMNS[table]
+    id_column = columns[1]
+    fields = TRACKED_FIELDS[table]
+    # Column names are quoted: timestamp is a type keyword and cannot be a bare name in RETURNS TABLE
+    returns = ", ".join(f'"{column}" {COLUMN_TYPES[column]}' for column in columns)
+    return f'''CREATE FUNCTION {table}_dense(
+                   start_ts TIMESTAMP, end_ts TIMESTAMP, step INTERVAL DEFAULT '60 seconds',
+                   stale_after INTERVAL DEFAULT '{STALE_AFTER} seconds')
+               RETURNS TABLE ({returns}, "logged_at" TIMESTAMP)
+               LANGUAGE SQL STABLE AS $$
+                   WITH devices AS (
+                       SELECT DISTINCT d.{id_column} FROM {table} AS d
+                       WHERE d.timestamp > start_ts - stale_after AND d.timestamp <= end_ts
+                   )
+                   SELECT grid.ts, devices.{id_column}, {", ".join(f"latest.{field}" for field in fields)}, latest.timestamp
+                   FROM generate_series(start_ts, end_ts, step) AS grid(ts)
+                   CROSS JOIN devices
+                   LEFT JOIN LATERAL (
+                       SELECT {", ".join(f"l.{field}" for field in fields)}, l.timestamp
+                       FROM {table} AS l
+                       WHERE l.{id_column} = devices.{id_column}
+                         AND l.timestamp <= grid.ts AND l.timestamp > grid.ts - stale_after
+                         AND l.timestamp > start_ts - stale_after AND l.timestamp <= end_ts  -- prunes partitions
+                       ORDER BY l.timestamp DESC
+                       LIMIT 1
+                   ) AS latest ON true
+               $$'''
+
+# Install the dense functions; each is dropped first, since CREATE OR REPLACE cannot change a function's result columns
+def create_dense_functions(cursor):
+    for table in TABLE_COLUMNS:
+        cursor.execute(f"DROP FUNCTION IF EXISTS {table}_dense(TIMESTAMP, TIMESTAMP, INTERVAL, INTERVAL)")
+        cursor.execute(dense_function_sql(table))
+
+# Stream rows into a table with COPY FROM STDIN using an in-memory CSV buffer
+def copy_insert(cursor, table, data):
+    columns = TABLE_COLUMNS[table]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([d[column] for column in columns] for d in data)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+# Multi-row INSERT fallback for connections where COPY is unavailable (e.g. statement poolers)
+def values_insert(cursor, table, data):
+    columns = TABLE_COLUMNS[table]
+    execute_values(cursor, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+                   [tuple(d[column] for column in columns) for d in data], page_size=BATCH_SIZE)
+
+# Function to store data in PostgreSQL in bulk; the caller commits once per cycle
 def batch_insert(cursor, table, data):
-    if table == "cctv_logs":
-        cursor.executemany('''INSERT INTO cctv_logs (timestamp, camera_id, status, motion_detected) 
-                              VALUES (%s, %s, %s, %s)''',
-                           [(d['timestamp'], d['camera_id'], d['status'], d['motion_detected']) for d in data])
+    if not data:
+        return
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown log table: {table}")
+
+    # Savepoint so a failed COPY does not abort the surrounding cycle transaction
+    cursor.execute("SAVEPOINT bulk_insert")
+    try:
+        copy_insert(cursor, table, data)
+    except psycopg2.Error as e:
+        logger.warning(f"COPY into {table} failed ({e}), falling back to execute_values")
+        cursor.execute("ROLLBACK TO SAVEPOINT bulk_insert")
+        values_insert(cursor, table, data)
+    cursor.execute("RELEASE SAVEPOINT bulk_insert")
 
-    elif table == "access_control_logs":
-        cursor.executemany('''INSERT INTO access_control_logs (timestamp, door_id, access_granted) 
-                              VALUES (%s, %s, %s)''',
-                           [(d['timestamp'], d['door_id'], d['access_granted']) for d in data])
+# Device-reported fields coerced to their column types: booleans and integral numbers or numeric strings
+# for INTEGER columns, non-empty strings for TEXT columns. Anything else raises ValueError, so one device
+# reporting e.g. "motion_detected": "yes" loses its own reading instead of failing the whole batch write.
+def device_integer(value, field):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        return int(value)
+    raise ValueError(f"{field} must be an integer, got {value!r}")
 
-    elif table == "intercom_logs":
-        cursor.executemany('''INSERT INTO intercom_logs (timestamp, intercom_id, status) 
-                              VALUES (%s, %s, %s)''',
-                           [(d['timestamp'], d['intercom_id'], d['status']) for d in data])
+def device_text(value, field):
+    if isinstance(value, str) and value:
+        return value
+    raise ValueError(f"{field} must be a non-empty string, got {value!r}")
 
 # Asynchronous data fetchers for CCTV, Access Control, and Intercom
 async def fetch_cctv_data(session, camera_id):
-    url = f"http://api.example.com/cameras/{camera_id}/status"  # Replace with actual API endpoint
+    url = f"{DEVICE_API_URL}/cameras/{camera_id}/status"
     async with session.get(url) as response:
         if response.status == 200:
             json_response = await response.json()
-            return {
-                "timestamp": datetime.now(),
-                "camera_id": camera_id,
-                "status": json_response.get("status", "offline"),
-                "motion_detected": json_response.get("motion_detected", 0)
-            }
+            try:
+                return {
+                    "timestamp": datetime.now(),
+                    "camera_id": camera_id,
+                    "status": device_text(json_response.get("status", "offline"), "status"),
+                    "motion_detected": device_integer(json_response.get("motion_detected", 0), "motion_detected")
+                }
+            except (ValueError, AttributeError) as e:
+                logger.error(f"Invalid CCTV data for {camera_id}: {e}")
+                return None
         else:
             logger.error(f"Failed to fetch CCTV data for {camera_id}. Status code: {response.status}")
             return None
 
 async def fetch_access_control_data(session, door_id):
-    url = f"http://api.example.com/access-control/{door_id}/status"  # Replace with actual API endpoint
+    url = f"{DEVICE_API_URL}/access-control/{door_id}/status"
     async with session.get(url) as response:
         if response.status == 200:
             json_response = await response.json()
-            return {
-                "timestamp": datetime.now(),
-                "door_id": door_id,
-                "access_granted": json_response.get("access_granted", 0)
-            }
+            try:
+                return {
+                    "timestamp": datetime.now(),
+                    "door_id": door_id,
+                    "access_granted": device_integer(json_response.get("access_granted", 0), "access_granted")
+                }
+            except (ValueError, AttributeError) as e:
+                logger.error(f"Invalid Access Control data for {door_id}: {e}")
+                return None
         else:
             logger.error(f"Failed to fetch Access Control data for {door_id}. Status code: {response.status}")
             return None
 
 async def fetch_intercom_data(session, intercom_id):
-    url = f"http://api.example.com/intercoms/{intercom_id}/status"  # Replace with actual API endpoint
+    url = f"{DEVICE_API_URL}/intercoms/{intercom_id}/status"
     async with session.get(url) as response:
         if response.status == 200:
             json_response = await response.json()
-            return {
-                "timestamp": datetime.now(),
-                "intercom_id": intercom_id,
-                "status": json_response.get("status", "inactive")
-            }
+            try:
+                return {
+                    "timestamp": datetime.now(),
+                    "intercom_id": intercom_id,
+                    "status": device_text(json_response.get("status", "inactive"), "status")
+                }
+            except (ValueError, AttributeError) as e:
+                logger.error(f"Invalid Intercom data for {intercom_id}: {e}")
+                return None
         else:
             logger.error(f"Failed to fetch Intercom data for {intercom_id}. Status code: {response.status}")
             return None
@@ -130,54 +282,459 @@ async def gather_data(fetch_func, entity_ids, session):
     tasks = []
     for entity_id in entity_ids:
         tasks.append(fetch_func(session, entity_id))
-    results = await asyncio.gather(*tasks)
-    return [result for result in results if result is not None]
+    # A timeout or connection error on one device must not discard the rest of the cycle
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for entity_id, result in zip(entity_ids, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to poll {entity_id}: {result!r}")
+    return [result for result in results if result is not None and not isinstance(result, Exception)]
 
-# Main function to collect and store data
-async def collect_and_store_data():
-    create_database()
+# Device families polled each cycle: table -> (fetcher, ID prefix, device count)
+DEVICE_FAMILIES = {
+    "cctv_logs": (fetch_cctv_data, "CAM", CAMERA_COUNT),
+    "access_control_logs": (fetch_access_control_data, "DOOR", DOOR_COUNT),
+    "intercom_logs": (fetch_intercom_data, "INT", INTERCOM_COUNT)
+}
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# Lists of entity IDs per table; counts maps table -> device count and defaults to the configured fleet
+def build_device_ids(counts=None):
+    return {
+        table: [f"{prefix}_{i:03}" for i in range(1, (counts or {}).get(table, count) + 1)]
+        for table, (_, prefix, count) in DEVICE_FAMILIES.items()
+    }
+
+# Devices owned by one collector shard; every device when sharding is off
+def build_shard_device_ids(shard_count=SHARD_COUNT, shard_index=None):
+    device_ids = build_device_ids()
+    if shard_count <= 1:
+        return device_ids
+    shard_index = resolve_shard_index(shard_count, shard_index)
+    shard_ids = ConsistentHashRing(shard_count).assign(device_ids, shard_index)
+    logger.info(f"Shard {shard_index}/{shard_count} owns {sum(len(ids) for ids in shard_ids.values())} devices.")
+    return shard_ids
+
+# HTTP session with a keep-alive connector sized for the global concurrency cap
+def create_session():
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENT_REQUESTS,
+        limit_per_host=0,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        enable_cleanup_closed=True
+    )
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    return ClientSession(connector=connector, timeout=timeout)
+
+# Polls every device family in parallel under per-family and global concurrency limits
+class PollScheduler:
+    def __init__(self, session, global_limit=MAX_CONCURRENT_REQUESTS, family_limits=None):
+        self.session = session
+        self.global_semaphore = asyncio.Semaphore(global_limit)
+        family_limits = family_limits or FAMILY_CONCURRENCY
+        self.family_semaphores = {table: asyncio.Semaphore(limit) for table, limit in family_limits.items()}
+
+    async def _fetch(self, table, fetch_func, entity_id):
+        # Family slot first so one slow family cannot hold global slots while queued
+        async with self.family_semaphores[table]:
+            async with self.global_semaphore:
+                return await fetch_func(self.session, entity_id)
+
+    async def poll_family(self, table, entity_ids):
+        fetch_func = DEVICE_FAMILIES[table][0]
+
+        async def bounded_fetch(session, entity_id):
+            return await self._fetch(table, fetch_func, entity_id)
+
+        return await gather_data(bounded_fetch, entity_ids, self.session)
+
+    async def poll(self, device_ids):
+        tables = list(device_ids)
+        results = await asyncio.gather(*[self.poll_family(table, device_ids[table]) for table in tables])
+        return dict(zip(tables, results))
+
+# Adaptive scheduler: a min-heap of (next poll time, table, device ID). Each wake-up polls only the
+# devices that are due; a device that changed or failed is rescheduled at min_interval, a stable one
+# has its interval multiplied by backoff up to max_interval.
+class AdaptivePollScheduler:
+    def __init__(self, device_ids, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL,
+                 backoff=POLL_BACKOFF_FACTOR, now=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.intervals = {}
+        self.last_values = {}
+        now = time.monotonic() if now is None else now
+        self.heap = [(now, table, device_id) for table, ids in device_ids.items() for device_id in ids]
+        heapq.heapify(self.heap)
+        self.tables = list(device_ids)
+
+    def due(self, now):
+        due_ids = {table: [] for table in self.tables}
+        while self.heap and self.heap[0][0] <= now:
+            _, table, device_id = heapq.heappop(self.heap)
+            due_ids[table].append(device_id)
+        return due_ids
+
+    def next_due_in(self, now):
+        return max(0, self.heap[0][0] - now) if self.heap else self.max_interval
+
+    # Reschedule every polled device; a device with no result counts as an error
+    def record(self, polled_ids, collected, now):
+        results = {(table, row[TABLE_COLUMNS[table][1]]): row for table, rows in collected.items() for row in rows}
+        for table, ids in polled_ids.items():
+            for device_id in ids:
+                key = (table, device_id)
+                row = results.get(key)
+                if row is None:
+                    interval = self.min_interval
+                else:
+                    values = tuple(row[field] for field in TRACKED_FIELDS[table])
+                    changed = self.last_values.get(key) != values
+                    self.last_values[key] = values
+                    previous = self.intervals.get(key, self.min_interval)
+                    interval = self.min_interval if changed else min(previous * self.backoff, self.max_interval)
+                self.intervals[key] = interval
+                heapq.heappush(self.heap, (now + interval, table, device_id))
 
-    # Lists of entity IDs
-    camera_ids = [f"CAM_{i:03}" for i in range(1, CAMERA_COUNT + 1)]
-    door_ids = [f"DOOR_{i:03}" for i in range(1, DOOR_COUNT + 1)]
-    intercom_ids = [f"INT_{i:03}" for i in range(1, INTERCOM_COUNT + 1)]
+    # Poll the devices that are due; they are always rescheduled, even if the poll itself raises
+    async def poll_due(self, poll_scheduler):
+        polled_ids = self.due(time.monotonic())
+        collected = {}
+        try:
+            collected = await poll_scheduler.poll(polled_ids)
+        finally:
+            self.record(polled_ids, collected, time.monotonic())
+        return collected
 
-    async with ClientSession() as session:
+# Change-only filter: keeps the last written state per device and drops rows that repeat it,
+# except for a heartbeat row every heartbeat_interval seconds
+class DeltaFilter:
+    def __init__(self, heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.heartbeat_interval = heartbeat_interval
+        self.last_state = {}  # (table, device_id) -> (tracked values, timestamp of last written row)
+
+    def is_due(self, table, row):
+        key = (table, row[TABLE_COLUMNS[table][1]])
+        values = tuple(row[field] for field in TRACKED_FIELDS[table])
+        previous = self.last_state.get(key)
+        if previous is not None:
+            previous_values, last_written = previous
+            if values == previous_values and (row["timestamp"] - last_written).total_seconds() < self.heartbeat_interval:
+                return False
+        self.last_state[key] = (values, row["timestamp"])
+        return True
+
+    def filter(self, collected):
+        return {table: [row for row in rows if self.is_due(table, row)] for table, rows in collected.items()}
+
+# Database writer stage: a bounded queue drained by one dedicated thread, so blocking
+# psycopg2 calls never run on the event loop and a slow database backs up the queue.
+# With a spool, batches that fail to write (or arrive while the queue is full) go to local
+# disk instead and are replayed in bulk once PostgreSQL accepts writes again.
+class BatchWriter:
+    def __init__(self, max_pending=WRITE_QUEUE_SIZE, spool=None):
+        self.max_pending = max_pending
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self.spool = spool
+        self.conn = None
+        self.task = None
+
+    # The queue is created here, inside the running loop (Python 3.9 binds queues to a loop on construction)
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    # Enqueue one cycle's rows; while the queue is full, spool the batch or wait (backpressure)
+    async def submit(self, collected):
+        if self.spool is not None and self.queue.full():
+            batches_spooled.inc()
+            await asyncio.get_running_loop().run_in_executor(None, self.spool.append, collected, TABLE_COLUMNS)
+            return
+        start = time.monotonic()
+        await self.queue.put(collected)
+        backpressure_wait.observe(time.monotonic() - start)
+        write_queue_depth.set(self.queue.qsize())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
         while True:
             try:
-                # Collect data from all systems asynchronously
-                cctv_data = await gather_data(fetch_cctv_data, camera_ids, session)
-                access_data = await gather_data(fetch_access_control_data, door_ids, session)
-                intercom_data = await gather_data(fetch_intercom_data, intercom_ids, session)
+                if self.spool is None:
+                    collected = await self.queue.get()
+                else:
+                    collected = await asyncio.wait_for(self.queue.get(), timeout=SPOOL_REPLAY_INTERVAL)
+            except asyncio.TimeoutError:
+                # Idle writer: retry draining the spool
+                await loop.run_in_executor(self.executor, self.replay_spool)
+                continue
+            try:
+                await loop.run_in_executor(self.executor, self.write, collected)
+            finally:
+                self.queue.task_done()
+                write_queue_depth.set(self.queue.qsize())
+
+    # Write and commit one batch on the writer thread, which owns the connection; raises on failure
+    def write_rows(self, collected):
+        if self.conn is None or self.conn.closed:
+            self.conn = get_db_connection()
+        try:
+            cursor = self.conn.cursor()
+            for table, rows in collected.items():
+                batch_insert(cursor, table, rows)
+            self.conn.commit()
+            cursor.close()
+        except Exception:
+            if not self.conn.closed:
+                self.conn.rollback()
+            raise
 
-                # Batch insert data into PostgreSQL
-                for i in range(0, len(cctv_data), BATCH_SIZE):
-                    batch_insert(cursor, "cctv_logs", cctv_data[i:i + BATCH_SIZE])
+    def write(self, collected):
+        start = time.monotonic()
+        row_count = sum(len(rows) for rows in collected.values())
+        try:
+            self.write_rows(collected)
+        except TRANSIENT_WRITE_ERRORS as e:
+            write_failures.inc()
+            if self.spool is None:
+                logger.error(f"Error writing batch to PostgreSQL, {row_count} rows dropped: {e}")
+                return
+            logger.error(f"Error writing batch to PostgreSQL, spooling {row_count} rows: {e}")
+            batches_spooled.inc()
+            self.spool.append(collected, TABLE_COLUMNS)
+            return
+        except Exception as e:
+            # Rejected rows rather than an unreachable database: retrying cannot succeed
+            write_failures.inc()
+            logger.error(f"PostgreSQL rejected a batch of {row_count} rows: {e}")
+            if self.spool is not None:
+                self.spool.quarantine(collected, TABLE_COLUMNS)
+            return
+        rows_written.inc(row_count)
+        write_latency.observe(time.monotonic() - start)
+        logger.info(f"Stored {row_count} rows in {time.monotonic() - start:.2f}s.")
+        # The database is accepting writes again, so drain anything spooled while it was not
+        if self.spool is not None and self.spool.pending():
+            self.replay_spool()
 
-                for i in range(0, len(access_data), BATCH_SIZE):
-                    batch_insert(cursor, "access_control_logs", access_data[i:i + BATCH_SIZE])
+    def replay_spool(self):
+        if self.spool is None or not self.spool.pending():
+            return
+        try:
+            rows_written.inc(self.spool.replay(self.write_rows, quarantine_on=PERMANENT_WRITE_ERRORS))
+        except Exception as e:
+            logger.warning(f"Spool replay deferred, PostgreSQL still unavailable: {e}")
+
+    # Drain pending batches, then release the thread and connection
+    async def close(self):
+        await self.queue.join()
+        if self.task is not None:
+            self.task.cancel()
+        self.executor.shutdown(wait=True)
+        if self.spool is not None:
+            self.spool.seal()
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+
+# Pushed event device_type -> log table, and the columns that must be integers
+PUSH_DEVICE_TYPES = {"cctv": "cctv_logs", "access_control": "access_control_logs", "intercom": "intercom_logs"}
+INTEGER_COLUMNS = {"motion_detected", "access_granted"}
+
+# Validate one pushed event, e.g. {"device_type": "cctv", "camera_id": "CAM_001", "status": "online",
+# "motion_detected": 1, "timestamp": "2024-10-10T12:00:00"}, into (table, row); raises ValueError
+def parse_push_event(event):
+    if not isinstance(event, dict):
+        raise ValueError("event must be a JSON object")
+    table = PUSH_DEVICE_TYPES.get(event.get("device_type"))
+    if table is None:
+        raise ValueError(f"unknown device_type {event.get('device_type')!r}")
+
+    row = {}
+    for column in TABLE_COLUMNS[table]:
+        value = event.get(column)
+        if column == "timestamp":
+            if value is None:
+                value = datetime.now()
+            else:
+                value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+                if value.tzinfo is not None:
+                    value = value.astimezone().replace(tzinfo=None)  # stored like polled rows, in local time
+        elif column in INTEGER_COLUMNS:
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, int):
+                raise ValueError(f"{column} must be an integer")
+        elif not isinstance(value, str) or not value:
+            raise ValueError(f"{column} must be a non-empty string")
+        row[column] = value
+    return table, row
+
+# HTTP ingest endpoint (POST /ingest) accepting a JSON event, a JSON list, {"events": [...]} or NDJSON.
+# Valid events are buffered per table and handed to the same writer as the pollers every
+# PUSH_FLUSH_INTERVAL, so pushed events reach PostgreSQL in well under a second.
+class PushIngestor:
+    def __init__(self, writer, flush_interval=PUSH_FLUSH_INTERVAL, max_buffered=PUSH_MAX_BUFFERED):
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.buffer = {table: [] for table in TABLE_COLUMNS}
+        self.runner = None
+        self.flush_task = None
+
+    async def handle_ingest(self, request):
+        body = await request.text()
+        try:
+            if request.content_type == 'application/x-ndjson':
+                events = [json.loads(line) for line in body.splitlines() if line.strip()]
+            else:
+                payload = json.loads(body)
+                events = payload if isinstance(payload, list) else payload.get("events", [payload])
+        except (json.JSONDecodeError, AttributeError) as e:
+            raise web.HTTPBadRequest(text=f"Invalid JSON payload: {e}")
+
+        accepted, rejected = 0, []
+        for index, event in enumerate(events):
+            try:
+                table, row = parse_push_event(event)
+            except (ValueError, TypeError) as e:
+                rejected.append({"index": index, "error": str(e)})
+                continue
+            self.buffer[table].append(row)
+            accepted += 1
+        push_events_accepted.inc(accepted)
+        push_events_rejected.inc(len(rejected))
 
-                for i in range(0, len(intercom_data), BATCH_SIZE):
-                    batch_insert(cursor, "intercom_logs", intercom_data[i:i + BATCH_SIZE])
+        # A full buffer is flushed inline, so a backed-up writer slows the pushing client down
+        if sum(len(rows) for rows in self.buffer.values()) >= self.max_buffered:
+            await self.flush()
+        return web.json_response({"accepted": accepted, "rejected": rejected[:100]}, status=202)
 
-                conn.commit()
-                logger.info("Data collected and stored successfully.")
+    async def flush(self):
+        if not any(self.buffer.values()):
+            return
+        collected, self.buffer = self.buffer, {table: [] for table in TABLE_COLUMNS}
+        await self.writer.submit(collected)
 
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
             except Exception as e:
-                logger.error(f"Error during data collection: {e}")
+                logger.error(f"Error flushing pushed events: {e}")
 
-            # Wait before collecting the next set of data
-            await asyncio.sleep(DATA_COLLECTION_INTERVAL)
+    async def start(self, host=PUSH_INGEST_HOST, port=PUSH_INGEST_PORT):
+        app = web.Application(client_max_size=PUSH_MAX_BODY_BYTES)
+        app.router.add_post('/ingest', self.handle_ingest)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        self.flush_task = asyncio.get_running_loop().create_task(self._flush_periodically())
+        logger.info(f"Push ingest endpoint listening on http://{host}:{port}/ingest")
 
-    cursor.close()
-    conn.close()
+    async def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        if self.runner is not None:
+            await self.runner.cleanup()
+        await self.flush()
+
+# Local spool for one collector process; shards spool into separate directories
+def create_spool(shard_index=None):
+    if not SPOOL_ENABLED:
+        return None
+    directory = SPOOL_DIR if shard_index is None else os.path.join(SPOOL_DIR, f"shard-{shard_index}")
+    return TelemetrySpool(directory)
+
+# Main function to collect and store data; max_cycles bounds the loop for benchmarks and returns per-cycle stats
+async def collect_and_store_data(device_ids=None, writer=None, max_cycles=None, push_port=PUSH_INGEST_PORT):
+    if writer is None:
+        create_database()
+        writer = BatchWriter(spool=create_spool())
+
+    device_ids = device_ids or build_shard_device_ids()
+    delta_filter = DeltaFilter() if DELTA_MODE else None
+    cycle_stats = []
+    cycles = 0
+    writer.start()
+    push_ingestor = PushIngestor(writer) if PUSH_INGEST_ENABLED else None
 
-if __name__ == "__main__":
     try:
-        asyncio.run(collect_and_store_data())
+        if push_ingestor is not None:
+            await push_ingestor.start(port=push_port)
+        async with create_session() as session:
+            scheduler = PollScheduler(session)
+            adaptive = AdaptivePollScheduler(device_ids) if ADAPTIVE_POLLING else None
+            while max_cycles is None or cycles < max_cycles:
+                cycles += 1
+                cycle_start = time.monotonic()
+                try:
+                    # Collect data from all systems concurrently (only the due devices in adaptive mode)
+                    if adaptive is not None:
+                        collected = await adaptive.poll_due(scheduler)
+                    else:
+                        collected = await scheduler.poll(device_ids)
+                    polled_count = sum(len(rows) for rows in collected.values())
+                    if delta_filter is not None:
+                        collected = delta_filter.filter(collected)
+
+                    # Hand off to the writer stage; one COPY per table and one commit per cycle
+                    if any(collected.values()):
+                        await writer.submit(collected)
+                    queued_count = sum(len(rows) for rows in collected.values())
+                    if max_cycles is not None:
+                        cycle_stats.append({"seconds": time.monotonic() - cycle_start,
+                                            "polled": polled_count, "queued": queued_count})
+                    logger.info(f"Data collected in {time.monotonic() - cycle_start:.2f}s "
+                                f"({polled_count} polled, {queued_count} rows queued).")
+
+                except Exception as e:
+                    logger.error(f"Error during data collection: {e}")
+
+                # Wait before collecting the next set of data: until the next device is due in adaptive
+                # mode, otherwise keeping a fixed cycle cadence
+                if adaptive is not None:
+                    await asyncio.sleep(max(adaptive.next_due_in(time.monotonic()), ADAPTIVE_TICK))
+                else:
+                    await asyncio.sleep(max(0, DATA_COLLECTION_INTERVAL - (time.monotonic() - cycle_start)))
+    finally:
+        if push_ingestor is not None:
+            await push_ingestor.close()
+        await writer.close()
+
+    return cycle_stats
+
+# Entry point for one shard process; each shard keeps its own HTTP session, writer thread, connection and ports
+def run_shard(shard_index, shard_count):
+    start_http_server(METRICS_PORT + shard_index)
+    try:
+        writer = BatchWriter(spool=create_spool(shard_index))
+        asyncio.run(collect_and_store_data(build_shard_device_ids(shard_count, shard_index), writer,
+                                           push_port=PUSH_INGEST_PORT + shard_index))
     except KeyboardInterrupt:
-        logger.info("Data collection stopped by user.")
+        logger.info(f"Shard {shard_index} stopped by user.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect CCTV, access control and intercom telemetry")
+    parser.add_argument("--shards", type=int, default=1, help="run this many local collector processes")
+    args = parser.parse_args()
 
+    if args.shards > 1:
+        # Tables are created once up front so shard processes do not race on DDL
+        create_database()
+        processes = [multiprocessing.Process(target=run_shard, args=(index, args.shards), name=f"collector-{index}")
+                     for index in range(args.shards)]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            logger.info("Data collection stopped by user.")
+    else:
+        # Start Prometheus server to expose collector metrics
+        start_http_server(METRICS_PORT)
+        try:
+            asyncio.run(collect_and_store_data())
+        except KeyboardInterrupt:
+            logger.info("Data collection stopped by user.")
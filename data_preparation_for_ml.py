@@ -2,10 +2,18 @@ import psycopg2
 import pandas as pd
 import numpy as np
 import concurrent.futures
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder, StandardScaler
 import logging
 import sys
+import os
+import json
+import argparse
+import functools
+from datetime import datetime, timedelta
+import feature_store
+from frame_compaction import compact_frame, compact_column
+from parallel_preprocessing import run_partitioned
+from feature_pipeline import FeaturePipeline, FEATURE_PIPELINE_FILE
+import event_correlation
 
 # Set up logging configuration for monitoring
 logging.basicConfig(
@@ -21,15 +29,35 @@ DB_NAME = 'security_systems'
 DB_USER = 'your_user'
 DB_PASSWORD = 'your_password'
 
+# Incremental preparation: per-table high-water marks of the newest ingestion time prepared
+WATERMARK_FILE = 'prep_watermarks.json'
+WATERMARK_LAG_MINUTES = 5  # rows ingested this recently are left for the next run, so open write transactions are not skipped
+
+# Source table per dataset; processed datasets are stored in the feature store under the same names.
+# CCTV comes last: its correlation features read the access control and intercom rows back from the store.
+TABLES = {"access_control": "access_control_logs", "intercom": "intercom_logs", "cctv": "cctv_logs"}
+
+# Streaming mode: rows fetched per server-side cursor round trip and preprocessed per chunk
+STREAM_CHUNK_ROWS = 50000
+
+# Dataset names used in validation log messages
+DATASET_LABELS = {"cctv": "CCTV Data", "access_control": "Access Control Data", "intercom": "Intercom Data"}
+
+# Device ID column per dataset, used to partition preprocessing work
+DEVICE_COLUMNS = {"cctv": "camera_id", "access_control": "door_id", "intercom": "intercom_id"}
+
+# Fixed status vocabularies, so encodings stay identical across incremental runs
+STATUS_CLASSES = {"cctv": ['offline', 'online'], "intercom": ['active', 'inactive']}
+
 
 # Load data from PostgreSQL with parallel processing
-def load_data(query):
+def load_data(query, params=None):
     try:
         conn = psycopg2.connect(
             host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
             user=DB_USER, password=DB_PASSWORD
         )
-        df = pd.read_sql_query(query, conn)
+        df = pd.read_sql_query(query, conn, params=params)
         conn.close()
         logging.info(f"Data successfully loaded from query: {query}")
         return df
@@ -41,18 +69,40 @@ def load_data(query):
         return None
 
 
-# Load all datasets in parallel
-def load_all_data_parallel():
+# Query for one table, optionally bounded to rows ingested in (since, until]. The bounds are on ingested_at,
+# the insert time PostgreSQL records (see schema_management.py), not the device timestamp, so rows that land
+# late (spool segments replayed after an outage, pushed events carrying device time) are prepared by the next
+# run instead of falling behind the watermark. Rows written before ingested_at existed have it NULL and are
+# bounded by their event timestamp instead.
+def build_query(table, since=None, until=None):
+    conditions, params = [], {}
+    if since is not None:
+        conditions.append("(ingested_at > %(since)s OR (ingested_at IS NULL AND timestamp > %(since)s))")
+        params["since"] = since
+    if until is not None:
+        conditions.append("(ingested_at <= %(until)s OR ingested_at IS NULL)")
+        params["until"] = until
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT * FROM {table}{where} ORDER BY timestamp", params
+
+
+# Newest ingestion time in a batch of raw rows (the event time for rows without one); the next run resumes after it
+def newest_ingested(df):
+    return pd.to_datetime(df['ingested_at']).fillna(pd.to_datetime(df['timestamp'])).max()
+
+
+# Load all datasets in parallel; watermarks maps dataset name -> newest ingestion time already prepared
+def load_all_data_parallel(watermarks=None, until=None):
+    watermarks = watermarks or {}
     queries = [
-        ("SELECT * FROM cctv_logs", "cctv"),
-        ("SELECT * FROM access_control_logs", "access_control"),
-        ("SELECT * FROM intercom_logs", "intercom")
+        build_query(table, watermarks.get(name), until) + (name,)
+        for name, table in TABLES.items()
     ]
 
     def fetch_data(query_tuple):
-        query, name = query_tuple
+        query, params, name = query_tuple
         logging.info(f"Loading data for {name}")
-        return (name, load_data(query))
+        return (name, load_data(query, params or None))
 
     with concurrent.futures.ThreadPoolExecutor() as executor:
         results = executor.map(fetch_data, queries)
@@ -66,12 +116,26 @@ def load_all_data_parallel():
     return data_dict['cctv'], data_dict['access_control'], data_dict['intercom']
 
 
-# Memory-efficient data types
-def optimize_dtypes(df):
-    for col in df.select_dtypes(include=['int', 'float']).columns:
-        df[col] = pd.to_numeric(df[col], downcast='unsigned')
-    logging.info(f"Optimized dtypes for DataFrame with {df.shape[0]} rows and {df.shape[1]} columns")
-    return df
+# Read the per-table high-water marks; a missing file means nothing has been prepared yet
+def load_watermarks(path=WATERMARK_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {name: datetime.fromisoformat(value) for name, value in json.load(f).items()}
+
+
+# Write the high-water marks atomically so an interrupted run never leaves a half-written file
+def save_watermarks(watermarks, path=WATERMARK_FILE):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({name: value.isoformat() for name, value in watermarks.items()}, f, indent=2)
+    os.replace(tmp_path, path)
+    logging.info(f"Watermarks updated: {watermarks}")
+
+
+# Status encoding against a fixed vocabulary (unknown values become -1)
+def encode_status(series, classes):
+    return pd.Categorical(series, categories=classes).codes.astype('int8')
 
 
 # Data Validation: Checking for duplicates or anomalies
@@ -88,43 +152,67 @@ def validate_data(df, dataset_name):
         raise
 
 
-# Preprocessing and Feature Engineering
-def preprocess_data(cctv_data, access_data, intercom_data):
-    try:
-        logging.info("Starting data preprocessing and feature engineering")
+# Row-level feature engineering for one dataset (no halo, so run_partitioned runs it in one pass)
+def engineer_features(name, df):
+    # Label encoding for categorical variables (status columns)
+    if name in STATUS_CLASSES:
+        df['status_encoded'] = encode_status(df['status'], STATUS_CLASSES[name])
 
-        # Convert timestamps to datetime
-        cctv_data['timestamp'] = pd.to_datetime(cctv_data['timestamp'], errors='coerce')
-        access_data['timestamp'] = pd.to_datetime(access_data['timestamp'], errors='coerce')
-        intercom_data['timestamp'] = pd.to_datetime(intercom_data['timestamp'], errors='coerce')
+    # Feature Engineering: Time-based features
+    df['hour_of_day'] = compact_column(df['timestamp'].dt.hour, 'int8')
 
-        # Handle missing values by forward filling and dropping irrelevant rows
-        cctv_data.fillna(method='ffill', inplace=True)
-        access_data.fillna(method='ffill', inplace=True)
-        intercom_data.fillna(method='ffill', inplace=True)
+    if name == 'cctv':
+        # Online flag used as a model feature
+        df['is_online'] = (df['status'] == 'online').astype('int8')
 
-        # Optimize data types for efficiency
-        cctv_data = optimize_dtypes(cctv_data)
-        access_data = optimize_dtypes(access_data)
-        intercom_data = optimize_dtypes(intercom_data)
+        # Create labels for CCTV failure (e.g., predict offline events)
+        df['label_failure'] = (df['status'] == 'offline').astype('int8')
+    return df
 
-        # Label encoding for categorical variables (status columns)
-        le = LabelEncoder()
-        cctv_data['status_encoded'] = le.fit_transform(cctv_data['status'])
-        intercom_data['status_encoded'] = le.fit_transform(intercom_data['status'])
 
-        # Feature Engineering: Time-based features
-        cctv_data['hour_of_day'] = cctv_data['timestamp'].dt.hour
-        access_data['hour_of_day'] = access_data['timestamp'].dt.hour
-        intercom_data['hour_of_day'] = intercom_data['timestamp'].dt.hour
+# Preprocessing and feature engineering for one dataset ("cctv", "access_control" or "intercom").
+# Missing values are forward filled per device, so a device is only ever filled from its own earlier rows.
+# carry holds each device's last row from earlier chunks when streaming (see device_carry), so the fill
+# continues across chunks. It runs on the whole frame before partitioning, so partitioned feature
+# engineering sees the same filled rows whatever the partition boundaries.
+def preprocess_frame(name, df, carry=None):
+    # Convert timestamps to datetime
+    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+
+    # Handle missing values by forward filling within each device
+    id_column = DEVICE_COLUMNS[name]
+    context_rows = 0
+    if carry is not None and not carry.empty:
+        df = pd.concat([carry, df], ignore_index=True)
+        context_rows = len(carry)
+    filled = df.groupby(id_column, sort=False, observed=True, dropna=False).ffill()
+    df[filled.columns] = filled
+    df = df.iloc[context_rows:].reset_index(drop=True)
+
+    # Compact dtypes: categorical IDs and statuses, int8 flags, float32 measurements
+    df = compact_frame(df, DATASET_LABELS[name])
+
+    df = run_partitioned(df, DEVICE_COLUMNS[name], functools.partial(engineer_features, name))
+
+    # Validate data
+    validate_data(df, DATASET_LABELS[name])
+    return df
 
-        # Create labels for CCTV failure (e.g., predict offline events)
-        cctv_data['label_failure'] = (cctv_data['status'] == 'offline').astype(int)
 
-        # Validate data for each dataset
-        validate_data(cctv_data, 'CCTV Data')
-        validate_data(access_data, 'Access Control Data')
-        validate_data(intercom_data, 'Intercom Data')
+# Each device's last row across the previous carry and a processed chunk, for the next chunk's forward fill
+def device_carry(name, carry, processed, raw_columns):
+    rows = processed[raw_columns] if carry is None else pd.concat([carry, processed[raw_columns]], ignore_index=True)
+    return rows.groupby(DEVICE_COLUMNS[name], sort=False, observed=True, dropna=False).tail(1)
+
+
+# Preprocessing and Feature Engineering
+def preprocess_data(cctv_data, access_data, intercom_data):
+    try:
+        logging.info("Starting data preprocessing and feature engineering")
+
+        cctv_data = preprocess_frame('cctv', cctv_data)
+        access_data = preprocess_frame('access_control', access_data)
+        intercom_data = preprocess_frame('intercom', intercom_data)
 
         logging.info("Successfully preprocessed data")
         return cctv_data, access_data, intercom_data
@@ -134,58 +222,209 @@ def preprocess_data(cctv_data, access_data, intercom_data):
         raise
 
 
-# Feature Scaling to improve model convergence
-def scale_features(X):
+# Stream a query through a named (server-side) cursor, yielding DataFrames of at most chunk_rows rows
+def stream_data(query, params=None, chunk_rows=STREAM_CHUNK_ROWS, cursor_name='prep_stream'):
+    conn = psycopg2.connect(
+        host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
+        user=DB_USER, password=DB_PASSWORD
+    )
     try:
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        logging.info("Features successfully scaled using StandardScaler")
-        return X_scaled
+        cursor = conn.cursor(name=cursor_name)
+        cursor.itersize = chunk_rows
+        cursor.execute(query, params)
+        columns = None
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            columns = columns or [column[0] for column in cursor.description]
+            yield pd.DataFrame.from_records(rows, columns=columns)
+        cursor.close()
+    finally:
+        conn.close()
+
+
+# Streaming preparation for one dataset: each chunk is preprocessed and written to the run's staging area
+# before the next is fetched, so memory stays bounded by chunk_rows regardless of history size.
+# Returns the newest ingestion time seen (None when there were no rows).
+def stream_prepare_dataset(name, run_id, since=None, until=None, append=False, chunk_rows=STREAM_CHUNK_ROWS):
+    query, params = build_query(TABLES[name], since, until)
+    carry, newest, total_rows = None, None, 0
+    zones = event_correlation.load_zones() if name == 'cctv' else None
+
+    for chunk in stream_data(query, params or None, chunk_rows, cursor_name=f"prep_{name}"):
+        chunk_newest = newest_ingested(chunk)
+        newest = chunk_newest if newest is None else max(newest, chunk_newest)  # chunks come in event time order
+        chunk = chunk.drop(columns='ingested_at')
+        raw_columns = list(chunk.columns)
+        processed = preprocess_frame(name, chunk, carry)
+        carry = device_carry(name, carry, processed, raw_columns)
+        if name == 'cctv':
+            processed = add_correlation_features(processed, zones, run_id, append)
+
+        total_rows += feature_store.write_frame(processed, name, feature_store.staging_path(run_id))
+
+    logging.info(f"Streamed {total_rows} rows of {name} data into the feature store")
+    return newest.to_pydatetime() if newest is not None else None
+
+
+# Fit the shared feature pipeline (feature list, status vocabulary, scaler) on the prepared CCTV history.
+# Incremental runs keep the existing artifact, so serving scales features exactly as the deployed models
+# were trained; a full rebuild (or a missing artifact) fits a new one. The history is read one day
+# partition at a time and fitted incrementally, so memory stays bounded as in --stream preparation.
+def fit_feature_pipeline(refit=False, path=FEATURE_PIPELINE_FILE):
+    try:
+        if not refit and os.path.exists(path):
+            logging.info(f"Keeping existing feature pipeline {path}")
+            return None
+        pipeline, carry, total_rows = FeaturePipeline(), None, 0
+        for day in feature_store.iter_day_frames('cctv', columns=['timestamp', 'camera_id', 'status', 'motion_detected']):
+            carry = pipeline.partial_fit(day.sort_values('timestamp', kind='stable'), carry)
+            total_rows += len(day)
+        if total_rows == 0:
+            logging.warning("No prepared CCTV data, feature pipeline not fitted")
+            return None
+        logging.info(f"Fitted feature pipeline on {total_rows} CCTV rows")
+        pipeline.save(path)
+        return pipeline
     except Exception as e:
-        logging.error(f"Error in scale_features: {e}")
+        logging.error(f"Error fitting feature pipeline: {e}")
         raise
 
 
-# Save processed data to disk
-def save_processed_data(cctv_data, access_data, intercom_data):
+# Prepared rows of one dataset in [start, end]: the rows staged by run_id and, when appending (or outside
+# a run), the rows committed to the feature store by earlier runs
+def load_prepared(name, columns, start, end, run_id=None, append=True):
+    frames = []
+    if run_id is not None:
+        frames.append(feature_store.load_frame(name, columns, start, end, root=feature_store.staging_path(run_id)))
+    if append or run_id is None:
+        frames.append(feature_store.load_frame(name, columns, start, end))
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+# Cross-system features for CCTV rows (door denials and intercom status in the camera's zone). Context
+# comes from the feature store, so rows prepared by earlier incremental runs are included near the watermark.
+def add_correlation_features(cctv_data, zones=None, run_id=None, append=True):
+    if cctv_data.empty:
+        return cctv_data
+    start = cctv_data['timestamp'].min() - event_correlation.LOOKBACK
+    end = cctv_data['timestamp'].max()
+    access = load_prepared('access_control', ['timestamp', 'door_id', 'access_granted'], start, end, run_id, append)
+    intercom = load_prepared('intercom', ['timestamp', 'intercom_id', 'status'], start, end, run_id, append)
+    return event_correlation.correlate(cctv_data, access, intercom,
+                                       zones if zones is not None else event_correlation.load_zones())
+
+
+# Write processed data to the run's staging area; commit_run later appends it to the feature store, or
+# replaces the stored datasets when append is False
+def save_processed_data(cctv_data, access_data, intercom_data, run_id, append=False):
     try:
-        cctv_data.to_csv('processed_cctv_data.csv', index=False)
-        access_data.to_csv('processed_access_data.csv', index=False)
-        intercom_data.to_csv('processed_intercom_data.csv', index=False)
-        logging.info("Processed data successfully saved to disk")
+        datasets = {"access_control": access_data, "intercom": intercom_data, "cctv": cctv_data}
+        for name, df in datasets.items():
+            if name == 'cctv':
+                df = add_correlation_features(df, run_id=run_id, append=append)
+            feature_store.write_frame(df, name, feature_store.staging_path(run_id))
+        logging.info(f"Processed data successfully staged for the feature store ({'append' if append else 'rebuild'})")
     except Exception as e:
         logging.error(f"Error saving processed data to disk: {e}")
         raise
 
 
-# Main function to handle data preparation
-def main():
+# Commit a staged run to the feature store together with its watermarks: the marker written by
+# commit_run holds them, so a crash after the commit still advances the watermarks on the next start
+def commit_prepared_run(run_id, new_watermarks, append):
+    feature_store.commit_run(run_id, replace=() if append else list(TABLES),
+                             metadata={'watermarks': {name: value.isoformat() for name, value in new_watermarks.items()}})
+    save_watermarks(new_watermarks)
+    feature_store.discard_run(run_id)
+
+
+# Finish runs a crash interrupted: committed ones are moved into the store and their watermarks saved,
+# uncommitted ones are dropped, so their rows are prepared again from the unchanged watermarks
+def recover_runs(root=feature_store.FEATURE_STORE_DIR):
+    for run_id in feature_store.staged_runs(root):
+        metadata = feature_store.finish_run(run_id, root)
+        if metadata is not None:
+            save_watermarks({name: datetime.fromisoformat(value) for name, value in metadata['watermarks'].items()})
+            logging.info(f"Completed interrupted run {run_id}")
+        else:
+            logging.warning(f"Discarding uncommitted run {run_id}")
+        feature_store.discard_run(run_id, root)
+
+
+# Refresh the memory-mappable Arrow files the training notebook loads. Only a full rebuild exports them
+# here; incremental commits drop the stale files and the notebook's load exports them on demand.
+def export_training_files():
+    for name in TABLES:
+        try:
+            feature_store.export_training_file(name)
+        except Exception as e:
+            logging.warning(f"Could not export training file for {name}: {e}")
+
+
+# Main function to handle data preparation. By default only rows newer than each table's
+# watermark are loaded, preprocessed and appended; full_rebuild re-prepares all history.
+# stream processes each table in fixed-size chunks through server-side cursors to bound memory.
+def main(full_rebuild=False, stream=False):
+    run_id = None
     try:
+        recover_runs()
+        watermarks = {} if full_rebuild else load_watermarks()
+        until = datetime.now() - timedelta(minutes=WATERMARK_LAG_MINUTES)
+        logging.info(f"Starting {'full rebuild' if full_rebuild or not watermarks else 'incremental run'} "
+                     f"up to {until}, watermarks: {watermarks}")
+
+        if stream:
+            run_id = feature_store.begin_run()
+            new_watermarks = dict(watermarks)
+            for name in TABLES:
+                newest = stream_prepare_dataset(name, run_id, watermarks.get(name), until, append=bool(watermarks))
+                if newest is not None:
+                    new_watermarks[name] = newest
+            commit_prepared_run(run_id, new_watermarks, append=bool(watermarks))
+            if not watermarks:
+                export_training_files()
+            fit_feature_pipeline(refit=not watermarks)
+            logging.info("Streaming data preparation completed successfully")
+            return
+
         # Load the data in parallel
-        cctv_data, access_data, intercom_data = load_all_data_parallel()
+        cctv_data, access_data, intercom_data = load_all_data_parallel(watermarks, until)
+        if cctv_data.empty and access_data.empty and intercom_data.empty:
+            logging.info("No new data since the last run")
+            return
+
+        # New watermarks come from the raw rows, before preprocessing drops any of them
+        new_watermarks = dict(watermarks)
+        for name, df in (("cctv", cctv_data), ("access_control", access_data), ("intercom", intercom_data)):
+            if not df.empty:
+                new_watermarks[name] = newest_ingested(df).to_pydatetime()
+        cctv_data, access_data, intercom_data = (df.drop(columns='ingested_at')
+                                                 for df in (cctv_data, access_data, intercom_data))
 
         # Preprocess the data
         cctv_data, access_data, intercom_data = preprocess_data(cctv_data, access_data, intercom_data)
 
-        # Split CCTV data into features and labels for modeling
-        X_cctv = cctv_data[['motion_detected', 'is_online', 'hour_of_day']]
-        y_cctv = cctv_data['label_failure']
-
-        # Scale features
-        X_cctv_scaled = scale_features(X_cctv)
-
-        # Split the data into training and testing sets
-        X_train, X_test, y_train, y_test = train_test_split(X_cctv_scaled, y_cctv, test_size=0.2, random_state=42)
-        logging.info(f"Data split into training and testing sets. Training set size: {X_train.shape}")
-
-        # Save the processed data for model training
-        save_processed_data(cctv_data, access_data, intercom_data)
+        # Stage the processed data for model training, then commit it together with the new watermarks
+        run_id = feature_store.begin_run()
+        save_processed_data(cctv_data, access_data, intercom_data, run_id, append=bool(watermarks))
+        commit_prepared_run(run_id, new_watermarks, append=bool(watermarks))
+        if not watermarks:
+            export_training_files()
+        fit_feature_pipeline(refit=not watermarks)
 
         logging.info("Data preparation completed successfully")
     except Exception as e:
         logging.error(f"Error in main function: {e}")
+        if run_id is not None and not feature_store.committed(run_id):
+            feature_store.discard_run(run_id)  # nothing was committed; the next run starts from the same watermarks
         raise
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Prepare security system logs for model training")
+    parser.add_argument("--full-rebuild", action="store_true", help="ignore watermarks and re-prepare all history")
+    parser.add_argument("--stream", action="store_true", help="prepare in bounded-memory chunks via server-side cursors")
+    args = parser.parse_args()
+    main(full_rebuild=args.full_rebuild, stream=args.stream)
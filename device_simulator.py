@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import logging
+import math
+import random
+import zlib
+from aiohttp import web
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('DeviceSimulator')
+
+# Default simulated fleet and behaviour
+SIMULATOR_HOST = '127.0.0.1'
+SIMULATOR_PORT = 8080
+CAMERA_COUNT = 200
+DOOR_COUNT = 50
+INTERCOM_COUNT = 20
+LATENCY_DISTRIBUTION = 'lognormal'  # fixed, uniform or lognormal
+LATENCY_MEAN_MS = 20.0
+LATENCY_SPREAD = 0.5  # lognormal sigma, or +/- fraction of the mean for uniform
+ERROR_RATE = 0.01  # fraction of requests answered with HTTP 500
+OFFLINE_RATIO = 0.05  # fraction of devices that report offline / inactive
+
+
+# Per-request latency in seconds drawn from the configured distribution
+def sample_latency(rng, distribution, mean_ms, spread):
+    if distribution == 'fixed':
+        latency_ms = mean_ms
+    elif distribution == 'uniform':
+        latency_ms = rng.uniform(mean_ms * (1 - spread), mean_ms * (1 + spread))
+    elif distribution == 'lognormal':
+        # Parameterised so the distribution mean equals mean_ms, with a long tail controlled by spread
+        mu = math.log(mean_ms) - spread ** 2 / 2
+        latency_ms = rng.lognormvariate(mu, spread)
+    else:
+        raise ValueError(f"Unknown latency distribution: {distribution}")
+    return max(latency_ms, 0) / 1000
+
+
+# Offline devices are chosen by a stable hash so the same devices stay offline across cycles
+def is_offline(device_id, offline_ratio):
+    return zlib.crc32(device_id.encode()) % 10000 < offline_ratio * 10000
+
+
+# Parses IDs such as CAM_042 and checks they fall inside the simulated fleet
+def device_number(device_id, prefix, count):
+    head, _, number = device_id.partition('_')
+    if head != prefix or not number.isdigit():
+        return None
+    value = int(number)
+    return value if 1 <= value <= count else None
+
+
+# aiohttp application serving the collector's device status endpoints, plus /stats request counters
+def create_app(cameras=CAMERA_COUNT, doors=DOOR_COUNT, intercoms=INTERCOM_COUNT,
+               latency_distribution=LATENCY_DISTRIBUTION, latency_mean_ms=LATENCY_MEAN_MS,
+               latency_spread=LATENCY_SPREAD, error_rate=ERROR_RATE, offline_ratio=OFFLINE_RATIO, seed=42):
+    rng = random.Random(seed)
+    stats = {'requests': 0, 'errors': 0}
+
+    def device_handler(prefix, count, build_payload):
+        async def handler(request):
+            stats['requests'] += 1
+            device_id = request.match_info['device_id']
+            if device_number(device_id, prefix, count) is None:
+                raise web.HTTPNotFound()
+
+            await asyncio.sleep(sample_latency(rng, latency_distribution, latency_mean_ms, latency_spread))
+            if rng.random() < error_rate:
+                stats['errors'] += 1
+                raise web.HTTPInternalServerError()
+            return web.json_response(build_payload(device_id, is_offline(device_id, offline_ratio)))
+        return handler
+
+    def camera_payload(device_id, offline):
+        return {"status": "offline" if offline else "online", "motion_detected": int(rng.random() < 0.2)}
+
+    def door_payload(device_id, offline):
+        return {"access_granted": 0 if offline or rng.random() < 0.1 else 1}
+
+    def intercom_payload(device_id, offline):
+        return {"status": "inactive" if offline else "active"}
+
+    async def stats_handler(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get('/cameras/{device_id}/status', device_handler('CAM', cameras, camera_payload))
+    app.router.add_get('/access-control/{device_id}/status', device_handler('DOOR', doors, door_payload))
+    app.router.add_get('/intercoms/{device_id}/status', device_handler('INT', intercoms, intercom_payload))
+    app.router.add_get('/stats', stats_handler)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated CCTV, access control and intercom device API")
+    parser.add_argument("--host", default=SIMULATOR_HOST)
+    parser.add_argument("--port", type=int, default=SIMULATOR_PORT)
+    parser.add_argument("--cameras", type=int, default=CAMERA_COUNT)
+    parser.add_argument("--doors", type=int, default=DOOR_COUNT)
+    parser.add_argument("--intercoms", type=int, default=INTERCOM_COUNT)
+    parser.add_argument("--latency-distribution", choices=['fixed', 'uniform', 'lognormal'], default=LATENCY_DISTRIBUTION)
+    parser.add_argument("--latency-mean-ms", type=float, default=LATENCY_MEAN_MS)
+    parser.add_argument("--latency-spread", type=float, default=LATENCY_SPREAD)
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    parser.add_argument("--offline-ratio", type=float, default=OFFLINE_RATIO)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app(args.cameras, args.doors, args.intercoms, args.latency_distribution, args.latency_mean_ms,
+                     args.latency_spread, args.error_rate, args.offline_ratio, args.seed)
+    logger.info(f"Simulating {args.cameras} cameras, {args.doors} doors and {args.intercoms} intercoms "
+                f"on http://{args.host}:{args.port}")
+    web.run_app(app, host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import logging
+
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+import feature_store
+from cascade_inference import evaluate_cascade, CASCADE_LOW, CASCADE_HIGH
+from model_registry import ModelRegistry
+
+# Logging configuration
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def parse_band(value):
+    low, high = (float(part) for part in value.split(','))
+    if not 0 <= low <= high <= 1:
+        raise argparse.ArgumentTypeError(f"band must be low,high with 0 <= low <= high <= 1, got {value}")
+    return low, high
+
+
+# Held-out rows of the training notebook's split: same ordering, features and train_test_split arguments
+def load_test_split():
+    cctv_data = feature_store.load_training_frame('cctv').sort_values('timestamp', kind='stable', ignore_index=True)
+    bundle = ModelRegistry().current()
+    X = bundle.feature_pipeline.transform_frame(cctv_data)
+    y = cctv_data['label_failure']
+    _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    return bundle, X_test, y_test
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cascade inference with the single models on held-out data")
+    parser.add_argument("--band", type=parse_band, action='append', dest='bands',
+                        help=f"uncertainty band low,high sent to the forest (repeatable; default "
+                             f"{CASCADE_LOW:g},{CASCADE_HIGH:g} plus a narrower and a wider band)")
+    args = parser.parse_args()
+    bands = args.bands or [(CASCADE_LOW, CASCADE_HIGH), (0.2, 0.8), (0.05, 0.95)]
+
+    bundle, X_test, y_test = load_test_split()
+    results = evaluate_cascade(bundle.lr_model, bundle.rf_model, X_test, y_test, bands)
+    print(f"Model version {bundle.version}, {len(y_test):,} held-out rows\n")
+    with pd.option_context('display.float_format', '{:.4f}'.format, 'display.width', 120):
+        print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+# Zone map and correlation windows (can be set via environment variables for Docker)
+ZONES_FILE = os.getenv('DEVICE_ZONES_FILE', 'device_zones.json')  # {"lobby": ["CAM_001", "DOOR_001", "INT_001"], ...}
+DEFAULT_ZONE = 'site'  # devices missing from the zone map share one site-wide zone
+DENIAL_WINDOW = pd.Timedelta(minutes=int(os.getenv('DENIAL_WINDOW_MINUTES', 5)))
+INTERCOM_STALE_AFTER = pd.Timedelta(minutes=int(os.getenv('INTERCOM_STALE_MINUTES', 10)))  # older reports count as unknown
+LOOKBACK = max(DENIAL_WINDOW, INTERCOM_STALE_AFTER)  # history a CCTV row can depend on
+
+CORRELATION_FEATURES = ['zone', 'door_denials_window', 'door_attempts_window', 'seconds_since_denial',
+                        'intercom_inactive', 'intercom_inactive_while_offline']
+
+logger = logging.getLogger(__name__)
+
+
+# Flatten the zone file into {device_id: zone}; no file means every device is in DEFAULT_ZONE
+def load_zones(path=ZONES_FILE):
+    if not os.path.exists(path):
+        logger.info(f"No zone map at {path}, correlating events site-wide")
+        return {}
+    with open(path) as f:
+        return {device_id: zone for zone, device_ids in json.load(f).items() for device_id in device_ids}
+
+
+# Zone name per row; the lookup runs once per distinct device, not per row
+def zone_of(device_ids, zones):
+    devices = pd.Categorical(device_ids)
+    device_zones = np.array([zones.get(device_id, DEFAULT_ZONE) for device_id in devices.categories] + [DEFAULT_ZONE],
+                            dtype=object)
+    return device_zones[devices.codes]  # code -1 (missing ID) picks the trailing DEFAULT_ZONE
+
+
+def event_times(df):
+    return pd.to_datetime(df['timestamp'], errors='coerce').to_numpy().astype('datetime64[ns]')
+
+
+# Correlation features for CCTV rows, returned in the input row order:
+#   door_denials_window / door_attempts_window - access attempts (denied / all) in the camera's zone during
+#                                                the DENIAL_WINDOW before the row, inclusive of the row time
+#   seconds_since_denial                       - time since the last denial in the zone (NaN if none)
+#   intercom_inactive                          - the zone's latest intercom report is 'inactive' (and fresh)
+#   intercom_inactive_while_offline            - intercom inactive while this camera reports offline
+# Everything is computed with merge_asof on zone codes, so cost grows with rows, not rows x events.
+def correlate(cctv, access, intercom, zones=None, window=DENIAL_WINDOW, stale_after=INTERCOM_STALE_AFTER):
+    zones = zones or {}
+    camera_zone = zone_of(cctv['camera_id'], zones)
+    door_zone = zone_of(access['door_id'], zones)
+    intercom_zone = zone_of(intercom['intercom_id'], zones)
+    categories = pd.unique(np.concatenate([camera_zone, door_zone, intercom_zone, [DEFAULT_ZONE]]))
+
+    def codes(zone_names):
+        return pd.Categorical(zone_names, categories=categories).codes.astype(np.int32)
+
+    cameras = pd.DataFrame({'timestamp': event_times(cctv), 'zone': codes(camera_zone), 'row': np.arange(len(cctv))})
+    cameras = cameras.dropna(subset=['timestamp']).sort_values('timestamp', kind='stable', ignore_index=True)
+
+    attempts = pd.DataFrame({'timestamp': event_times(access), 'zone': codes(door_zone),
+                             'denied': (pd.to_numeric(access['access_granted']) == 0).to_numpy()})
+    attempts = attempts.dropna(subset=['timestamp']).sort_values('timestamp', kind='stable', ignore_index=True)
+    attempts['attempts_total'] = attempts.groupby('zone').cumcount() + 1
+    attempts['denials_total'] = attempts.groupby('zone')['denied'].cumsum()
+
+    # Running totals as of a probe time; a window count is the difference of two as-of lookups
+    def totals_at(times):
+        probe = pd.DataFrame({'timestamp': times, 'zone': cameras['zone'].to_numpy()})
+        merged = pd.merge_asof(probe, attempts[['timestamp', 'zone', 'attempts_total', 'denials_total']],
+                               on='timestamp', by='zone', direction='backward')
+        return merged[['attempts_total', 'denials_total']].fillna(0).to_numpy(np.int64)
+
+    counts = totals_at(cameras['timestamp']) - totals_at(cameras['timestamp'] - window)
+
+    denials = attempts.loc[attempts['denied'], ['timestamp', 'zone']].rename(columns={'timestamp': 'denied_at'})
+    last_denial = pd.merge_asof(cameras, denials, left_on='timestamp', right_on='denied_at', by='zone',
+                                direction='backward')
+    since_denial = (last_denial['timestamp'] - last_denial['denied_at']).dt.total_seconds().to_numpy(np.float32)
+
+    reports = pd.DataFrame({'timestamp': event_times(intercom), 'zone': codes(intercom_zone),
+                            'intercom_status': pd.Series(intercom['status']).astype(object).to_numpy()})
+    reports = reports.dropna(subset=['timestamp']).sort_values('timestamp', kind='stable', ignore_index=True)
+    latest_report = pd.merge_asof(cameras, reports, on='timestamp', by='zone', direction='backward',
+                                  tolerance=stale_after)
+    inactive = (latest_report['intercom_status'] == 'inactive').to_numpy()
+
+    # Scatter back into input order; rows without a timestamp keep the neutral defaults
+    rows = cameras['row'].to_numpy()
+    denials_window = np.zeros(len(cctv), dtype=np.int32)
+    attempts_window = np.zeros(len(cctv), dtype=np.int32)
+    seconds_since = np.full(len(cctv), np.nan, dtype=np.float32)
+    intercom_inactive = np.zeros(len(cctv), dtype=np.int8)
+    denials_window[rows], attempts_window[rows] = counts[:, 1], counts[:, 0]
+    seconds_since[rows] = since_denial
+    intercom_inactive[rows] = inactive
+
+    offline = (pd.Series(cctv['status']).astype(object) == 'offline').to_numpy()
+    return cctv.assign(
+        zone=pd.Categorical(camera_zone),
+        door_denials_window=denials_window,
+        door_attempts_window=attempts_window,
+        seconds_since_denial=seconds_since,
+        intercom_inactive=intercom_inactive,
+        intercom_inactive_while_offline=(intercom_inactive.astype(bool) & offline).astype(np.int8)
+    )
+
+
+# Incremental correlation for inference: keeps only the last LOOKBACK of access and intercom events,
+# so each batch of CCTV rows is correlated against recent context without re-reading history.
+class CorrelationState:
+    def __init__(self, zones=None, window=DENIAL_WINDOW, stale_after=INTERCOM_STALE_AFTER):
+        self.zones = zones if zones is not None else load_zones()
+        self.window = window
+        self.stale_after = stale_after
+        self.lookback = max(window, stale_after)
+        self.access = pd.DataFrame({'timestamp': pd.Series(dtype='datetime64[ns]'),
+                                    'door_id': pd.Series(dtype=object), 'access_granted': pd.Series(dtype='int8')})
+        self.intercom = pd.DataFrame({'timestamp': pd.Series(dtype='datetime64[ns]'),
+                                      'intercom_id': pd.Series(dtype=object), 'status': pd.Series(dtype=object)})
+        self.newest = None
+        self.lock = threading.Lock()
+
+    def update(self, access=None, intercom=None):
+        with self.lock:
+            if access is not None and not access.empty:
+                self.access = self.append(self.access, access)
+            if intercom is not None and not intercom.empty:
+                self.intercom = self.append(self.intercom, intercom)
+            self.prune()
+
+    def append(self, current, rows):
+        rows = rows[list(current.columns)].assign(timestamp=event_times(rows))
+        newest = rows['timestamp'].max()
+        if pd.notna(newest) and (self.newest is None or newest > self.newest):
+            self.newest = newest
+        if not len(current):
+            return rows.reset_index(drop=True)
+        # Events already held (re-sent by an overlapping caller) are dropped
+        return pd.concat([current, rows], ignore_index=True).drop_duplicates(ignore_index=True)
+
+    # Drop events too old to affect any CCTV row at or after the newest event seen
+    def prune(self):
+        if self.newest is None:
+            return
+        cutoff = self.newest - self.lookback
+        self.access = self.access[self.access['timestamp'] >= cutoff].reset_index(drop=True)
+        self.intercom = self.intercom[self.intercom['timestamp'] >= cutoff].reset_index(drop=True)
+
+    def features(self, cctv):
+        with self.lock:
+            access, intercom = self.access, self.intercom
+        return correlate(cctv, access, intercom, self.zones, self.window, self.stale_after)
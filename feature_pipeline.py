@@ -0,0 +1,124 @@
+import logging
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+# Fitted feature pipeline, saved next to the model .pkl files (can be set via environment variables for Docker)
+FEATURE_PIPELINE_FILE = os.getenv('FEATURE_PIPELINE_FILE', 'feature_pipeline.pkl')
+FEATURE_PIPELINE_VERSION = 1  # bump whenever build_features changes, so stale artifacts are refused
+
+# Model inputs, in the order the models are trained and served with
+FEATURE_COLUMNS = ['motion_detected', 'motion_avg', 'online_delta', 'hour_of_day']
+ROLLING_WINDOW = 3  # rows per camera in the motion_avg rolling mean
+CCTV_STATUS_CLASSES = ['offline', 'online']  # same fixed vocabulary as data_preparation_for_ml.STATUS_CLASSES
+
+logger = logging.getLogger(__name__)
+
+
+# Unscaled model features for CCTV rows, in the input row order. Works on processed frames (status,
+# camera_id) and on rows that already carry is_online / hour_of_day; window features are per camera.
+# With a rolling_state.RollingState, window features continue each camera's history from earlier batches.
+def build_features(df, status_classes=CCTV_STATUS_CLASSES, window=ROLLING_WINDOW, state=None):
+    features = pd.DataFrame({'motion_detected': pd.to_numeric(df['motion_detected']).to_numpy(np.float32)})
+    if 'is_online' in df:
+        features['is_online'] = pd.to_numeric(df['is_online']).to_numpy(np.float32)
+    else:
+        codes = pd.Categorical(df['status'], categories=status_classes).codes
+        features['is_online'] = (codes == status_classes.index('online')).astype(np.float32)
+    if 'hour_of_day' in df:
+        features['hour_of_day'] = pd.to_numeric(df['hour_of_day']).to_numpy(np.float32)
+    else:
+        features['hour_of_day'] = pd.to_datetime(df['timestamp']).dt.hour.to_numpy(np.float32)
+
+    keys = df['camera_id'] if 'camera_id' in df else np.zeros(len(df), dtype=np.int8)
+    if state is None:
+        features['motion_avg'], features['online_delta'] = window_features(
+            keys, features['motion_detected'].to_numpy(), features['is_online'].to_numpy(), window)
+    else:
+        features['motion_avg'], features['online_delta'], features['motion_ewma'] = state.update(
+            keys, df['timestamp'], features['motion_detected'].to_numpy(), features['is_online'].to_numpy())
+    return features
+
+
+# Per-camera rolling mean of motion and change in online status, computed with sorted cumulative sums
+# instead of a groupby per camera (which dominated the cost of small serving batches)
+def window_features(keys, motion, online, window):
+    codes = pd.factorize(keys, use_na_sentinel=False)[0] if len(keys) else np.zeros(0, dtype=np.intp)
+    order = np.argsort(codes, kind='stable')
+    positions = np.arange(len(order))
+    new_group = np.r_[True, codes[order][1:] != codes[order][:-1]] if len(order) else np.zeros(0, dtype=bool)
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+
+    sorted_motion = motion[order].astype(np.float64)
+    sums = np.r_[0.0, np.cumsum(sorted_motion)]
+    low = np.maximum(positions - window + 1, group_start)
+    motion_avg = np.empty(len(order), dtype=np.float32)
+    motion_avg[order] = (sums[positions + 1] - sums[low]) / (positions + 1 - low)
+
+    sorted_online = online[order]
+    delta = np.where(new_group, 0, sorted_online - np.r_[0, sorted_online[:-1]])
+    online_delta = np.empty(len(order), dtype=np.float32)
+    online_delta[order] = delta
+    return motion_avg, online_delta
+
+
+# Versioned artifact holding everything needed to turn raw CCTV rows into model inputs: the feature list,
+# the status vocabulary and the scaler statistics. Fit once in data preparation, transform-only at serving.
+class FeaturePipeline:
+    def __init__(self, feature_columns=FEATURE_COLUMNS, status_classes=CCTV_STATUS_CLASSES, window=ROLLING_WINDOW):
+        self.version = FEATURE_PIPELINE_VERSION
+        self.feature_columns = list(feature_columns)
+        self.status_classes = list(status_classes)
+        self.window = window
+        self.scaler = StandardScaler()
+        self.mean = None
+        self.scale = None
+
+    def fit(self, df):
+        features = build_features(df, self.status_classes, self.window)[self.feature_columns]
+        self.scaler.fit(features)
+        self.mean = self.scaler.mean_.astype(np.float32)
+        self.scale = self.scaler.scale_.astype(np.float32)
+        logger.info(f"Fitted feature pipeline v{self.version} on {len(features)} rows: {self.feature_columns}")
+        return self
+
+    # Incremental fit over consecutive, time-ordered chunks of the history (e.g. one day at a time), so the
+    # history never has to be in memory at once. carry is the value returned for the previous chunk: each
+    # camera's last rows, prepended as context so window features match a fit over the whole history.
+    def partial_fit(self, df, carry=None):
+        frame = df if carry is None else pd.concat([carry, df], ignore_index=True)
+        context_rows = 0 if carry is None else len(carry)
+        features = build_features(frame, self.status_classes, self.window)[self.feature_columns].iloc[context_rows:]
+        if len(features):
+            self.scaler.partial_fit(features)
+            self.mean = self.scaler.mean_.astype(np.float32)
+            self.scale = self.scaler.scale_.astype(np.float32)
+        return frame.groupby('camera_id', sort=False, observed=True, dropna=False).tail(max(self.window - 1, 1))
+
+    # Scaled model inputs as a float32 array; plain numpy arithmetic, no refit and no per-call validation
+    def transform(self, df, state=None):
+        if self.mean is None:
+            raise ValueError("Feature pipeline has not been fitted")
+        return self.scale_features(build_features(df, self.status_classes, self.window, state))
+
+    def scale_features(self, features):
+        return (features[self.feature_columns].to_numpy(np.float32) - self.mean) / self.scale
+
+    def transform_frame(self, df):
+        return pd.DataFrame(self.transform(df), columns=self.feature_columns, index=df.index)
+
+    def save(self, path=FEATURE_PIPELINE_FILE):
+        tmp_path = f"{path}.tmp"
+        joblib.dump(self, tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Feature pipeline v{self.version} saved to {path}")
+
+    @staticmethod
+    def load(path=FEATURE_PIPELINE_FILE):
+        pipeline = joblib.load(path)
+        if getattr(pipeline, 'version', None) != FEATURE_PIPELINE_VERSION:
+            raise ValueError(f"Feature pipeline {path} is version {getattr(pipeline, 'version', None)}, "
+                             f"expected {FEATURE_PIPELINE_VERSION}; re-run data preparation and training")
+        return pipeline
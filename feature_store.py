@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from frame_compaction import compact_frame
+
+# Feature store location and format (can be set via environment variables for Docker)
+FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR', './feature_store')
+COMPRESSION = 'zstd'
+PARTITION_COLUMNS = ['device_type', 'date']
+DATE_PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')  # below device_type=<name>/
+STAGING_DIR = '_staging'  # per-run staging areas; the leading underscore keeps them out of dataset discovery
+COMMIT_MARKER = '_commit.json'
+
+logger = logging.getLogger(__name__)
+
+
+# Append one processed frame as Parquet files partitioned by device type and day; returns rows written
+def write_frame(df, device_type, root=FEATURE_STORE_DIR):
+    if df.empty:
+        return 0
+    frame = df.assign(
+        device_type=device_type,
+        date=df['timestamp'].dt.strftime('%Y-%m-%d').fillna('unknown')
+    )
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # Categoricals are written as plain strings (Parquet dictionary-encodes them on disk anyway), so
+    # chunks with different category sets or index widths still produce one dataset schema
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    pq.write_to_dataset(
+        table, root_path=root, partition_cols=PARTITION_COLUMNS, compression=COMPRESSION,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",  # unique names, so appends never overwrite
+        existing_data_behavior='overwrite_or_ignore'
+    )
+    logger.info(f"Wrote {len(df)} {device_type} rows to the feature store at {root}")
+    return len(df)
+
+
+# Remove every partition of one device type (used before a full rebuild)
+def clear_device_type(device_type, root=FEATURE_STORE_DIR):
+    path = device_type_path(device_type, root)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+
+def device_type_path(device_type, root=FEATURE_STORE_DIR):
+    return os.path.join(root, f"device_type={device_type}")
+
+
+# Physical schema of each data file, keyed by file name. Names are unique (see write_frame), files are never
+# rewritten, and a name survives the move from a staging area into the store, so a footer is read once.
+FILE_SCHEMA_CACHE_SIZE = int(os.getenv('FILE_SCHEMA_CACHE_SIZE', 100000))
+file_schemas = {}
+
+
+def file_schema(fragment):
+    name = os.path.basename(fragment.path)
+    schema = file_schemas.get(name)
+    if schema is None:
+        if len(file_schemas) >= FILE_SCHEMA_CACHE_SIZE:
+            file_schemas.clear()
+        schema = file_schemas[name] = fragment.physical_schema
+    return schema
+
+
+# Dataset over one device type's partitions, limited to the day partitions in [start, end]. Discovery
+# only lists files; partitions outside the range are dropped before any footer is read. Device types
+# have different columns, and columns can be added over time, so the schema is unified across the
+# selected files' footers instead of taken from the first file.
+def open_dataset(device_type, start=None, end=None, root=FEATURE_STORE_DIR):
+    path = device_type_path(device_type, root)
+    listing = ds.dataset(path, schema=DATE_PARTITIONING.schema, format='parquet', partitioning=DATE_PARTITIONING)
+    expression = None
+    if start is not None:
+        expression = ds.field('date') >= start.strftime('%Y-%m-%d')
+    if end is not None:
+        upper = ds.field('date') <= end.strftime('%Y-%m-%d')
+        expression = upper if expression is None else expression & upper
+    fragments = list(listing.get_fragments(filter=expression))
+    schema = pa.unify_schemas([file_schema(fragment) for fragment in fragments] + [DATE_PARTITIONING.schema])
+    return ds.dataset([fragment.path for fragment in fragments], schema=schema, format='parquet',
+                      partitioning=DATE_PARTITIONING, partition_base_dir=path)
+
+
+# Scanner over one device type with column projection and predicate pushdown. Day partitions outside
+# [start, end] are pruned without being opened; predicate is an optional extra pyarrow expression.
+# None when the device type has no partitions yet.
+def scanner(device_type, columns=None, start=None, end=None, predicate=None, root=FEATURE_STORE_DIR):
+    if not os.path.isdir(device_type_path(device_type, root)):
+        return None
+    dataset = open_dataset(device_type, start, end, root)
+    expression = None
+    if start is not None:
+        expression = (ds.field('date') >= start.strftime('%Y-%m-%d')) & (ds.field('timestamp') >= start)
+    if end is not None:
+        upper = (ds.field('date') <= end.strftime('%Y-%m-%d')) & (ds.field('timestamp') <= end)
+        expression = upper if expression is None else expression & upper
+    if predicate is not None:
+        expression = predicate if expression is None else expression & predicate
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name not in PARTITION_COLUMNS]
+    filtered = ['timestamp'] if start is not None or end is not None else []
+    missing = [name for name in dict.fromkeys(list(columns) + filtered) if name not in dataset.schema.names]
+    if missing:  # columns no selected file has scan as nulls, as they would from a file written without them
+        dataset = dataset.replace_schema(pa.unify_schemas([dataset.schema, pa.schema([(name, pa.null()) for name in missing])]))
+    return dataset.scanner(columns=columns, filter=expression)
+
+
+# Scan into one table; a device type with no partitions yet scans as an empty table with the requested columns
+def scan(device_type, columns=None, start=None, end=None, predicate=None, root=FEATURE_STORE_DIR):
+    source = scanner(device_type, columns, start, end, predicate, root)
+    if source is None:
+        return pa.table({column: pa.array([], pa.null()) for column in columns or []})
+    return source.to_table()
+
+
+# Staged runs: a preparation run writes its files with root=staging_path(run_id), which mirrors the store
+# layout, and commit_run moves them into the store. A run that fails before committing leaves the store
+# untouched. The commit marker records the run's metadata (e.g. watermarks), so a run interrupted while
+# committing can be finished by finish_run from staged_runs() on the next start.
+def staging_path(run_id, root=FEATURE_STORE_DIR):
+    return os.path.join(root, STAGING_DIR, run_id)
+
+
+def begin_run(root=FEATURE_STORE_DIR):
+    run_id = uuid.uuid4().hex
+    os.makedirs(staging_path(run_id, root))
+    return run_id
+
+
+def committed(run_id, root=FEATURE_STORE_DIR):
+    return os.path.exists(os.path.join(staging_path(run_id, root), COMMIT_MARKER))
+
+
+def staged_runs(root=FEATURE_STORE_DIR):
+    path = os.path.join(root, STAGING_DIR)
+    return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+
+# Commit a staged run: device types in replace are swapped for the staged ones (a full rebuild), the
+# others get the staged files appended. Returns metadata; call discard_run once it has been persisted.
+def commit_run(run_id, replace=(), metadata=None, root=FEATURE_STORE_DIR):
+    path = staging_path(run_id, root)
+    for device_type in replace:
+        os.makedirs(device_type_path(device_type, path), exist_ok=True)  # present until swapped in
+    tmp_path = os.path.join(path, f"{COMMIT_MARKER}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({'replace': list(replace), 'metadata': metadata}, f)
+    os.replace(tmp_path, os.path.join(path, COMMIT_MARKER))
+    return finish_run(run_id, root)
+
+
+# Move a committed run's files into the store; safe to repeat after a crash, since every step removes
+# what it has moved from the staging area. Returns the run's metadata, or None if it never committed.
+def finish_run(run_id, root=FEATURE_STORE_DIR):
+    path = staging_path(run_id, root)
+    if not committed(run_id, root):
+        return None
+    with open(os.path.join(path, COMMIT_MARKER)) as f:
+        commit = json.load(f)
+    changed = set(commit['replace']) | {entry.split('=', 1)[1] for entry in os.listdir(path) if entry.startswith('device_type=')}
+
+    for device_type in commit['replace']:
+        staged, target = device_type_path(device_type, path), device_type_path(device_type, root)
+        if not os.path.isdir(staged):
+            continue  # already swapped in
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        if os.listdir(staged):
+            os.replace(staged, target)
+        else:
+            os.rmdir(staged)
+
+    for directory, _, files in os.walk(path):
+        relative = os.path.relpath(directory, path)
+        if relative == '.':
+            continue
+        for name in files:
+            target_directory = os.path.join(root, relative)
+            os.makedirs(target_directory, exist_ok=True)
+            os.replace(os.path.join(directory, name), os.path.join(target_directory, name))
+    # Training files of changed device types are stale; load_training_frame exports them again on demand
+    for device_type in changed:
+        if os.path.exists(training_file(device_type, root)):
+            os.remove(training_file(device_type, root))
+    logger.info(f"Committed feature store run {run_id}")
+    return commit['metadata']
+
+
+def discard_run(run_id, root=FEATURE_STORE_DIR):
+    shutil.rmtree(staging_path(run_id, root), ignore_errors=True)
+
+
+# Load one device type as a compact DataFrame; strings are decoded straight into categoricals
+def load_frame(device_type, columns=None, start=None, end=None, predicate=None, root=FEATURE_STORE_DIR):
+    table = scan(device_type, columns, start, end, predicate, root)
+    return compact_frame(table.to_pandas(strings_to_categorical=True), f"{device_type} features")
+
+
+# Day partitions of one device type in time order ('unknown', for rows without a timestamp, sorts last)
+def partition_dates(device_type, root=FEATURE_STORE_DIR):
+    path = device_type_path(device_type, root)
+    if not os.path.isdir(path):
+        return []
+    return sorted(entry.split('=', 1)[1] for entry in os.listdir(path) if entry.startswith('date='))
+
+
+# Load one device type a day at a time, oldest first, so memory stays bounded by the largest day
+def iter_day_frames(device_type, columns=None, root=FEATURE_STORE_DIR):
+    for date in partition_dates(device_type, root):
+        yield load_frame(device_type, columns, predicate=ds.field('date') == date, root=root)
+
+
+def training_file(device_type, root=FEATURE_STORE_DIR):
+    # Leading underscore keeps the file out of Parquet dataset discovery
+    return os.path.join(root, f"_training_{device_type}.arrow")
+
+
+# Materialise the columns used for training as one uncompressed Arrow IPC file that can be memory-mapped.
+# Record batches are streamed from the scan into the file, so memory stays bounded by a batch, not the history.
+def export_training_file(device_type, columns=None, root=FEATURE_STORE_DIR):
+    source = scanner(device_type, columns, root=root)
+    path = training_file(device_type, root)
+    tmp_path = f"{path}.tmp"
+    rows = 0
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        if source is None:
+            empty = scan(device_type, columns, root=root)
+            with pa.ipc.new_file(sink, empty.schema) as writer:
+                writer.write_table(empty)
+        else:
+            with pa.ipc.new_file(sink, source.projected_schema) as writer:
+                for batch in source.to_batches():
+                    writer.write_batch(batch)
+                    rows += batch.num_rows
+    os.replace(tmp_path, path)
+    logger.info(f"Exported {rows} {device_type} rows to {path}")
+    return path
+
+
+# Load the training file through a memory map: Arrow reads it without copying into the heap, and
+# to_pandas only materialises the selected columns. A missing file (none exported yet, or invalidated
+# by a commit since) is exported first.
+def load_training_frame(device_type, columns=None, root=FEATURE_STORE_DIR):
+    path = training_file(device_type, root)
+    if not os.path.exists(path):
+        export_training_file(device_type, root=root)
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return compact_frame(table.to_pandas(strings_to_categorical=True), f"{device_type} training data")
@@ -0,0 +1,100 @@
+import logging
+import os
+import numpy as np
+
+# Compiled forest evaluation (can be set via environment variables for Docker)
+COMPILED_FOREST = os.getenv('COMPILED_FOREST', 'true').lower() == 'true'
+# Batches of more (row, tree) pairs than this go to sklearn: its compiled tree walk has a fixed per-call
+# overhead but is faster per row, so it wins on large batches (see benchmark_forest.py)
+COMPILED_MAX_PAIRS = int(os.getenv('COMPILED_MAX_PAIRS', 10000))
+CHUNK_PAIRS = 2000000  # (row, tree) pairs walked at once; bounds the temporary arrays
+
+logger = logging.getLogger(__name__)
+
+
+# A fitted random forest flattened into one set of node arrays covering every tree. Leaves point to
+# themselves, so a walk can stop as soon as it reaches one. Rows walk all trees together, level by
+# level, with each step a vectorised gather over the (row, tree) pairs that have not reached a leaf.
+# Comparisons (float32 inputs against float64 thresholds, <= goes left) and the summation order of the
+# tree probabilities follow sklearn, so predict_proba and predict give the same results.
+class CompiledForest:
+    def __init__(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        if not trees or any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError("Only fitted single-output forest classifiers can be compiled")
+
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        self.roots = offsets[:-1].astype(np.int32)
+        self.feature = np.concatenate([tree.feature for tree in trees]).astype(np.int32)
+        self.threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+        left = np.concatenate([tree.children_left + offset for tree, offset in zip(trees, offsets)])
+        right = np.concatenate([tree.children_right + offset for tree, offset in zip(trees, offsets)])
+        self.is_leaf = np.concatenate([tree.children_left == -1 for tree in trees])
+        nodes = np.arange(offsets[-1])
+        self.left = np.where(self.is_leaf, nodes, left).astype(np.int32)
+        self.right = np.where(self.is_leaf, nodes, right).astype(np.int32)
+        self.feature[self.is_leaf] = 0
+        # Where NaN inputs go at each split (recorded by sklearn >= 1.3; older versions reject NaN inputs)
+        self.missing_left = np.concatenate([getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, bool))
+                                            for tree in trees]).astype(bool)
+
+        # Class fractions per leaf, normalised as sklearn's predict_proba does
+        values = np.concatenate([tree.value[:, 0, :] for tree in trees]).astype(np.float64)
+        totals = values.sum(axis=1, keepdims=True)
+        self.values = values / np.where(totals == 0, 1, totals)
+
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+        self.n_trees = len(trees)
+        self.model = model
+        logger.info(f"Compiled forest: {self.n_trees} trees, {len(nodes)} nodes")
+
+    # Leaf node reached by every (row, tree) pair, shape (rows, trees)
+    def leaves(self, X):
+        n_rows = len(X)
+        current = np.broadcast_to(self.roots, (n_rows, self.n_trees)).ravel().copy()
+        rows = np.repeat(np.arange(n_rows, dtype=np.int32), self.n_trees)
+        result = np.empty_like(current)
+        pending = np.arange(len(current))
+        while len(pending):
+            nodes = current
+            values = X[rows, self.feature[nodes]]
+            go_left = (values <= self.threshold[nodes]) | (np.isnan(values) & self.missing_left[nodes])
+            current = np.where(go_left, self.left[nodes], self.right[nodes])
+            done = self.is_leaf[current]
+            result[pending[done]] = current[done]
+            keep = ~done
+            pending, current, rows = pending[keep], current[keep], rows[keep]
+        return result.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        if len(X) * self.n_trees > COMPILED_MAX_PAIRS:
+            return self.model.predict_proba(X)
+        return self.compiled_proba(X)
+
+    def compiled_proba(self, X):
+        X = np.ascontiguousarray(getattr(X, 'values', X), dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+        proba = np.zeros((len(X), len(self.classes_)), dtype=np.float64)
+        chunk_rows = max(1, CHUNK_PAIRS // self.n_trees)
+        for start in range(0, len(X), chunk_rows):
+            leaves = self.leaves(X[start:start + chunk_rows])
+            # Trees are added one at a time in order, like sklearn's accumulation, so sums match exactly
+            chunk = proba[start:start + chunk_rows]
+            for tree in range(self.n_trees):
+                chunk += self.values[leaves[:, tree]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+# Compiled evaluator for a forest, or the model itself when it cannot be compiled
+def compile_forest(model):
+    try:
+        return CompiledForest(model)
+    except (AttributeError, TypeError, ValueError) as e:
+        logger.warning(f"Serving {type(model).__name__} without compilation: {e}")
+        return model
@@ -0,0 +1,80 @@
+import logging
+import pandas as pd
+
+# Compact in-memory representation for security log frames. Repetitive text columns (device IDs,
+# statuses) become categoricals, 0/1 flags and small counters become int8 and floats become float32.
+# Widths are fixed per column rather than inferred per frame, so every chunk of a dataset gets the
+# same dtypes and the Parquet files written from them share one schema.
+COLUMN_TYPES = {
+    "timestamp": "timestamp",
+    "camera_id": "category",
+    "door_id": "category",
+    "intercom_id": "category",
+    "status": "category",
+    "motion_detected": "int8",
+    "access_granted": "int8",
+    "label_failure": "int8",
+    "is_online": "int8",
+    "status_encoded": "int8",
+    "hour_of_day": "int8",
+    "motion_avg": "float32",
+    "online_delta": "float32",
+    "zone": "category",
+    "door_denials_window": "int32",
+    "door_attempts_window": "int32",
+    "seconds_since_denial": "float32",
+    "intercom_inactive": "int8",
+    "intercom_inactive_while_offline": "int8"
+}
+
+# Text columns outside the schema become categoricals when at most this fraction of values is unique
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def frame_memory(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def compact_column(series, dtype):
+    if dtype == "timestamp":
+        return series if pd.api.types.is_datetime64_any_dtype(series) else pd.to_datetime(series, errors='coerce')
+    if dtype == "category":
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    if dtype in ("int8", "int16", "int32"):
+        # Columns with gaps use the nullable Int8/Int16/Int32, which Arrow stores as the same integer type
+        numeric = pd.to_numeric(series, errors='coerce')
+        return numeric.astype(dtype.capitalize() if numeric.isna().any() else dtype)
+    if dtype == "float32":
+        return pd.to_numeric(series, errors='coerce').astype('float32')
+    if dtype == "integer":
+        return pd.to_numeric(series, downcast='integer')
+    raise ValueError(f"Unknown compact dtype: {dtype}")
+
+
+# Target dtype for columns the schema does not know about (None leaves the column unchanged)
+def infer_dtype(series):
+    if pd.api.types.is_bool_dtype(series):
+        return "int8"
+    if pd.api.types.is_integer_dtype(series):
+        return "integer"
+    if pd.api.types.is_float_dtype(series):
+        return "float32"
+    if (pd.api.types.is_string_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype)
+            and len(series) and series.nunique() <= len(series) * CATEGORY_MAX_UNIQUE_RATIO):
+        return "category"
+    return None
+
+
+# Convert every column of df to its compact dtype and log the frame's memory before and after
+def compact_frame(df, name="frame"):
+    before = frame_memory(df)
+    for column in df.columns:
+        dtype = COLUMN_TYPES.get(column) or infer_dtype(df[column])
+        if dtype is not None:
+            df[column] = compact_column(df[column], dtype)
+    after = frame_memory(df)
+    saved = f" ({(1 - after / before) * 100:.0f}% smaller)" if before else ""
+    logger.info(f"Compacted {name}: {len(df)} rows, {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB{saved}")
+    return df
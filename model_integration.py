@@ -1,22 +1,37 @@
 import psycopg2
+import psycopg2.pool
+from psycopg2.extras import execute_values
 import pandas as pd
 import numpy as np
 import logging
-import joblib
 import time
-from sklearn.preprocessing import StandardScaler
+import os
+import json
+import asyncio
+import argparse
+import threading
+import io
+from contextlib import contextmanager
 from datetime import datetime
 import smtplib
 from email.mime.text import MIMEText
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from aiohttp import web
+from frame_compaction import compact_frame
+from feature_pipeline import build_features
+from model_registry import ModelRegistry
+from cascade_inference import cascade_predict, PREDICTION_MODE
+from rolling_state import RollingState
+from event_correlation import CorrelationState
+from dashboard_data import PredictionSeries
 
 # Prometheus and Grafana API imports
-from prometheus_client import start_http_server, Summary, Counter
+from prometheus_client import start_http_server, Summary, Counter, Histogram, Gauge
 from grafana_api.grafana_face import GrafanaFace
 
 # Plotly Dash imports for web app
 import dash
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_core_components as dcc
 import dash_html_components as html
 import plotly.express as px
@@ -28,9 +43,27 @@ logging.basicConfig(
     handlers=[logging.FileHandler("model_integration.log"), logging.StreamHandler()]
 )
 
-# Load pre-trained models
-rf_model = joblib.load('best_random_forest_model.pkl')
-lr_model = joblib.load('logistic_regression_model.pkl')
+# Pre-trained models and the feature pipeline fitted in data preparation (the same features and scaling
+# the models were trained on). Loaded on first use, and replaced when a new version is published.
+model_registry = ModelRegistry()
+
+# Per-camera window state carried across polling batches, so rolling features do not restart every minute;
+# and recent door and intercom events, used to attach zone correlation context to CCTV rows.
+# Both are created on first use.
+rolling_state = None
+correlation_state = None
+state_lock = threading.Lock()
+
+# Thread-safe PostgreSQL connection pool, created on first use
+db_pool = None
+
+# Downsampled prediction series behind the dashboard, shared by every browser session
+prediction_series = PredictionSeries()
+
+# Metrics and dashboard ports
+METRICS_PORT = int(os.getenv('MODEL_METRICS_PORT', 8000))
+GRAFANA_HOST = 'localhost:3000'
+GRAFANA_TOKEN = 'your_grafana_token'
 
 # PostgreSQL connection details
 DB_HOST = 'localhost'
@@ -38,6 +71,14 @@ DB_PORT = '5432'
 DB_NAME = 'security_systems'
 DB_USER = 'your_user'
 DB_PASSWORD = 'your_password'
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 8))  # connections shared by the monitoring loop and the inference server
+
+# Real-time polling (can be set via environment variables for Docker)
+POLL_INTERVAL = int(os.getenv('POLL_INTERVAL', 60))  # seconds between monitoring ticks
+POLL_LAG_SECONDS = int(os.getenv('POLL_LAG_SECONDS', 15))  # rows ingested this recently wait a tick, for open write transactions
+
+# prediction_logs columns, in the order they are written
+PREDICTION_COLUMNS = ['timestamp', 'motion_detected', 'motion_avg', 'online_delta', 'hour_of_day', 'predictions']
 
 # Email configuration for real-time alerts
 SMTP_SERVER = 'smtp.example.com'
@@ -46,36 +87,126 @@ EMAIL_USER = 'your_email@example.com'
 EMAIL_PASSWORD = 'your_password'
 ALERT_EMAIL_RECIPIENT = 'recipient@example.com'
 
+# Inference server mode (can be set via environment variables for Docker)
+INFERENCE_HOST = os.getenv('INFERENCE_HOST', '0.0.0.0')
+INFERENCE_PORT = int(os.getenv('INFERENCE_PORT', 8003))
+INFERENCE_MAX_BATCH = int(os.getenv('INFERENCE_MAX_BATCH', 256))  # rows that close a micro-batch early
+INFERENCE_MAX_WAIT = float(os.getenv('INFERENCE_MAX_WAIT_MS', 20)) / 1000  # seconds the first row of a batch waits
+INFERENCE_MAX_QUEUED = int(os.getenv('INFERENCE_MAX_QUEUED', 10000))  # queued rows before requests are refused
+INFERENCE_MAX_BODY_BYTES = 4 * 1024 * 1024
+INFERENCE_COLUMNS = ['timestamp', 'camera_id', 'status', 'motion_detected']
+
 # Prometheus metrics
 prediction_time = Summary('prediction_processing_seconds', 'Time spent processing prediction')
 processed_data_count = Counter('processed_data_count', 'Total number of data points processed')
 alerts_sent = Counter('alerts_sent', 'Total number of alerts sent')
-
-# Start Prometheus server to expose metrics
-start_http_server(8000)
+cascade_rows = Counter('cascade_rows', 'Rows whose prediction was made by each cascade stage', ['stage'])
+inference_latency = Histogram('inference_request_latency_seconds', 'Time from request to prediction in server mode',
+                              buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+inference_batch_rows = Histogram('inference_batch_rows', 'Rows per micro-batch in server mode',
+                                 buckets=(1, 4, 16, 64, 256, 1024, 4096))
+inference_queue_depth = Gauge('inference_queue_depth', 'Rows waiting for a micro-batch in server mode')
+
+# Start Prometheus server to expose metrics (called from __main__, so importing the module has no side effects)
+def start_metrics_server(port=METRICS_PORT):
+    start_http_server(port)
+    logging.info(f"Prometheus metrics exposed on port {port}")
 
 # Grafana API setup
-grafana = GrafanaFace(auth='your_grafana_token', host='localhost:3000')
-
-# Real-time data loading from PostgreSQL
-def load_real_time_data():
+def create_grafana_client():
+    return GrafanaFace(auth=GRAFANA_TOKEN, host=GRAFANA_HOST)
+
+# Window state for the pipeline being served; a new model version with a different window starts a fresh state
+def get_rolling_state(window):
+    global rolling_state
+    with state_lock:
+        if rolling_state is None or rolling_state.window != window:
+            rolling_state = RollingState(window)
+        return rolling_state
+
+def get_correlation_state():
+    global correlation_state
+    with state_lock:
+        if correlation_state is None:
+            correlation_state = CorrelationState()
+        return correlation_state
+
+def get_db_pool():
+    global db_pool
+    with state_lock:
+        if db_pool is None:
+            db_pool = psycopg2.pool.ThreadedConnectionPool(
+                1, DB_POOL_MAX, host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
+                user=DB_USER, password=DB_PASSWORD
+            )
+        return db_pool
+
+# Borrow a pooled connection; the transaction is committed (or rolled back on error) before the
+# connection goes back, so NOW() is fresh for the next borrower and nothing is left idle in transaction
+@contextmanager
+def pooled_connection():
+    pool = get_db_pool()
+    conn = pool.getconn()
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
-            user=DB_USER, password=DB_PASSWORD
-        )
-        query = """
-        SELECT timestamp, motion_detected, is_online, hour_of_day
-        FROM cctv_logs
-        WHERE timestamp >= NOW() - INTERVAL '1 minute'
-        """
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        logging.info("Real-time data loaded successfully.")
-        return df
-    except Exception as e:
-        logging.error(f"Error loading real-time data: {e}")
-        return None
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+# Real-time sources polled once per tick: the CCTV rows that are scored, and the door and intercom
+# events that feed the zone correlation state
+POLL_SOURCES = {
+    "cctv": ("cctv_logs", ["timestamp", "camera_id", "status", "motion_detected"]),
+    "access_control": ("access_control_logs", ["timestamp", "door_id", "access_granted"]),
+    "intercom": ("intercom_logs", ["timestamp", "intercom_id", "status"])
+}
+
+# Query for one source: rows ingested after the watermark (or, before the first read, in the last poll
+# interval), up to POLL_LAG_SECONDS ago so rows of write transactions still open are left for the next
+# tick. The watermark is on ingested_at, set by PostgreSQL on insert (see schema_management.py), not on
+# the device timestamp: spool replays and pushed events can carry event times well in the past.
+def build_poll_query(source, watermark=None, interval=POLL_INTERVAL, lag=POLL_LAG_SECONDS):
+    table, columns = POLL_SOURCES[source]
+    if watermark is None:
+        lower, params = "ingested_at > NOW() - make_interval(secs => %(interval)s)", {"interval": interval}
+    else:
+        lower, params = "ingested_at > %(since)s", {"since": watermark}
+    params["lag"] = lag
+    query = (f"SELECT {', '.join(columns)}, ingested_at FROM {table} "
+             f"WHERE {lower} AND ingested_at <= NOW() - make_interval(secs => %(lag)s) ORDER BY timestamp")
+    return query, params
+
+# One query per source per tick on a pooled connection. Each source keeps the newest ingested_at it has
+# handled as its watermark. A poll only records the new watermarks as pending; commit() applies them once
+# the tick's rows have been scored and saved, so a failed tick reads the same rows again on the next one.
+class SourcePoller:
+    def __init__(self, sources=POLL_SOURCES, interval=POLL_INTERVAL, lag=POLL_LAG_SECONDS):
+        self.sources = list(sources)
+        self.interval = interval
+        self.lag = lag
+        self.watermarks = {source: None for source in self.sources}
+        self.pending = {}
+
+    def poll(self):
+        frames = {}
+        self.pending = {}
+        with pooled_connection() as conn:
+            for source in self.sources:
+                query, params = build_poll_query(source, self.watermarks[source], self.interval, self.lag)
+                df = pd.read_sql_query(query, conn, params=params)
+                if not df.empty:
+                    self.pending[source] = df['ingested_at'].max()
+                frames[source] = compact_frame(df.drop(columns='ingested_at'), f"real-time {source}")
+        logging.info(f"Polled {', '.join(f'{len(df)} {source}' for source, df in frames.items())} rows.")
+        return frames
+
+    def commit(self):
+        self.watermarks.update(self.pending)
+        self.pending = {}
 
 # Function to send email alerts with retry logic
 def send_alert_email(message, retry_count=3):
@@ -100,39 +231,50 @@ def send_alert_email(message, retry_count=3):
             if attempt == retry_count:
                 logging.error("Failed to send email alert after multiple attempts.")
 
-# Function to preprocess incoming data with real-time feature engineering
-def preprocess_data(df):
+# Function to preprocess incoming data with real-time feature engineering. The fitted feature
+# pipeline is applied transform-only, so scaling never depends on what else is in the batch, and
+# window features continue each camera's history from the previous batches. Pass the same bundle to
+# predict_failures so one batch never mixes two model versions.
+def preprocess_data(df, bundle=None):
     try:
+        feature_pipeline = (bundle or model_registry.current()).feature_pipeline
         df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
         df.dropna(subset=['timestamp'], inplace=True)
 
-        df['motion_avg'] = df['motion_detected'].rolling(window=3, min_periods=1).mean()
-        df['online_delta'] = df['is_online'].diff().fillna(0)
-
-        scaler = StandardScaler()
-        df[['motion_detected', 'motion_avg', 'online_delta', 'hour_of_day']] = scaler.fit_transform(
-            df[['motion_detected', 'motion_avg', 'online_delta', 'hour_of_day']]
-        )
+        state = get_rolling_state(feature_pipeline.window)
+        features = build_features(df, feature_pipeline.status_classes, feature_pipeline.window, state)
+        df[feature_pipeline.feature_columns] = feature_pipeline.scale_features(features)
+        df['motion_ewma'] = features['motion_ewma'].to_numpy()
         logging.info("Real-time data preprocessed successfully.")
         return df
     except Exception as e:
         logging.error(f"Error preprocessing data: {e}")
         return None
 
-# Predict system failures using pre-trained models
+# Predict system failures using pre-trained models. In cascade mode the logistic regression scores every
+# row and only rows it is unsure about (PREDICTION_MODE / CASCADE_LOW / CASCADE_HIGH) go to the random forest.
 @prediction_time.time()  # Measure prediction time for Prometheus
-def predict_failures(df):
+def predict_failures(df, bundle=None):
     try:
-        features = df[['motion_detected', 'motion_avg', 'online_delta', 'hour_of_day']]
-        rf_predictions = rf_model.predict(features)
-        lr_predictions = lr_model.predict(features)
-
-        if np.mean(rf_predictions) > np.mean(lr_predictions):
-            logging.info("Random Forest selected for prediction.")
-            df['predictions'] = rf_predictions
+        bundle = bundle or model_registry.current()
+        features = df[bundle.feature_pipeline.feature_columns]
+        if PREDICTION_MODE == 'cascade':
+            predictions, escalated = cascade_predict(bundle.lr_model, bundle.rf_model, features)
+            forest_rows = int(escalated.sum())
+            cascade_rows.labels(stage='logistic_regression').inc(len(df) - forest_rows)
+            cascade_rows.labels(stage='random_forest').inc(forest_rows)
+            logging.info(f"Cascade: {forest_rows} of {len(df)} rows escalated to Random Forest.")
+            df['predictions'] = predictions
         else:
-            logging.info("Logistic Regression selected for prediction.")
-            df['predictions'] = lr_predictions
+            rf_predictions = bundle.rf_model.predict(features)
+            lr_predictions = bundle.lr_model.predict(features)
+
+            if np.mean(rf_predictions) > np.mean(lr_predictions):
+                logging.info("Random Forest selected for prediction.")
+                df['predictions'] = rf_predictions
+            else:
+                logging.info("Logistic Regression selected for prediction.")
+                df['predictions'] = lr_predictions
 
         processed_data_count.inc(len(df))  # Track data processing count
         logging.info("Predictions made successfully.")
@@ -156,105 +298,315 @@ def handle_alerts(df, threshold=0.5):
     except Exception as e:
         logging.error(f"Error handling alerts: {e}")
 
-# Save predictions to PostgreSQL for Grafana visualization
+# Stream the prediction columns into prediction_logs with COPY; pandas writes the CSV straight from the
+# column arrays (NaN becomes an empty field, which COPY reads as NULL)
+def copy_predictions(cursor, df):
+    buffer = io.StringIO()
+    df[PREDICTION_COLUMNS].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY prediction_logs ({', '.join(PREDICTION_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+# Multi-row INSERT fallback for connections where COPY is unavailable (e.g. statement poolers)
+def values_insert_predictions(cursor, df):
+    columns = df[PREDICTION_COLUMNS]
+    rows = columns.astype(object).where(columns.notna(), None).to_numpy().tolist()
+    execute_values(cursor, f"INSERT INTO prediction_logs ({', '.join(PREDICTION_COLUMNS)}) VALUES %s", rows,
+                   page_size=1000)
+
+# Save predictions to PostgreSQL for Grafana visualization, one bulk write per batch on a pooled connection.
+# Returns whether the batch was saved.
 def save_predictions_to_db(df):
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
-            user=DB_USER, password=DB_PASSWORD
-        )
-        cursor = conn.cursor()
-
-        for index, row in df.iterrows():
-            cursor.execute(
-                """
-                INSERT INTO prediction_logs (timestamp, motion_detected, motion_avg, online_delta, hour_of_day, predictions)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                (row['timestamp'], row['motion_detected'], row['motion_avg'], row['online_delta'], row['hour_of_day'],
-                 row['predictions'])
-            )
-
-        conn.commit()
-        cursor.close()
-        conn.close()
-        logging.info("Predictions saved to PostgreSQL for Grafana.")
+        if df.empty:
+            return True
+        with pooled_connection() as conn:
+            with conn.cursor() as cursor:
+                # Savepoint so a failed COPY can fall back without losing the transaction
+                cursor.execute("SAVEPOINT save_predictions")
+                try:
+                    copy_predictions(cursor, df)
+                except psycopg2.Error as e:
+                    logging.warning(f"COPY into prediction_logs failed ({e}), falling back to execute_values")
+                    cursor.execute("ROLLBACK TO SAVEPOINT save_predictions")
+                    values_insert_predictions(cursor, df)
+                cursor.execute("RELEASE SAVEPOINT save_predictions")
+        logging.info(f"{len(df)} predictions saved to PostgreSQL for Grafana.")
+        return True
     except Exception as e:
         logging.error(f"Error saving predictions to PostgreSQL: {e}")
+        return False
 
-# Concurrently handle real-time monitoring for different data sources (CCTV, Access, Intercom)
-def real_time_monitoring():
+# Real-time monitoring: one poll per tick, fanned out to the pipeline for each source. A failed tick
+# (database down, a bad query, a feature error, predictions not saved) is logged and retried on the next
+# tick; watermarks only advance once a tick's predictions are saved, so rows are not skipped.
+def real_time_monitoring(poller=None):
+    poller = poller or SourcePoller()
     try:
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = [executor.submit(monitor_data_source, "CCTV"), executor.submit(monitor_data_source, "Access"),
-                       executor.submit(monitor_data_source, "Intercom")]
-            for future in as_completed(futures):
-                future.result()
+        while True:
+            started = time.monotonic()
+            try:
+                run_monitoring_cycle(poller)
+            except Exception as e:
+                logging.error(f"Error in real-time monitoring, retrying next tick: {e}")
+            time.sleep(max(0.0, poller.interval - (time.monotonic() - started)))
     except KeyboardInterrupt:
         logging.info("Real-time monitoring stopped by user.")
-    except Exception as e:
-        logging.error(f"Error in real-time monitoring: {e}")
-        raise
-
-# Monitor data source (CCTV, Access, Intercom)
-def monitor_data_source(source_type):
-    while True:
-        try:
-            real_time_data = load_real_time_data()
-            if real_time_data is None or real_time_data.empty:
-                logging.info(f"No new data for {source_type}.")
-                time.sleep(60)
-                continue
 
-            processed_data = preprocess_data(real_time_data)
-            if processed_data is None or processed_data.empty:
-                time.sleep(60)
-                continue
+# One tick: door and intercom events update the correlation state first, so CCTV rows of the same tick
+# see them; CCTV rows then go through features, prediction, storage and alerts once. The poller's
+# watermarks are committed only at the end, so rows of a tick that stops early are read again. Reading
+# them twice is safe: the rolling and correlation states skip events they already hold.
+def run_monitoring_cycle(poller):
+    frames = poller.poll()
+
+    # Door denials and intercom status in each camera's zone, carried into alerts
+    correlation_state = get_correlation_state()
+    correlation_state.update(frames.get("access_control"), frames.get("intercom"))
+
+    real_time_data = frames.get("cctv")
+    if real_time_data is None or real_time_data.empty:
+        logging.info("No new CCTV data.")
+        poller.commit()
+        return None
+    real_time_data = correlation_state.features(real_time_data)
 
-            predictions_df = predict_failures(processed_data)
-            if predictions_df is None:
-                time.sleep(60)
-                continue
+    bundle = model_registry.current()
+    processed_data = preprocess_data(real_time_data, bundle)
+    if processed_data is None:
+        logging.warning("CCTV rows not preprocessed; they are read again next tick.")
+        return None
+    if processed_data.empty:
+        poller.commit()
+        return None
 
-            handle_alerts(predictions_df)
-            save_predictions_to_db(predictions_df)
+    predictions_df = predict_failures(processed_data, bundle)
+    if predictions_df is None:
+        logging.warning("CCTV rows not scored; they are read again next tick.")
+        return None
 
-            time.sleep(60)
+    # Saved before alerting, so a batch retried after a failed save does not alert twice
+    if not save_predictions_to_db(predictions_df):
+        logging.warning("Predictions not saved; the rows are read again next tick.")
+        return None
+    handle_alerts(predictions_df)
+    poller.commit()
+    return predictions_df
+
+# Validate one row for the inference server, e.g. {"camera_id": "CAM_001", "status": "online",
+# "motion_detected": 1, "timestamp": "2024-10-10T12:00:00"}; the timestamp defaults to now. Raises ValueError.
+def parse_inference_row(row):
+    if not isinstance(row, dict):
+        raise ValueError("row must be a JSON object")
+    for column in ('camera_id', 'status'):
+        if not isinstance(row.get(column), str) or not row[column]:
+            raise ValueError(f"{column} must be a non-empty string")
+    motion = row.get('motion_detected')
+    if isinstance(motion, bool):
+        motion = int(motion)
+    if not isinstance(motion, int):
+        raise ValueError("motion_detected must be an integer")
+    timestamp = pd.Timestamp(row['timestamp']) if row.get('timestamp') is not None else pd.Timestamp.now()
+    if pd.isna(timestamp):
+        raise ValueError("timestamp must be a valid date and time")
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert(None)
+    return {'timestamp': timestamp, 'camera_id': row['camera_id'], 'status': row['status'], 'motion_detected': motion}
+
+# Gathers rows from many callers into micro-batches, closed when INFERENCE_MAX_BATCH rows are waiting or the
+# oldest row has waited INFERENCE_MAX_WAIT. Each batch goes through preprocess_data and predict_failures once
+# (in a worker thread, so the event loop keeps accepting rows) and every caller gets its own rows' predictions.
+class MicroBatcher:
+    def __init__(self, max_batch=INFERENCE_MAX_BATCH, max_wait=INFERENCE_MAX_WAIT, max_queued=INFERENCE_MAX_QUEUED):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queued = max_queued
+        self.queue = None
+        self.queued_rows = 0
+        self.loop = None
+        self.task = None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.task = self.loop.create_task(self._run())
+
+    # In-process API: predictions (0/1) for a list of parsed rows, in order
+    async def submit(self, rows):
+        if self.queued_rows + len(rows) > self.max_queued:
+            raise OverflowError(f"{self.queued_rows} rows already queued")
+        future = self.loop.create_future()
+        self.queued_rows += len(rows)
+        inference_queue_depth.set(self.queued_rows)
+        await self.queue.put((rows, future))
+        return await future
+
+    # Same as submit, for callers running in other threads
+    def submit_threadsafe(self, rows, timeout=None):
+        return asyncio.run_coroutine_threadsafe(self.submit(rows), self.loop).result(timeout)
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = self.loop.time() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - self.loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, size
+
+    async def _run(self):
+        while True:
+            batch, size = await self._next_batch()
+            self.queued_rows -= size
+            inference_queue_depth.set(self.queued_rows)
+            inference_batch_rows.observe(size)
+            try:
+                rows = [row for item_rows, _ in batch for row in item_rows]
+                predictions = await self.loop.run_in_executor(None, predict_batch, rows)
+            except Exception as e:
+                logging.error(f"Error predicting micro-batch of {size} rows: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            offset = 0
+            for rows, future in batch:
+                if not future.done():
+                    future.set_result(predictions[offset:offset + len(rows)])
+                offset += len(rows)
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+
+# One micro-batch through the same preprocessing and models as the polling loop; predictions in row order.
+# Rows are fed to the rolling state in timestamp order, as the polling loop does.
+def predict_batch(rows):
+    df = pd.DataFrame(rows, columns=INFERENCE_COLUMNS)
+    df = df.sort_values('timestamp', kind='stable')
+    bundle = model_registry.current()
+    processed_data = preprocess_data(df, bundle)
+    predictions_df = predict_failures(processed_data, bundle) if processed_data is not None else None
+    if predictions_df is None:
+        raise RuntimeError("Prediction failed, see the log for details")
+    # Callers' predictions are split by row offsets, so a dropped row would shift every later caller's
+    if len(predictions_df) != len(rows):
+        raise RuntimeError(f"Prediction returned {len(predictions_df)} rows for a batch of {len(rows)}")
+    return predictions_df['predictions'].sort_index().astype(int).tolist()
+
+# HTTP front end (POST /predict) accepting a JSON row, a JSON list or {"rows": [...]}
+class InferenceServer:
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.runner = None
+
+    async def handle_predict(self, request):
+        started = time.perf_counter()
+        try:
+            payload = json.loads(await request.text())
+            rows = payload if isinstance(payload, list) else payload.get('rows', [payload])
+            rows = [parse_inference_row(row) for row in rows]
+        except (ValueError, TypeError, AttributeError) as e:
+            raise web.HTTPBadRequest(text=f"Invalid request: {e}")
+        if not rows:
+            return web.json_response({'predictions': []})
 
+        try:
+            predictions = await self.batcher.submit(rows)
+        except OverflowError as e:
+            raise web.HTTPServiceUnavailable(text=f"Inference queue is full: {e}")
         except Exception as e:
-            logging.error(f"Error in {source_type} monitoring: {e}")
-            raise
-
-# Plotly Dash web app for real-time monitoring
+            raise web.HTTPInternalServerError(text=str(e))
+        inference_latency.observe(time.perf_counter() - started)
+        return web.json_response({'predictions': predictions})
+
+    async def start(self, host=INFERENCE_HOST, port=INFERENCE_PORT):
+        app = web.Application(client_max_size=INFERENCE_MAX_BODY_BYTES)
+        app.router.add_post('/predict', self.handle_predict)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        logging.info(f"Inference server listening on http://{host}:{port}/predict")
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+# Inference server mode: serve predictions over HTTP until interrupted
+async def serve_inference(host=INFERENCE_HOST, port=INFERENCE_PORT):
+    batcher = MicroBatcher()
+    batcher.start()
+    server = InferenceServer(batcher)
+    await server.start(host, port)
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.close()
+        await batcher.close()
+
+# Plotly Dash web app for real-time monitoring. Each page load draws the cached, downsampled series;
+# afterwards the interval callback appends only the points the browser does not have yet (extendData),
+# and the shared series reads only predictions newer than its last timestamp from the database.
 def run_dashboard():
     app = dash.Dash(__name__)
 
-    def generate_plot(df):
-        fig = px.line(df, x='timestamp', y='predictions', title='Real-Time Prediction Monitoring')
+    def generate_plot(x, y):
+        fig = px.line(x=x, y=y, title='Real-Time Prediction Monitoring',
+                      labels={'x': 'timestamp', 'y': 'predicted failure rate'})
         return fig
 
-    app.layout = html.Div(children=[
-        html.H1(children='Security System Prediction Dashboard'),
-        dcc.Graph(id='prediction-graph', figure=generate_plot(pd.read_sql_query("SELECT * FROM prediction_logs", psycopg2.connect(
-            host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)))),
-        dcc.Interval(
-            id='interval-component',
-            interval=60*1000,  # in milliseconds
-            n_intervals=0
-        )
-    ])
+    def serve_layout():
+        prediction_series.refresh(pooled_connection)
+        x, y = prediction_series.points()
+        return html.Div(children=[
+            html.H1(children='Security System Prediction Dashboard'),
+            dcc.Graph(id='prediction-graph', figure=generate_plot(x, y)),
+            dcc.Store(id='last-point', data=x[-1] if x else None),
+            dcc.Interval(
+                id='interval-component',
+                interval=60*1000,  # in milliseconds
+                n_intervals=0
+            )
+        ])
+
+    app.layout = serve_layout
 
     @app.callback(
-        Output('prediction-graph', 'figure'),
-        Input('interval-component', 'n_intervals')
+        [Output('prediction-graph', 'extendData'), Output('last-point', 'data')],
+        [Input('interval-component', 'n_intervals')],
+        [State('last-point', 'data')]
     )
-    def update_graph_live(n):
-        df = pd.read_sql_query("SELECT * FROM prediction_logs", psycopg2.connect(
-            host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD))
-        return generate_plot(df)
+    def update_graph_live(n, last_point):
+        prediction_series.refresh(pooled_connection)
+        x, y = prediction_series.points(after=last_point)
+        if not x:
+            raise PreventUpdate
+        return (dict(x=[x], y=[y]), [0], prediction_series.max_points), x[-1]
 
-    app.run_server(debug=True)
+    app.run_server(debug=True, use_reloader=False)
 
 if __name__ == "__main__":
-    real_time_monitoring()
-    run_dashboard()  # Launch the real-time dashboard
+    parser = argparse.ArgumentParser(description="Real-time failure prediction")
+    parser.add_argument('--serve', action='store_true',
+                        help=f"Run the micro-batching inference server on port {INFERENCE_PORT} instead of polling")
+    args = parser.parse_args()
+
+    start_metrics_server()
+    model_registry.current()  # load the models before the first batch arrives
+    model_registry.start_watching()
+    if args.serve:
+        try:
+            asyncio.run(serve_inference())
+        except KeyboardInterrupt:
+            logging.info("Inference server stopped by user.")
+    else:
+        # Monitoring runs beside the dashboard, which serves the predictions it writes
+        threading.Thread(target=real_time_monitoring, name="real-time-monitoring", daemon=True).start()
+        run_dashboard()  # Launch the real-time dashboard
@@ -0,0 +1,131 @@
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+import joblib
+from feature_pipeline import FeaturePipeline, FEATURE_PIPELINE_FILE
+from forest_compiler import compile_forest, COMPILED_FOREST
+
+# Model artifacts (can be set via environment variables for Docker). Each version is a directory
+# MODEL_DIR/<version>/ holding every file in MODEL_FILES; the highest version name is served.
+# Without a version directory the flat files in LEGACY_MODEL_DIR are used, as before.
+MODEL_DIR = os.getenv('MODEL_DIR', 'models')
+LEGACY_MODEL_DIR = '.'
+MODEL_FILES = {
+    'rf_model': 'best_random_forest_model.pkl',
+    'lr_model': 'logistic_regression_model.pkl',
+    'feature_pipeline': os.path.basename(FEATURE_PIPELINE_FILE)
+}
+MODEL_MMAP = os.getenv('MODEL_MMAP', 'false').lower() == 'true'  # memory-map numpy arrays (uncompressed dumps only)
+MODEL_WATCH_INTERVAL = int(os.getenv('MODEL_WATCH_INTERVAL', 30))  # seconds between checks for a new version
+
+logger = logging.getLogger(__name__)
+
+
+# One loaded model version. Callers take a bundle once per batch and use it throughout, so a swap
+# never mixes the models of one version with the feature pipeline of another.
+class ModelBundle:
+    def __init__(self, version, rf_model, lr_model, feature_pipeline):
+        self.version = version
+        self.rf_model = rf_model
+        self.lr_model = lr_model
+        self.feature_pipeline = feature_pipeline
+
+
+# Newest complete version directory in model_dir, or None. Directories starting with '.' are versions
+# still being published.
+def latest_version(model_dir=MODEL_DIR, files=MODEL_FILES):
+    if not os.path.isdir(model_dir):
+        return None
+    versions = [name for name in os.listdir(model_dir)
+                if not name.startswith('.') and os.path.isdir(os.path.join(model_dir, name))
+                and all(os.path.exists(os.path.join(model_dir, name, file)) for file in files.values())]
+    return max(versions) if versions else None
+
+
+# The random forest is served through forest_compiler (same predictions, far less per-call overhead on
+# small batches) unless COMPILED_FOREST is turned off
+def load_bundle(directory, version, files=MODEL_FILES, mmap=MODEL_MMAP):
+    mmap_mode = 'r' if mmap else None
+    rf_model = joblib.load(os.path.join(directory, files['rf_model']), mmap_mode=mmap_mode)
+    bundle = ModelBundle(
+        version,
+        compile_forest(rf_model) if COMPILED_FOREST else rf_model,
+        joblib.load(os.path.join(directory, files['lr_model']), mmap_mode=mmap_mode),
+        FeaturePipeline.load(os.path.join(directory, files['feature_pipeline']))
+    )
+    logger.info(f"Loaded model version {version} from {directory}{' (memory-mapped)' if mmap else ''}")
+    return bundle
+
+
+# Copy a trained set of artifacts into a new version directory. The files are staged in a hidden
+# directory and renamed into place, so the watcher never sees a half-written version.
+def publish_version(paths, model_dir=MODEL_DIR, version=None):
+    version = version or datetime.now().strftime('%Y%m%d-%H%M%S')
+    staging = os.path.join(model_dir, f".{version}.tmp")
+    os.makedirs(staging, exist_ok=True)
+    for path in paths:
+        shutil.copy2(path, staging)
+    os.rename(staging, os.path.join(model_dir, version))
+    logger.info(f"Published model version {version} to {model_dir}")
+    return version
+
+
+# Serves the current ModelBundle. Nothing is read until the first current() call; after that a
+# watcher thread can load newer versions in the background and swap them in with a single reference
+# assignment, so in-flight batches finish on the bundle they started with and none are dropped.
+class ModelRegistry:
+    def __init__(self, model_dir=MODEL_DIR, files=MODEL_FILES, mmap=MODEL_MMAP, watch_interval=MODEL_WATCH_INTERVAL):
+        self.model_dir = model_dir
+        self.files = files
+        self.mmap = mmap
+        self.watch_interval = watch_interval
+        self.bundle = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.watcher = None
+
+    def current(self):
+        bundle = self.bundle
+        if bundle is None:
+            with self.lock:
+                if self.bundle is None:
+                    self.bundle = self._load_latest()
+                bundle = self.bundle
+        return bundle
+
+    def _load_latest(self):
+        version = latest_version(self.model_dir, self.files)
+        if version is None:
+            return load_bundle(LEGACY_MODEL_DIR, 'legacy', self.files, self.mmap)
+        return load_bundle(os.path.join(self.model_dir, version), version, self.files, self.mmap)
+
+    # Swap in the newest version if it differs from the one being served; returns True on a swap
+    def refresh(self):
+        version = latest_version(self.model_dir, self.files)
+        if version is None or (self.bundle is not None and self.bundle.version == version):
+            return False
+        bundle = load_bundle(os.path.join(self.model_dir, version), version, self.files, self.mmap)
+        with self.lock:
+            previous, self.bundle = self.bundle, bundle
+        logger.info(f"Model version {bundle.version} is now served"
+                    f"{f' (was {previous.version})' if previous is not None else ''}")
+        return True
+
+    def _watch(self):
+        while not self.stop_event.wait(self.watch_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # A broken artifact must not take down serving; keep the current version
+                logger.error(f"Error loading new model version from {self.model_dir}: {e}")
+
+    def start_watching(self):
+        if self.watcher is None:
+            self.watcher = threading.Thread(target=self._watch, name="model-registry-watcher", daemon=True)
+            self.watcher.start()
+            logger.info(f"Watching {self.model_dir} for new model versions every {self.watch_interval}s")
+
+    def stop_watching(self):
+        self.stop_event.set()
@@ -0,0 +1,73 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+# Partitioned preprocessing configuration (can be set via environment variables for Docker)
+# Partitions run one after another in this process: for the row-level features a process pool measured
+# ~20x slower than a single pass (1M CCTV rows: 0.04s serial, 0.75s with 2 workers), as the sort and
+# hand-off cost far more than the features themselves. Only window features (halo_rows > 0) are partitioned.
+PARTITION_MIN_ROWS = int(os.getenv('PARTITION_MIN_ROWS', 200000))  # smaller frames are processed in one pass
+TASK_ROWS = int(os.getenv('PREP_TASK_ROWS', 250000))  # upper bound on rows handed to func at once
+
+ROW_COLUMN = '_row'  # original row position, used to restore the input order after the merge
+
+logger = logging.getLogger(__name__)
+
+
+# Row ranges [start, stop) of each (device, day) partition in a frame sorted by device and timestamp,
+# plus the start row of each device
+def partition_bounds(df, id_column):
+    device_codes = pd.factorize(df[id_column])[0]
+    days = df['timestamp'].values.astype('datetime64[D]')
+    new_device = np.r_[True, device_codes[1:] != device_codes[:-1]]
+    new_partition = new_device | np.r_[True, days[1:] != days[:-1]]
+    starts = np.flatnonzero(new_partition)
+    return list(zip(starts, np.r_[starts[1:], len(df)])), np.flatnonzero(new_device)
+
+
+# Pack consecutive partitions into tasks of about task_rows rows; a partition is never split. Each task
+# is (start, stop, halo): halo rows before start belong to the same device and are only given as context.
+def plan_tasks(partitions, device_starts, task_rows, halo_rows):
+    tasks, task_start = [], None
+    for start, stop in partitions:
+        if task_start is None:
+            task_start = start
+        if stop - task_start >= task_rows:
+            tasks.append((task_start, stop))
+            task_start = None
+    if task_start is not None:
+        tasks.append((task_start, partitions[-1][1]))
+
+    planned = []
+    for start, stop in tasks:
+        device_start = device_starts[np.searchsorted(device_starts, start, side='right') - 1]
+        planned.append((int(start), int(stop), int(min(halo_rows, start - device_start))))
+    return planned
+
+
+# Run func over df partitioned by device and day, each task with up to halo_rows preceding rows of the same
+# device as context, and merge the results back in the original row order. func takes and returns a DataFrame
+# with the same rows; window features must be computed per device (groupby on id_column).
+# Forward fill and other whole-history steps are expected to have run on df already. Row-level funcs
+# (halo_rows=0) give the same rows either way, so they run in one pass without the sort and merge.
+def run_partitioned(df, id_column, func, halo_rows=0, task_rows=TASK_ROWS, min_rows=PARTITION_MIN_ROWS):
+    if halo_rows == 0 or len(df) < min_rows:
+        return func(df)
+
+    ordered = df.assign(**{ROW_COLUMN: np.arange(len(df))})
+    ordered = ordered.sort_values([id_column, 'timestamp'], kind='stable', ignore_index=True)
+    partitions, device_starts = partition_bounds(ordered, id_column)
+    tasks = plan_tasks(partitions, device_starts, task_rows, halo_rows)
+
+    results = []
+    for start, stop, halo in tasks:
+        frame = ordered.iloc[start - halo:stop].drop(columns=ROW_COLUMN).reset_index(drop=True)
+        result = func(frame)
+        if len(result) != len(frame):
+            raise ValueError(f"Partition function changed the row count ({len(frame)} -> {len(result)})")
+        results.append(result.iloc[halo:].assign(**{ROW_COLUMN: ordered[ROW_COLUMN].values[start:stop]}))
+
+    merged = pd.concat(results, ignore_index=True).sort_values(ROW_COLUMN, kind='stable')
+    logger.info(f"Preprocessed {len(df)} rows in {len(partitions)} device-day partitions ({len(tasks)} tasks)")
+    return merged.drop(columns=ROW_COLUMN).reset_index(drop=True)
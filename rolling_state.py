@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+# Per-device rolling state for real-time features (can be set via environment variables for Docker)
+EWMA_ALPHA = float(os.getenv('MOTION_EWMA_ALPHA', 0.2))  # weight of the newest event in motion_ewma
+INITIAL_DEVICES = 1024  # device slots allocated up front; the arrays double when more devices appear
+
+logger = logging.getLogger(__name__)
+
+
+# Rolling features that carry over between polling batches. Every device owns one slot (row) in a set of
+# numpy arrays: a ring buffer of its last `window` motion values, its last online flag, its motion EWMA
+# and the timestamp of its newest event. A batch is applied in rounds - round r takes the r-th event of
+# every device in the batch - so each event is an O(1) update and each round is one vectorised step
+# across devices. The results match window_features over the device's full history.
+class RollingState:
+    def __init__(self, window, alpha=EWMA_ALPHA, capacity=INITIAL_DEVICES):
+        self.window = window
+        self.alpha = alpha
+        self.slots = {}
+        self.ring = np.zeros((capacity, window), dtype=np.float64)
+        self.position = np.zeros(capacity, dtype=np.int64)  # next ring index to overwrite
+        self.count = np.zeros(capacity, dtype=np.int64)  # values held in the ring (at most window)
+        self.last_online = np.zeros(capacity, dtype=np.float32)
+        self.ewma = np.zeros(capacity, dtype=np.float64)
+        self.last_seen = np.full(capacity, np.iinfo(np.int64).min, dtype=np.int64)  # ns since epoch
+        self.lock = threading.Lock()
+
+    def slots_for(self, device_ids):
+        codes, devices = pd.factorize(np.asarray(device_ids, dtype=object))
+        device_slots = np.empty(len(devices), dtype=np.int64)
+        for i, device_id in enumerate(devices):
+            slot = self.slots.get(device_id)
+            if slot is None:
+                slot = self.slots[device_id] = len(self.slots)
+            device_slots[i] = slot
+        if len(self.slots) > len(self.count):
+            self.grow(len(self.slots))
+        return device_slots[codes]
+
+    def grow(self, needed):
+        capacity = max(needed, 2 * len(self.count))
+        extra = capacity - len(self.count)
+        self.ring = np.vstack([self.ring, np.zeros((extra, self.window), dtype=self.ring.dtype)])
+        self.position = np.r_[self.position, np.zeros(extra, dtype=np.int64)]
+        self.count = np.r_[self.count, np.zeros(extra, dtype=np.int64)]
+        self.last_online = np.r_[self.last_online, np.zeros(extra, dtype=np.float32)]
+        self.ewma = np.r_[self.ewma, np.zeros(extra, dtype=np.float64)]
+        self.last_seen = np.r_[self.last_seen, np.full(extra, np.iinfo(np.int64).min, dtype=np.int64)]
+        logger.info(f"Rolling state grown to {capacity} device slots")
+
+    # Apply a batch of events (in timestamp order within each device) and return motion_avg,
+    # online_delta and motion_ewma per event, in input order. Events not newer than the device's last
+    # seen event (overlapping polls, or several threads feeding the same rows) are not applied again;
+    # they get the device's current values.
+    def update(self, device_ids, timestamps, motion, online):
+        motion = np.asarray(motion, dtype=np.float64)
+        online = np.asarray(online, dtype=np.float32)
+        times = pd.to_datetime(timestamps, cache=False).to_numpy().astype('datetime64[ns]').astype(np.int64)
+        motion_avg = np.empty(len(motion), dtype=np.float32)
+        online_delta = np.zeros(len(motion), dtype=np.float32)
+        motion_ewma = np.empty(len(motion), dtype=np.float32)
+
+        with self.lock:
+            slots = self.slots_for(device_ids)
+            order = np.argsort(slots, kind='stable')
+            sorted_slots = slots[order]
+            new_device = np.r_[True, sorted_slots[1:] != sorted_slots[:-1]] if len(order) else np.zeros(0, bool)
+            group_start = np.maximum.accumulate(np.where(new_device, np.arange(len(order)), 0))
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order)) - group_start  # position of each event within its device
+
+            by_rank = np.argsort(rank, kind='stable')
+            round_bounds = np.searchsorted(rank[by_rank], np.arange(int(rank.max()) + 2 if len(rank) else 1))
+            for low, high in zip(round_bounds[:-1], round_bounds[1:]):
+                events = by_rank[low:high]
+                event_slots = slots[events]
+                fresh = times[events] > self.last_seen[event_slots]
+                applied, applied_slots = events[fresh], event_slots[fresh]
+
+                first = self.count[applied_slots] == 0
+                online_delta[applied] = np.where(first, 0, online[applied] - self.last_online[applied_slots])
+                self.ewma[applied_slots] = np.where(
+                    first, motion[applied],
+                    self.alpha * motion[applied] + (1 - self.alpha) * self.ewma[applied_slots])
+                self.ring[applied_slots, self.position[applied_slots]] = motion[applied]
+                self.position[applied_slots] = (self.position[applied_slots] + 1) % self.window
+                self.count[applied_slots] = np.minimum(self.count[applied_slots] + 1, self.window)
+                self.last_online[applied_slots] = online[applied]
+                self.last_seen[applied_slots] = times[applied]
+
+                # Unfilled ring entries are zero, so the mean over a device's first events is sum / count
+                motion_avg[events] = self.ring[event_slots].sum(axis=1) / np.maximum(self.count[event_slots], 1)
+                motion_ewma[events] = self.ewma[event_slots]
+        return motion_avg, online_delta, motion_ewma
@@ -0,0 +1,201 @@
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+import psycopg2
+
+# PostgreSQL connection details (can be set via environment variables for Docker)
+DB_HOST = os.getenv('DB_HOST', 'localhost')
+DB_PORT = os.getenv('DB_PORT', '5432')
+DB_NAME = os.getenv('DB_NAME', 'security_systems')
+DB_USER = os.getenv('DB_USER', 'your_user')
+DB_PASSWORD = os.getenv('DB_PASSWORD', 'your_password')
+
+# Partitioning configuration
+PARTITION_INTERVAL = os.getenv('PARTITION_INTERVAL', 'daily')  # daily or weekly
+PRECREATE_PARTITIONS = int(os.getenv('PRECREATE_PARTITIONS', 7))  # upcoming partitions kept ready ahead of time
+SCHEMA_LOCK_NAME = 'security_systems_schema'  # advisory lock serialising schema changes across processes
+# Time each row was inserted, set by PostgreSQL (clock_timestamp(), not the device or transaction start time).
+# Incremental readers keep their watermark on it rather than on the device timestamp, so rows that arrive
+# late (spool replays, pushed events) are still read once they land.
+INGESTED_AT_COLUMN = 'ingested_at'
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('SecuritySystemsLogger')
+
+# Column order per log table, shared by every write path
+TABLE_COLUMNS = {
+    "cctv_logs": ("timestamp", "camera_id", "status", "motion_detected"),
+    "access_control_logs": ("timestamp", "door_id", "access_granted"),
+    "intercom_logs": ("timestamp", "intercom_id", "status")
+}
+
+# Column types, used for table DDL and the dense-reconstruction functions
+COLUMN_TYPES = {
+    "timestamp": "TIMESTAMP",
+    "camera_id": "TEXT",
+    "door_id": "TEXT",
+    "intercom_id": "TEXT",
+    "status": "TEXT",
+    "motion_detected": "INTEGER",
+    "access_granted": "INTEGER"
+}
+
+# Indexes per table, matched to the queries that read them:
+#   (timestamp)                 - rolling-window loads in model_integration and incident_report
+#   (status, timestamp)         - system_health_monitor offline checks
+#   (access_granted, timestamp) - system_health_monitor access failure checks
+#   (<device>_id, timestamp)    - per-device history and the <table>_dense() functions
+#   (ingested_at)               - incremental reads (added by ensure_ingestion_column)
+TABLE_INDEXES = {
+    "cctv_logs": [("timestamp",), ("status", "timestamp"), ("camera_id", "timestamp")],
+    "access_control_logs": [("timestamp",), ("access_granted", "timestamp"), ("door_id", "timestamp")],
+    "intercom_logs": [("timestamp",), ("status", "timestamp"), ("intercom_id", "timestamp")]
+}
+
+
+def get_db_connection():
+    return psycopg2.connect(
+        host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
+        user=DB_USER, password=DB_PASSWORD
+    )
+
+
+# Start of the partition that contains moment
+def partition_start(moment, interval=PARTITION_INTERVAL):
+    day = datetime(moment.year, moment.month, moment.day)
+    if interval == 'daily':
+        return day
+    if interval == 'weekly':
+        return day - timedelta(days=day.weekday())  # weeks start on Monday
+    raise ValueError(f"Unknown partition interval: {interval}")
+
+
+def partition_step(interval=PARTITION_INTERVAL):
+    return timedelta(days=7 if interval == 'weekly' else 1)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start:%Y%m%d}"
+
+
+# Partition ranges [start, end) covering first..last, inclusive of the partitions they fall in
+def partition_ranges(first, last, interval=PARTITION_INTERVAL):
+    start = partition_start(first, interval)
+    step = partition_step(interval)
+    ranges = []
+    while start <= last:
+        ranges.append((start, start + step))
+        start += step
+    return ranges
+
+
+def table_kind(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE relname = %s AND relnamespace = 'public'::regnamespace", (table,))
+    row = cursor.fetchone()
+    return row[0] if row else None  # 'p' partitioned, 'r' plain table, None missing
+
+
+# Range-partitioned parent with its indexes and a default partition for out-of-range timestamps
+def create_partitioned_table(cursor, table):
+    columns = ", ".join(f"{column} {COLUMN_TYPES[column]}" for column in TABLE_COLUMNS[table])
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns}) PARTITION BY RANGE (timestamp)")
+    for index_columns in TABLE_INDEXES[table]:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_{'_'.join(index_columns)}_idx "
+                       f"ON {table} ({', '.join(index_columns)})")
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+
+# Create one partition. Rows that already landed in the default partition for this range are
+# moved into it first, otherwise PostgreSQL refuses to attach the new range.
+def create_partition(cursor, table, start, end):
+    name = partition_name(table, start)
+    cursor.execute("SELECT 1 FROM pg_class WHERE relname = %s", (name,))
+    if cursor.fetchone():
+        return False
+    cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+    cursor.execute(f"WITH moved AS (DELETE FROM {table}_default WHERE timestamp >= %s AND timestamp < %s RETURNING *) "
+                   f"INSERT INTO {name} SELECT * FROM moved", (start, end))
+    cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+    logger.info(f"Created partition {name} [{start:%Y-%m-%d}, {end:%Y-%m-%d})")
+    return True
+
+
+# Make sure partitions exist from today through PRECREATE_PARTITIONS intervals ahead
+def ensure_partitions(cursor, table, now=None, ahead=PRECREATE_PARTITIONS, interval=PARTITION_INTERVAL):
+    now = now or datetime.now()
+    last = partition_start(now, interval) + partition_step(interval) * ahead
+    return sum(create_partition(cursor, table, start, end) for start, end in partition_ranges(now, last, interval))
+
+
+# Add ingested_at to a log table that does not have it yet. Existing rows (including rows copied over by
+# migrate_table) keep NULL, so incremental readers do not read the whole history again; the column has no
+# NOT NULL constraint and a default added separately, so PostgreSQL does not rewrite the table.
+def ensure_ingestion_column(cursor, table):
+    cursor.execute("SELECT 1 FROM pg_attribute WHERE attrelid = %s::regclass AND attname = %s AND NOT attisdropped",
+                   (table, INGESTED_AT_COLUMN))
+    if cursor.fetchone():
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {INGESTED_AT_COLUMN} TIMESTAMP")
+    cursor.execute(f"ALTER TABLE {table} ALTER COLUMN {INGESTED_AT_COLUMN} SET DEFAULT clock_timestamp()")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_{INGESTED_AT_COLUMN}_idx ON {table} ({INGESTED_AT_COLUMN})")
+    logger.info(f"Added {INGESTED_AT_COLUMN} to {table}")
+    return True
+
+
+# Convert an existing plain table into a partitioned one, copying its history into partitions
+def migrate_table(cursor, table, keep_legacy=False):
+    legacy = f"{table}_legacy"
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    create_partitioned_table(cursor, table)
+    cursor.execute(f"SELECT MIN(timestamp), MAX(timestamp) FROM {legacy}")
+    first, last = cursor.fetchone()
+    if first is not None:
+        for start, end in partition_ranges(first, last):
+            create_partition(cursor, table, start, end)
+    ensure_partitions(cursor, table)
+    columns = ", ".join(TABLE_COLUMNS[table])
+    cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy}")
+    logger.info(f"Migrated {cursor.rowcount} rows from {legacy} into partitioned {table}")
+    if not keep_legacy:
+        cursor.execute(f"DROP TABLE {legacy}")
+
+
+# Create or migrate every log table and pre-create upcoming partitions; the caller commits. Collector pods
+# start in parallel and all run this, so the transaction first takes an advisory lock: the other pods
+# wait, then find the tables and partitions already in place. The lock is released on commit or rollback.
+def create_schema(cursor, keep_legacy=False):
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (SCHEMA_LOCK_NAME,))
+    for table in TABLE_COLUMNS:
+        kind = table_kind(cursor, table)
+        if kind == 'r':
+            migrate_table(cursor, table, keep_legacy)
+        elif kind is None:
+            create_partitioned_table(cursor, table)
+        ensure_ingestion_column(cursor, table)
+        ensure_partitions(cursor, table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create, migrate and maintain partitioned log tables")
+    parser.add_argument("--keep-legacy", action="store_true", help="keep <table>_legacy after migrating a plain table")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        create_schema(cursor, args.keep_legacy)
+        conn.commit()
+        cursor.close()
+        logger.info("Log table schema is up to date.")
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"Error updating log table schema: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
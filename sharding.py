@@ -0,0 +1,52 @@
+import bisect
+import hashlib
+import os
+import re
+
+# Shard configuration (can be set via environment variables for Docker / Kubernetes)
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', 1))
+SHARD_INDEX = os.getenv('SHARD_INDEX')  # defaults to the StatefulSet pod ordinal when unset
+VIRTUAL_NODES = 128  # ring points per shard; more points give a more even split
+
+
+# Stable 64-bit hash; Python's built-in hash() is salted per process and cannot be shared between shards
+def stable_hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+# Consistent-hash ring mapping device IDs to shard indexes. Growing from K to K+1 shards
+# only moves the devices whose nearest ring point now belongs to the new shard (about 1/(K+1)).
+class ConsistentHashRing:
+    def __init__(self, shard_count, virtual_nodes=VIRTUAL_NODES):
+        if shard_count < 1:
+            raise ValueError(f"shard_count must be at least 1, got {shard_count}")
+        self.shard_count = shard_count
+        points = sorted(
+            (stable_hash(f"shard-{shard}#{replica}"), shard)
+            for shard in range(shard_count)
+            for replica in range(virtual_nodes)
+        )
+        self.hashes = [point for point, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    def shard_for(self, device_id):
+        position = bisect.bisect(self.hashes, stable_hash(device_id)) % len(self.hashes)
+        return self.shards[position]
+
+    # Keep only the devices owned by shard_index, preserving the per-table layout
+    def assign(self, device_ids, shard_index):
+        return {
+            table: [device_id for device_id in ids if self.shard_for(device_id) == shard_index]
+            for table, ids in device_ids.items()
+        }
+
+
+# Shard index from SHARD_INDEX, or from the trailing ordinal of a StatefulSet pod name (collector-2 -> 2)
+def resolve_shard_index(shard_count=SHARD_COUNT, shard_index=SHARD_INDEX, hostname=None):
+    if shard_index is None:
+        match = re.search(r'-(\d+)$', hostname or os.getenv('HOSTNAME', ''))
+        shard_index = match.group(1) if match else 0
+    shard_index = int(shard_index)
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"Shard index {shard_index} is outside 0..{shard_count - 1}")
+    return shard_index
@@ -31,6 +31,13 @@ uptime_check_time = Summary('uptime_check_processing_seconds', 'Time spent check
 alerts_sent = Counter('alerts_sent', 'Total number of alerts sent')
 cctv_status_gauge = Gauge('cctv_status', 'Number of offline CCTV cameras')
 access_control_failures_gauge = Gauge('access_control_failures', 'Number of access control failures')
+stale_devices_gauge = Gauge('stale_devices', 'Number of devices with no row for STALE_AFTER seconds (DELTA_MODE only)')
+
+# Delta ingestion settings; set them to the collector's values (see data_collection.py)
+DELTA_MODE = os.getenv('DELTA_MODE', 'false').lower() == 'true'
+HEARTBEAT_INTERVAL = int(os.getenv('HEARTBEAT_INTERVAL', 900))
+STALE_AFTER = int(os.getenv('STALE_AFTER', HEARTBEAT_INTERVAL + 60))  # seconds without a row before a device is stale
+STALE_LOOKBACK_HOURS = float(os.getenv('STALE_LOOKBACK_HOURS', 24))  # history searched for devices that went quiet
 
 # Retry Configuration
 MAX_RETRIES = 3
@@ -91,18 +98,32 @@ def get_db_connection():
     )
     return conn
 
-# Query database for offline CCTV cameras
+# Query database for offline CCTV cameras. With DELTA_MODE an unchanged camera only writes a row per
+# HEARTBEAT_INTERVAL, longer than the window checked here, so the state is read from cctv_logs_dense
+# (created by data_collection.py), which carries each camera's last row forward for up to STALE_AFTER.
+# The timestamp reported is when that row was logged. Cameras with no row for longer are stale (see
+# check_stale_devices), not offline.
 @uptime_check_time.time()
 def check_cctv_uptime(conn):
     try:
         cursor = conn.cursor()
-        query = """
-        SELECT camera_id, timestamp 
-        FROM cctv_logs 
-        WHERE status = 'offline' 
-        AND timestamp >= NOW() - INTERVAL '10 minutes'
-        """
-        cursor.execute(query)
+        if DELTA_MODE:
+            query = """
+            SELECT camera_id, MAX(logged_at)
+            FROM cctv_logs_dense((NOW() - INTERVAL '10 minutes')::timestamp, NOW()::timestamp,
+                                 INTERVAL '60 seconds', make_interval(secs => %s))
+            WHERE status = 'offline'
+            GROUP BY camera_id
+            """
+            cursor.execute(query, (STALE_AFTER,))
+        else:
+            query = """
+            SELECT camera_id, timestamp 
+            FROM cctv_logs 
+            WHERE status = 'offline' 
+            AND timestamp >= NOW() - INTERVAL '10 minutes'
+            """
+            cursor.execute(query)
         offline_cameras = cursor.fetchall()
         cursor.close()
 
@@ -118,17 +139,27 @@ def check_cctv_uptime(conn):
     except Exception as e:
         logging.error(f"Error during CCTV uptime check: {e}")
 
-# Query database for access control failures
+# Query database for access control failures, from access_control_logs_dense with DELTA_MODE for the same reason
 def check_access_control_failures(conn):
     try:
         cursor = conn.cursor()
-        query = """
-        SELECT door_id, timestamp 
-        FROM access_control_logs 
-        WHERE access_granted = 0 
-        AND timestamp >= NOW() - INTERVAL '10 minutes'
-        """
-        cursor.execute(query)
+        if DELTA_MODE:
+            query = """
+            SELECT door_id, MAX(logged_at)
+            FROM access_control_logs_dense((NOW() - INTERVAL '10 minutes')::timestamp, NOW()::timestamp,
+                                           INTERVAL '60 seconds', make_interval(secs => %s))
+            WHERE access_granted = 0
+            GROUP BY door_id
+            """
+            cursor.execute(query, (STALE_AFTER,))
+        else:
+            query = """
+            SELECT door_id, timestamp 
+            FROM access_control_logs 
+            WHERE access_granted = 0 
+            AND timestamp >= NOW() - INTERVAL '10 minutes'
+            """
+            cursor.execute(query)
         failed_access_logs = cursor.fetchall()
         cursor.close()
 
@@ -144,6 +175,37 @@ def check_access_control_failures(conn):
     except Exception as e:
         logging.error(f"Error during access control failure check: {e}")
 
+# Query database for devices that stopped reporting (DELTA_MODE only): no row for STALE_AFTER seconds, so
+# their last known state no longer counts. Only the last STALE_LOOKBACK_HOURS are read, so the cost does
+# not grow with retained history; a device silent for longer has been reported on every check before.
+def check_stale_devices(conn):
+    try:
+        cursor = conn.cursor()
+        stale_devices = []
+        for table, id_column in (("cctv_logs", "camera_id"), ("access_control_logs", "door_id")):
+            query = f"""
+            SELECT {id_column}, MAX(timestamp)
+            FROM {table}
+            WHERE timestamp >= NOW() - make_interval(secs => %s)
+            GROUP BY {id_column}
+            HAVING MAX(timestamp) < NOW() - make_interval(secs => %s)
+            """
+            cursor.execute(query, (STALE_LOOKBACK_HOURS * 3600, STALE_AFTER))
+            stale_devices += cursor.fetchall()
+        cursor.close()
+
+        if stale_devices:
+            devices = ", ".join([f"{device} (last seen {last_seen})" for device, last_seen in stale_devices])
+            message = f"ALERT: The following devices have not reported for {STALE_AFTER} seconds:\n{devices}"
+            run(send_alert_email_async("Stale Device Alert", message))
+
+        # Update Prometheus gauge
+        stale_devices_gauge.set(len(stale_devices))
+        logging.info(f"Stale device check completed. Stale devices: {len(stale_devices)}")
+
+    except Exception as e:
+        logging.error(f"Error during stale device check: {e}")
+
 # Monitor system health for CCTV and Access Control in parallel
 def monitor_system_health():
     try:
@@ -151,11 +213,13 @@ def monitor_system_health():
         if conn:
             logging.info("Starting system health monitoring...")
 
-            with ThreadPoolExecutor(max_workers=2) as executor:
+            with ThreadPoolExecutor(max_workers=3) as executor:
                 futures = [
                     executor.submit(check_cctv_uptime, conn),
                     executor.submit(check_access_control_failures, conn)
                 ]
+                if DELTA_MODE:
+                    futures.append(executor.submit(check_stale_devices, conn))
                 for future in as_completed(futures):
                     future.result()
 
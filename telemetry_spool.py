@@ -0,0 +1,199 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from prometheus_client import Gauge, Counter
+
+# Spool configuration (can be set via environment variables for Docker)
+SPOOL_DIR = os.getenv('SPOOL_DIR', './spool')
+SPOOL_SEGMENT_BYTES = int(os.getenv('SPOOL_SEGMENT_BYTES', 64 * 1024 * 1024))  # rotate to a new segment past this size
+SPOOL_FSYNC = os.getenv('SPOOL_FSYNC', 'true').lower() == 'true'
+SPOOL_REPLAY_BATCH_ROWS = int(os.getenv('SPOOL_REPLAY_BATCH_ROWS', 10000))  # rows per replay transaction; bounds replay memory
+
+logger = logging.getLogger('SecuritySystemsLogger')
+
+# Prometheus metrics
+spool_bytes = Gauge('telemetry_spool_bytes', 'Bytes of telemetry waiting in the local spool')
+spool_segments = Gauge('telemetry_spool_segments', 'Number of spool segment files waiting for replay')
+spool_lag = Gauge('telemetry_spool_lag_seconds', 'Age of the oldest spooled batch')
+spool_quarantined = Counter('telemetry_spool_quarantined_segments', 'Spool segments moved aside after a permanent write error')
+
+
+# Append-only, segment-based spool for cycle batches ({table: [row dict, ...]}) that could not be
+# written to PostgreSQL. Each line of a segment is one batch as compact JSON: {"t": table, "c": columns,
+# "r": [[values], ...], "ts": spooled-at}. Segments are replayed oldest first, a few thousand rows per
+# transaction, and deleted once fully committed. Delivery is at-least-once: a crash between a commit and
+# saving the replay offset replays those rows again. Rows that can never be written (bad data rather than
+# an unreachable database) are moved to quarantine/.
+class TelemetrySpool:
+    def __init__(self, directory=SPOOL_DIR, segment_bytes=SPOOL_SEGMENT_BYTES, fsync=SPOOL_FSYNC,
+                 replay_batch_rows=SPOOL_REPLAY_BATCH_ROWS):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.replay_batch_rows = replay_batch_rows
+        self.lock = threading.Lock()
+        self.active = None  # open file object of the segment being appended to
+        self.sequence = 0
+        self.quarantine_directory = os.path.join(directory, 'quarantine')
+        os.makedirs(self.quarantine_directory, exist_ok=True)
+        self.update_metrics()
+
+    # Segment names sort by creation time: segment-<epoch ms>-<sequence>.ndjson
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, 'segment-*.ndjson')))
+
+    def pending(self):
+        return bool(self.segments())
+
+    def append(self, collected, columns_by_table):
+        lines = encode_batches(collected, columns_by_table)
+        if not lines:
+            return
+        with self.lock:
+            if self.active is None or self.active.tell() >= self.segment_bytes:
+                self.rotate()
+            self.active.write(''.join(lines))
+            self.active.flush()
+            if self.fsync:
+                os.fsync(self.active.fileno())
+            logger.warning(f"Spooled {sum(len(rows) for rows in collected.values())} rows to {self.active.name}")
+        self.update_metrics()
+
+    # Close the active segment so it can be replayed, and open a fresh one
+    def rotate(self):
+        self.seal()
+        self.sequence += 1
+        name = f"segment-{int(time.time() * 1000):013d}-{self.sequence:06d}.ndjson"
+        self.active = open(os.path.join(self.directory, name), 'a', encoding='utf-8')
+
+    def seal(self):
+        if self.active is not None:
+            self.active.close()
+            self.active = None
+
+    # Keep a batch that was rejected outright in its own quarantine segment, for inspection and manual replay
+    def quarantine(self, collected, columns_by_table):
+        lines = encode_batches(collected, columns_by_table)
+        if not lines:
+            return
+        with self.lock:
+            self.sequence += 1
+            name = f"segment-{int(time.time() * 1000):013d}-{self.sequence:06d}.ndjson"
+        path = self.write_quarantine(lines, name)
+        logger.error(f"Quarantined {sum(len(rows) for rows in collected.values())} rows to {path}")
+
+    def write_quarantine(self, lines, name):
+        path = os.path.join(self.quarantine_directory, name)
+        with open(path, 'w', encoding='utf-8') as segment:
+            segment.write(''.join(lines))
+        spool_quarantined.inc()
+        return path
+
+    # Drain every segment oldest first through write_func(collected), which must commit before returning.
+    # Each segment is read and written in sub-batches of about replay_batch_rows rows, so memory stays
+    # bounded whatever the segment size, and the byte offset reached is saved beside the segment after each
+    # one, so a replay that stops mid-segment resumes there. A sub-batch failing with one of quarantine_on
+    # (errors retrying cannot fix) is moved to quarantine/ and replay goes on; any other failure stops
+    # replay, leaving the rest of that segment and later ones for the next attempt.
+    def replay(self, write_func, quarantine_on=()):
+        with self.lock:
+            self.seal()
+            segments = self.segments()
+        replayed_rows = 0
+        for segment in segments:
+            for collected, lines, start, end in read_batches(segment, read_offset(segment), self.replay_batch_rows):
+                try:
+                    write_func(collected)
+                    replayed_rows += sum(len(rows) for rows in collected.values())
+                except quarantine_on as e:
+                    name = f"{os.path.basename(segment)[:-len('.ndjson')]}-{start:012d}.ndjson"
+                    self.write_quarantine(lines, name)
+                    logger.error(f"Quarantined rows at offset {start} of spool segment {segment} "
+                                 f"after a permanent write error: {e}")
+                save_offset(segment, end)
+                self.update_metrics()
+            os.remove(segment)
+            if os.path.exists(offset_path(segment)):
+                os.remove(offset_path(segment))
+            self.update_metrics()
+        if segments:
+            logger.info(f"Replayed {replayed_rows} spooled rows from {len(segments)} segment(s).")
+        return replayed_rows
+
+    def update_metrics(self):
+        segments = self.segments()
+        spool_segments.set(len(segments))
+        spool_bytes.set(sum(os.path.getsize(segment) - read_offset(segment) for segment in segments))
+        spool_lag.set(time.time() - segment_created_at(segments[0]) if segments else 0)
+
+
+def segment_created_at(path):
+    return int(os.path.basename(path).split('-')[1]) / 1000
+
+
+# One compact JSON line per table of a {table: [row dict, ...]} batch
+def encode_batches(collected, columns_by_table):
+    spooled_at = time.time()
+    return [
+        json.dumps({"t": table, "c": columns_by_table[table],
+                    "r": [[encode_value(row[column]) for column in columns_by_table[table]] for row in rows],
+                    "ts": spooled_at}, separators=(',', ':')) + '\n'
+        for table, rows in collected.items() if rows
+    ]
+
+
+# Timestamps are stored as ISO strings, which COPY and execute_values both accept for TIMESTAMP columns
+def encode_value(value):
+    return value.isoformat(sep=' ') if isinstance(value, datetime) else value
+
+
+# Replay progress of a segment: the byte offset up to which its lines have been written (or quarantined).
+# Not fsynced; losing it only replays those rows again.
+def offset_path(path):
+    return f"{path}.offset"
+
+
+def read_offset(path):
+    try:
+        with open(offset_path(path)) as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def save_offset(path, offset):
+    tmp_path = f"{offset_path(path)}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(offset))
+    os.replace(tmp_path, offset_path(path))
+
+
+# Rebuild merged {table: [row dict, ...]} batches of at least batch_rows rows (or to the end) from a segment,
+# starting at byte offset start. Yields (collected, raw lines, start offset, end offset) per batch and
+# skips unreadable lines, such as a torn trailing line.
+def read_batches(path, start=0, batch_rows=SPOOL_REPLAY_BATCH_ROWS):
+    collected, lines, row_count, batch_start = {}, [], 0, start
+    with open(path, 'rb') as segment:
+        segment.seek(start)
+        while True:
+            line = segment.readline()
+            if not line:
+                break
+            try:
+                batch = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                logger.error(f"Skipping unreadable line at offset {segment.tell() - len(line)} in spool segment {path}")
+                continue
+            collected.setdefault(batch["t"], []).extend(dict(zip(batch["c"], values)) for values in batch["r"])
+            lines.append(line.decode('utf-8'))
+            row_count += len(batch["r"])
+            if row_count >= batch_rows:
+                yield collected, lines, batch_start, segment.tell()
+                collected, lines, row_count, batch_start = {}, [], 0, segment.tell()
+        end = segment.tell()
+    if lines:
+        yield collected, lines, batch_start, end
@@ -0,0 +1,33 @@
+import pytest
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from cascade_inference import cascade_predict, evaluate_cascade
+
+
+@pytest.fixture
+def trained_models():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1000, 3))
+    y = ((X[:, 0] > 0) ^ (np.abs(X[:, 1]) < 0.3)).astype(int)
+    return LogisticRegression().fit(X, y), RandomForestClassifier(n_estimators=20, random_state=42).fit(X, y), X, y
+
+
+def test_band_edges_select_single_models(trained_models):
+    # Test that an empty band is the logistic regression and a full band is the random forest
+    lr_model, rf_model, X, _ = trained_models
+    lr_only, escalated = cascade_predict(lr_model, rf_model, X, low=0.5, high=0.5)
+    np.testing.assert_array_equal(lr_only, lr_model.predict(X))
+    assert not escalated.any()
+    rf_only, escalated = cascade_predict(lr_model, rf_model, X, low=0.0, high=1.0)
+    np.testing.assert_array_equal(rf_only, rf_model.predict(X))
+    assert escalated.all()
+
+
+def test_evaluate_cascade_reports_each_model(trained_models):
+    # Test the offline comparison table
+    lr_model, rf_model, X, y = trained_models
+    results = evaluate_cascade(lr_model, rf_model, X, y, [(0.2, 0.8)])
+    assert results['model'].tolist() == ['logistic regression', 'random forest', 'cascade (0.2, 0.8)']
+    assert results['forest_rows'].tolist()[:2] == [0, 1]
+    assert 0 < results['forest_rows'].iloc[2] < 1
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+import pandas as pd
+from dashboard_data import PredictionSeries
+
+
+@contextmanager
+def fake_connection():
+    yield None
+
+
+def test_incremental_refresh_reads_only_new_rows(mocker):
+    # Test that the first refresh loads database buckets and later refreshes read only rows after the watermark
+    series = PredictionSeries(history_hours=1, max_points=60, refresh_seconds=0)  # one-minute buckets
+    buckets = pd.DataFrame({
+        'bucket': pd.Series([pd.Timestamp('2024-10-10 12:00').value // 10**9 // 60,
+                             pd.Timestamp('2024-10-10 12:01').value // 10**9 // 60]),
+        'row_count': [4, 2], 'failure_count': [1, 2],
+        'newest': pd.to_datetime(['2024-10-10 12:00:50', '2024-10-10 12:01:20'])
+    })
+    new_rows = pd.DataFrame({'timestamp': pd.to_datetime(['2024-10-10 12:01:40', '2024-10-10 12:02:10']),
+                             'predictions': [0, 1]})
+    read_sql = mocker.patch('dashboard_data.pd.read_sql_query', side_effect=[buckets, new_rows])
+
+    series.refresh(fake_connection)
+    series.refresh(fake_connection)
+
+    assert read_sql.call_args_list[1][1]['params'] == {'since': pd.Timestamp('2024-10-10 12:01:20')}
+    x, y = series.points()
+    assert x == ['2024-10-10T12:00:00', '2024-10-10T12:01:00']  # 12:02 is still open
+    assert y == [0.25, round(2 / 3, 4)]
+    assert series.watermark == pd.Timestamp('2024-10-10 12:02:10')
+
+
+def test_points_after_last_sent():
+    # Test that a client only receives complete buckets newer than the last point it has
+    series = PredictionSeries(history_hours=1, max_points=60)
+    timestamps = pd.Series(pd.date_range('2024-10-10 12:00:00', periods=10, freq='30s'))
+    series.add_rows(timestamps, [1, 0, 0, 0, 1, 1, 0, 1, 1, 1])
+    assert series.points(after='2024-10-10T12:02:00') == (['2024-10-10T12:03:00'], [0.5])
+    assert series.points(after='2024-10-10T12:03:00') == ([], [])
+
+
+def test_refresh_is_shared_and_history_bounded(mocker):
+    # Test that refreshes within the interval skip the database and old buckets are dropped
+    series = PredictionSeries(history_hours=1, max_points=60, refresh_seconds=3600)
+    series.add_rows(pd.Series(pd.to_datetime(['2024-10-10 10:00:00', '2024-10-10 12:00:00'])), [1, 0])
+    read_sql = mocker.patch('dashboard_data.pd.read_sql_query',
+                            return_value=pd.DataFrame({'timestamp': pd.to_datetime([]), 'predictions': []}))
+    assert series.refresh(fake_connection) is True
+    assert series.refresh(fake_connection) is False
+    assert read_sql.call_count == 1
+    assert len(series.buckets) == 1
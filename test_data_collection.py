@@ -1,6 +1,11 @@
+import os
 import pytest
 import psycopg2
-from data_collection import get_db_connection, create_database, fetch_cctv_data, batch_insert
+import asyncio
+from datetime import datetime, timedelta
+import data_collection
+from data_collection import get_db_connection, create_database, fetch_cctv_data, batch_insert, copy_insert, PollScheduler, BatchWriter, DeltaFilter, AdaptivePollScheduler, parse_push_event, device_integer
+from telemetry_spool import TelemetrySpool
 
 
 @pytest.fixture
@@ -44,3 +49,162 @@ def test_batch_insert(db_connection):
     cursor.execute("SELECT COUNT(*) FROM cctv_logs")
     count = cursor.fetchone()[0]
     assert count > 0
+
+
+def test_poll_scheduler_bounds_concurrency(mocker):
+    # Test that family limits are respected and failed polls are dropped
+    in_flight = {'current': 0, 'peak': 0}
+
+    async def fake_fetch(session, camera_id):
+        in_flight['current'] += 1
+        in_flight['peak'] = max(in_flight['peak'], in_flight['current'])
+        await asyncio.sleep(0.01)
+        in_flight['current'] -= 1
+        if camera_id == 'CAM_003':
+            raise asyncio.TimeoutError()
+        return {'camera_id': camera_id}
+
+    mocker.patch.dict(data_collection.DEVICE_FAMILIES, {'cctv_logs': (fake_fetch, 'CAM', 10)})
+
+    async def run():
+        scheduler = PollScheduler(None, global_limit=5, family_limits={'cctv_logs': 2})
+        return await scheduler.poll({'cctv_logs': [f"CAM_{i:03}" for i in range(1, 11)]})
+
+    collected = asyncio.run(run())
+    assert len(collected['cctv_logs']) == 9
+    assert in_flight['peak'] <= 2
+
+
+def test_copy_insert_streams_csv(mocker):
+    # Test that rows are streamed through COPY in table column order
+    cursor = mocker.MagicMock()
+    data = [{'timestamp': '2024-10-10 12:00:00', 'camera_id': 'CAM_001', 'status': 'online', 'motion_detected': 1},
+            {'timestamp': '2024-10-10 12:00:00', 'camera_id': 'CAM_002', 'status': None, 'motion_detected': 0}]
+    copy_insert(cursor, 'cctv_logs', data)
+
+    sql, buffer = cursor.copy_expert.call_args[0]
+    assert sql.startswith("COPY cctv_logs (timestamp, camera_id, status, motion_detected) FROM STDIN")
+    assert buffer.read().splitlines() == ['2024-10-10 12:00:00,CAM_001,online,1', '2024-10-10 12:00:00,CAM_002,,0']
+
+
+def test_batch_writer_commits_off_loop(mocker):
+    # Test that queued batches are written and committed by the writer thread
+    conn = mocker.MagicMock(closed=False)
+    mocker.patch('data_collection.get_db_connection', return_value=conn)
+    insert = mocker.patch('data_collection.batch_insert')
+
+    async def run():
+        writer = BatchWriter(max_pending=1)
+        writer.start()
+        await writer.submit({'cctv_logs': [{'camera_id': 'CAM_001'}]})
+        await writer.submit({'intercom_logs': [{'intercom_id': 'INT_001'}]})
+        await writer.close()
+
+    asyncio.run(run())
+    assert insert.call_count == 2
+    assert conn.commit.call_count == 2
+
+
+def test_delta_filter_writes_changes_and_heartbeats():
+    # Test that unchanged rows are dropped until a state change or heartbeat
+    delta_filter = DeltaFilter(heartbeat_interval=300)
+    start = datetime(2024, 10, 10, 12, 0, 0)
+
+    def cycle(minute, status):
+        row = {'timestamp': start + timedelta(minutes=minute), 'camera_id': 'CAM_001', 'status': status, 'motion_detected': 0}
+        return len(delta_filter.filter({'cctv_logs': [row]})['cctv_logs'])
+
+    assert cycle(0, 'online') == 1
+    assert cycle(1, 'online') == 0
+    assert cycle(2, 'offline') == 1
+    assert cycle(3, 'offline') == 0
+    assert cycle(7, 'offline') == 1  # heartbeat
+
+
+def test_adaptive_scheduler_backs_off_stable_devices():
+    # Test that stable devices back off, changed devices return to the minimum and errors are retried fast
+    scheduler = AdaptivePollScheduler({'cctv_logs': ['CAM_001', 'CAM_002']}, min_interval=10, max_interval=40, now=0)
+    assert scheduler.due(0) == {'cctv_logs': ['CAM_001', 'CAM_002']}
+
+    def row(camera_id, status):
+        return {'camera_id': camera_id, 'status': status, 'motion_detected': 0}
+
+    polled = {'cctv_logs': ['CAM_001', 'CAM_002']}
+    scheduler.record(polled, {'cctv_logs': [row('CAM_001', 'online'), row('CAM_002', 'online')]}, now=0)
+    scheduler.record(polled, {'cctv_logs': [row('CAM_001', 'online'), row('CAM_002', 'offline')]}, now=10)
+    assert scheduler.intervals[('cctv_logs', 'CAM_001')] == 20
+    assert scheduler.intervals[('cctv_logs', 'CAM_002')] == 10
+
+    for now in (30, 70, 110):
+        scheduler.record({'cctv_logs': ['CAM_001']}, {'cctv_logs': [row('CAM_001', 'online')]}, now=now)
+    assert scheduler.intervals[('cctv_logs', 'CAM_001')] == 40
+
+    scheduler.record({'cctv_logs': ['CAM_001']}, {'cctv_logs': []}, now=150)
+    assert scheduler.intervals[('cctv_logs', 'CAM_001')] == 10
+
+
+def test_failed_writes_are_spooled_and_replayed(mocker, tmp_path):
+    # Test that batches survive a database outage and are replayed once writes succeed again
+    conn = mocker.MagicMock(closed=False)
+    mocker.patch('data_collection.get_db_connection', return_value=conn)
+    insert = mocker.patch('data_collection.batch_insert', side_effect=[psycopg2.OperationalError("down"), None, None])
+    spool = TelemetrySpool(str(tmp_path), fsync=False)
+    row = {'timestamp': datetime(2024, 10, 10, 12, 0, 0), 'camera_id': 'CAM_001', 'status': 'online', 'motion_detected': 1}
+
+    writer = BatchWriter(spool=spool)
+    writer.write({'cctv_logs': [row]})
+    assert spool.pending()
+
+    writer.write({'cctv_logs': [dict(row, camera_id='CAM_002')]})
+    assert not spool.pending()
+    replayed_table, replayed_rows = insert.call_args_list[2][0][1:]
+    assert replayed_table == 'cctv_logs'
+    assert replayed_rows == [dict(row, timestamp='2024-10-10 12:00:00')]
+
+
+def test_rejected_batches_are_quarantined_not_spooled(mocker, tmp_path):
+    # Test that a batch the database rejects is set aside instead of blocking the replay spool
+    conn = mocker.MagicMock(closed=False)
+    mocker.patch('data_collection.get_db_connection', return_value=conn)
+    mocker.patch('data_collection.batch_insert', side_effect=psycopg2.DataError("invalid input syntax for type integer"))
+    spool = TelemetrySpool(str(tmp_path), fsync=False)
+    row = {'timestamp': datetime(2024, 10, 10, 12, 0, 0), 'camera_id': 'CAM_001', 'status': 'online', 'motion_detected': True}
+
+    BatchWriter(spool=spool).write({'cctv_logs': [row]})
+    assert not spool.pending()
+    assert len(os.listdir(spool.quarantine_directory)) == 1
+
+
+def test_device_integer_coerces_reported_values():
+    # Test that booleans and numeric strings from devices become integers and other values are rejected
+    assert device_integer(True, 'motion_detected') == 1
+    assert device_integer('0', 'motion_detected') == 0
+    assert device_integer(1.0, 'access_granted') == 1
+    with pytest.raises(ValueError):
+        device_integer('yes', 'motion_detected')
+
+
+def test_parse_push_event_validates_fields():
+    # Test that pushed events are mapped to log rows and malformed ones are rejected
+    table, row = parse_push_event({'device_type': 'access_control', 'door_id': 'DOOR_007', 'access_granted': False,
+                                   'timestamp': '2024-10-10T12:00:00'})
+    assert table == 'access_control_logs'
+    assert row == {'timestamp': datetime(2024, 10, 10, 12, 0, 0), 'door_id': 'DOOR_007', 'access_granted': 0}
+
+    with pytest.raises(ValueError):
+        parse_push_event({'device_type': 'cctv', 'camera_id': 'CAM_001', 'status': 'online', 'motion_detected': 'yes'})
+    with pytest.raises(ValueError):
+        parse_push_event({'device_type': 'elevator', 'elevator_id': 'ELV_001'})
+
+
+def test_dense_functions_parse_as_postgresql(mocker):
+    # Test that the dense-function DDL, including the function bodies, is accepted by PostgreSQL's own parser
+    pglast = pytest.importorskip('pglast')
+    cursor = mocker.MagicMock()
+    data_collection.create_dense_functions(cursor)
+    statements = [call[0][0] for call in cursor.execute.call_args_list]
+    assert len(statements) == 2 * len(data_collection.TABLE_COLUMNS)
+    for statement in statements:
+        pglast.parse_sql(statement)
+        if '$$' in statement:
+            pglast.parse_sql(statement.split('$$')[1])  # PostgreSQL only parses the body when the function is created
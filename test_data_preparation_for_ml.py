@@ -0,0 +1,79 @@
+import pytest
+import pandas as pd
+from datetime import datetime
+import feature_store
+import data_preparation_for_ml
+from data_preparation_for_ml import build_query, load_watermarks, save_watermarks, preprocess_frame
+
+
+def test_build_query_bounds_by_watermark():
+    # Test that incremental queries only read rows ingested after the watermark and up to the lag bound
+    query, params = build_query('cctv_logs', datetime(2024, 10, 10, 12, 0), datetime(2024, 10, 10, 13, 0))
+    assert query == ("SELECT * FROM cctv_logs "
+                     "WHERE (ingested_at > %(since)s OR (ingested_at IS NULL AND timestamp > %(since)s)) "
+                     "AND (ingested_at <= %(until)s OR ingested_at IS NULL) ORDER BY timestamp")
+    assert params == {'since': datetime(2024, 10, 10, 12, 0), 'until': datetime(2024, 10, 10, 13, 0)}
+    assert build_query('cctv_logs') == ("SELECT * FROM cctv_logs ORDER BY timestamp", {})
+
+
+def test_watermark_follows_ingestion_not_event_time():
+    # Test that a row replayed late (old event time, new ingestion time) moves the watermark past it
+    raw = pd.DataFrame({'timestamp': pd.to_datetime(['2024-10-10 12:00:00', '2024-10-10 09:00:00', '2024-10-10 08:00:00']),
+                        'ingested_at': pd.to_datetime(['2024-10-10 12:00:01', '2024-10-10 12:30:00', None])})
+    assert data_preparation_for_ml.newest_ingested(raw) == pd.Timestamp('2024-10-10 12:30:00')
+    assert data_preparation_for_ml.newest_ingested(raw.iloc[[2]]) == pd.Timestamp('2024-10-10 08:00:00')
+
+
+def test_watermarks_round_trip(tmp_path):
+    # Test that watermarks persist between runs and a missing file means a full load
+    path = str(tmp_path / 'watermarks.json')
+    assert load_watermarks(path) == {}
+    save_watermarks({'cctv': datetime(2024, 10, 10, 12, 0, 30)}, path)
+    assert load_watermarks(path) == {'cctv': datetime(2024, 10, 10, 12, 0, 30)}
+
+
+def test_preprocess_frame_carries_forward_fill_across_chunks():
+    # Test that a streamed chunk starting with missing values is filled from the previous chunk
+    first = preprocess_frame('cctv', pd.DataFrame({
+        'timestamp': ['2024-10-10 12:00:00'], 'camera_id': ['CAM_001'], 'status': ['offline'], 'motion_detected': [1]}))
+    carry = first[['timestamp', 'camera_id', 'status', 'motion_detected']].tail(1)
+    second = preprocess_frame('cctv', pd.DataFrame({
+        'timestamp': ['2024-10-10 12:01:00'], 'camera_id': ['CAM_001'], 'status': [None], 'motion_detected': [0]}), carry)
+
+    assert len(second) == 1
+    assert second['status'].iloc[0] == 'offline'
+    assert second['label_failure'].iloc[0] == 1
+    assert second['status_encoded'].iloc[0] == 0
+
+
+def test_forward_fill_stays_within_each_device():
+    # Test that a camera's missing status comes from its own last row, even across streamed chunks
+    first = preprocess_frame('cctv', pd.DataFrame({
+        'timestamp': ['2024-10-10 12:00:00', '2024-10-10 12:00:10'], 'camera_id': ['CAM_001', 'CAM_002'],
+        'status': ['offline', 'online'], 'motion_detected': [1, 0]}))
+    carry = data_preparation_for_ml.device_carry('cctv', None, first, ['timestamp', 'camera_id', 'status', 'motion_detected'])
+    second = preprocess_frame('cctv', pd.DataFrame({
+        'timestamp': ['2024-10-10 12:01:00', '2024-10-10 12:01:10', '2024-10-10 12:01:20'],
+        'camera_id': ['CAM_001', 'CAM_002', 'CAM_003'], 'status': [None, None, None], 'motion_detected': [0, 0, 0]}), carry)
+
+    assert second['status'].astype(object).tolist()[:2] == ['offline', 'online']
+    assert pd.isna(second['status'].iloc[2])  # a new camera has nothing to fill from
+
+
+def test_recover_runs_completes_committed_and_drops_uncommitted(tmp_path, mocker):
+    # Test that a run committed before a crash advances the watermarks and an uncommitted one is discarded
+    root = str(tmp_path)
+    save = mocker.patch('data_preparation_for_ml.save_watermarks')
+    frame = pd.DataFrame({'timestamp': pd.to_datetime(['2024-10-10 12:00:00']), 'intercom_id': ['INT_001'],
+                          'status': ['active']})
+
+    committed_run = feature_store.begin_run(root)
+    feature_store.write_frame(frame, 'intercom', feature_store.staging_path(committed_run, root))
+    feature_store.commit_run(committed_run, metadata={'watermarks': {'intercom': '2024-10-10T12:00:00'}}, root=root)
+    abandoned_run = feature_store.begin_run(root)
+    feature_store.write_frame(frame, 'intercom', feature_store.staging_path(abandoned_run, root))
+
+    data_preparation_for_ml.recover_runs(root)
+    save.assert_called_once_with({'intercom': datetime(2024, 10, 10, 12, 0)})
+    assert feature_store.staged_runs(root) == []
+    assert len(feature_store.load_frame('intercom', root=root)) == 1
@@ -0,0 +1,26 @@
+import random
+import pytest
+from device_simulator import sample_latency, is_offline, device_number
+
+
+def test_device_number_bounds():
+    # Test that only IDs inside the simulated fleet are served
+    assert device_number('CAM_042', 'CAM', 200) == 42
+    assert device_number('CAM_201', 'CAM', 200) is None
+    assert device_number('DOOR_001', 'CAM', 200) is None
+
+
+def test_offline_ratio_is_stable():
+    # Test that offline devices are deterministic and roughly match the configured ratio
+    device_ids = [f"CAM_{i:03}" for i in range(1, 2001)]
+    offline = [device_id for device_id in device_ids if is_offline(device_id, 0.1)]
+    assert offline == [device_id for device_id in device_ids if is_offline(device_id, 0.1)]
+    assert 100 < len(offline) < 300
+
+
+@pytest.mark.parametrize("distribution", ['fixed', 'uniform', 'lognormal'])
+def test_sample_latency_mean(distribution):
+    # Test that each latency distribution is centred on the configured mean
+    rng = random.Random(0)
+    samples = [sample_latency(rng, distribution, 20.0, 0.5) for _ in range(5000)]
+    assert sum(samples) / len(samples) == pytest.approx(0.020, rel=0.1)
@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+import pandas as pd
+from event_correlation import correlate, CorrelationState
+
+ZONES = {'CAM_001': 'lobby', 'DOOR_001': 'lobby', 'INT_001': 'lobby',
+         'CAM_002': 'garage', 'DOOR_002': 'garage', 'INT_002': 'garage'}
+
+
+@pytest.fixture
+def access_data():
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-10-10 12:00:00', '2024-10-10 12:02:00', '2024-10-10 12:03:00',
+                                     '2024-10-10 12:04:00']),
+        'door_id': ['DOOR_001', 'DOOR_001', 'DOOR_002', 'DOOR_001'],
+        'access_granted': [0, 1, 0, 0]
+    })
+
+
+@pytest.fixture
+def intercom_data():
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-10-10 11:40:00', '2024-10-10 12:01:00']),
+        'intercom_id': ['INT_002', 'INT_001'],
+        'status': ['inactive', 'inactive']
+    })
+
+
+@pytest.fixture
+def cctv_data():
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-10-10 12:06:00', '2024-10-10 12:04:30', '2024-10-10 12:04:30']),
+        'camera_id': ['CAM_001', 'CAM_001', 'CAM_002'],
+        'status': ['offline', 'online', 'offline'],
+        'motion_detected': [0, 1, 0]
+    })
+
+
+def test_correlate_counts_events_per_zone_and_window(cctv_data, access_data, intercom_data):
+    # Test that only same-zone door events inside the window count, and rows keep their input order
+    result = correlate(cctv_data, access_data, intercom_data, ZONES, window=pd.Timedelta(minutes=5))
+    assert result['camera_id'].tolist() == ['CAM_001', 'CAM_001', 'CAM_002']
+    assert result['zone'].tolist() == ['lobby', 'lobby', 'garage']
+    assert result['door_denials_window'].tolist() == [1, 2, 1]
+    assert result['door_attempts_window'].tolist() == [2, 3, 1]
+    assert result['seconds_since_denial'].tolist() == pytest.approx([120, 30, 90])
+
+
+def test_correlate_ignores_stale_intercom_reports(cctv_data, access_data, intercom_data):
+    # Test that intercom status older than stale_after is treated as unknown
+    result = correlate(cctv_data, access_data, intercom_data, ZONES, stale_after=pd.Timedelta(minutes=10))
+    assert result['intercom_inactive'].tolist() == [1, 1, 0]
+    assert result['intercom_inactive_while_offline'].tolist() == [1, 0, 0]
+
+
+def test_state_matches_batch_and_prunes_old_events(cctv_data, access_data, intercom_data):
+    # Test that incremental updates (with overlapping polls) give the batch features and keep bounded history
+    state = CorrelationState(ZONES, window=pd.Timedelta(minutes=5), stale_after=pd.Timedelta(minutes=10))
+    state.update(access_data.iloc[:2], intercom_data)
+    state.update(access_data.iloc[1:], intercom_data.iloc[1:])
+    expected = correlate(cctv_data, access_data, intercom_data, ZONES, pd.Timedelta(minutes=5),
+                         pd.Timedelta(minutes=10))
+    result = state.features(cctv_data)
+    np.testing.assert_array_equal(result['door_denials_window'], expected['door_denials_window'])
+    np.testing.assert_array_equal(result['door_attempts_window'], expected['door_attempts_window'])
+    np.testing.assert_array_equal(result['intercom_inactive'], expected['intercom_inactive'])
+    assert len(state.access) == 4
+    assert state.intercom['intercom_id'].tolist() == ['INT_001']  # the 11:40 report fell out of the lookback
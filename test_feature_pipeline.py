@@ -0,0 +1,55 @@
+import pytest
+import numpy as np
+import pandas as pd
+import feature_pipeline
+from feature_pipeline import FeaturePipeline, build_features
+
+
+@pytest.fixture
+def cctv_data():
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-10-10 12:00:00', '2024-10-10 12:00:30', '2024-10-10 12:01:00',
+                                     '2024-10-10 13:00:00', '2024-10-10 13:00:30']),
+        'camera_id': ['CAM_001', 'CAM_002', 'CAM_001', 'CAM_002', 'CAM_001'],
+        'status': ['online', 'offline', 'offline', 'online', 'online'],
+        'motion_detected': [1, 0, 0, 1, 1]
+    })
+
+
+def test_build_features_windows_per_camera(cctv_data):
+    # Test that rolling and delta features never mix rows from different cameras
+    features = build_features(cctv_data)
+    assert features['motion_avg'].tolist() == pytest.approx([1.0, 0.0, 0.5, 0.5, 2 / 3])
+    assert features['online_delta'].tolist() == [0, 0, -1, 1, 1]
+    assert features['hour_of_day'].tolist() == [12, 12, 12, 13, 13]
+
+
+def test_transform_does_not_depend_on_batch(cctv_data):
+    # Test that scaling uses the fitted statistics rather than the batch being transformed
+    pipeline = FeaturePipeline().fit(cctv_data)
+    full = pipeline.transform(cctv_data)
+    camera_1 = cctv_data[cctv_data['camera_id'] == 'CAM_001']
+    np.testing.assert_allclose(pipeline.transform(camera_1), full[camera_1.index])
+    assert full.dtype == np.float32
+
+
+def test_save_and_load_checks_version(tmp_path, cctv_data, mocker):
+    # Test the artifact round trip and that a stale version is refused
+    path = str(tmp_path / 'feature_pipeline.pkl')
+    FeaturePipeline().fit(cctv_data).save(path)
+    loaded = FeaturePipeline.load(path)
+    assert loaded.feature_columns == feature_pipeline.FEATURE_COLUMNS
+
+    mocker.patch('feature_pipeline.FEATURE_PIPELINE_VERSION', 2)
+    with pytest.raises(ValueError):
+        FeaturePipeline.load(path)
+
+
+def test_partial_fit_matches_full_fit(cctv_data):
+    # Test that fitting chunk by chunk with the carried context gives the statistics of one fit over all rows
+    full = FeaturePipeline().fit(cctv_data)
+    pipeline, carry = FeaturePipeline(), None
+    for chunk in (cctv_data.iloc[:2], cctv_data.iloc[2:3], cctv_data.iloc[3:]):
+        carry = pipeline.partial_fit(chunk, carry)
+    np.testing.assert_allclose(pipeline.mean, full.mean, rtol=1e-6)
+    np.testing.assert_allclose(pipeline.scale, full.scale, rtol=1e-6)
@@ -0,0 +1,117 @@
+import os
+import pytest
+import pandas as pd
+from datetime import datetime
+import feature_store
+
+
+@pytest.fixture
+def cctv_frame():
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-10-09 23:59:00', '2024-10-10 08:00:00', '2024-10-10 12:00:00']),
+        'camera_id': ['CAM_001', 'CAM_002', 'CAM_001'],
+        'status': ['online', 'offline', 'online'],
+        'motion_detected': [1, 0, 1],
+        'label_failure': [0, 1, 0]
+    })
+
+
+def test_write_and_load_round_trip(tmp_path, cctv_frame):
+    # Test that appends add partitions and dtypes survive the round trip
+    root = str(tmp_path)
+    assert feature_store.write_frame(cctv_frame, 'cctv', root) == 3
+    feature_store.write_frame(cctv_frame.iloc[:1], 'cctv', root)
+    loaded = feature_store.load_frame('cctv', root=root).sort_values('timestamp', ignore_index=True)
+    assert len(loaded) == 4
+    assert list(loaded.columns) == list(cctv_frame.columns)
+    assert pd.api.types.is_datetime64_any_dtype(loaded['timestamp'])
+    assert (tmp_path / 'device_type=cctv' / 'date=2024-10-10').is_dir()
+
+
+def test_load_projects_columns_and_prunes_days(tmp_path, cctv_frame):
+    # Test column projection and time-range filtering
+    root = str(tmp_path)
+    feature_store.write_frame(cctv_frame, 'cctv', root)
+    feature_store.write_frame(cctv_frame, 'intercom', root)
+    loaded = feature_store.load_frame('cctv', columns=['camera_id', 'label_failure'],
+                                      start=datetime(2024, 10, 10, 9), root=root)
+    assert list(loaded.columns) == ['camera_id', 'label_failure']
+    assert loaded['camera_id'].tolist() == ['CAM_001']
+
+
+def test_footers_are_read_once_and_only_for_days_in_range(tmp_path, cctv_frame, mocker):
+    # Test that day partitions outside the range are pruned before their footers are read, and each footer is cached
+    root = str(tmp_path)
+    feature_store.write_frame(cctv_frame, 'cctv', root)
+    mocker.patch.dict(feature_store.file_schemas, clear=True)
+    start, end = datetime(2024, 10, 10), datetime(2024, 10, 10, 23)
+    assert len(feature_store.load_frame('cctv', start=start, end=end, root=root)) == 2
+    assert len(feature_store.file_schemas) == 1  # only the 2024-10-10 file
+
+    cached = next(iter(feature_store.file_schemas.values()))
+    file_schema = mocker.patch('feature_store.file_schema', wraps=feature_store.file_schema)
+    feature_store.load_frame('cctv', start=start, end=end, root=root)
+    assert file_schema.call_count == 1
+    assert len(feature_store.file_schemas) == 1 and next(iter(feature_store.file_schemas.values())) is cached
+
+    empty = feature_store.load_frame('cctv', columns=['label_failure'], start=datetime(2025, 1, 1), root=root)
+    assert list(empty.columns) == ['label_failure'] and empty.empty
+
+
+def test_training_file_round_trip(tmp_path, cctv_frame):
+    # Test the memory-mapped training file and that clearing a device type removes its partitions
+    root = str(tmp_path)
+    feature_store.write_frame(cctv_frame, 'cctv', root)
+    loaded = feature_store.load_training_frame('cctv', columns=['motion_detected', 'label_failure'], root=root)
+    assert sorted(loaded['label_failure'].tolist()) == [0, 0, 1]
+
+    feature_store.clear_device_type('cctv', root)
+    assert not (tmp_path / 'device_type=cctv').exists()
+
+
+def test_device_types_and_added_columns_share_the_store(tmp_path, cctv_frame):
+    # Test that device types with different columns and columns added later can still be scanned
+    root = str(tmp_path)
+    feature_store.write_frame(pd.DataFrame({'timestamp': pd.to_datetime(['2024-10-10 09:00:00']),
+                                            'door_id': ['DOOR_001'], 'access_granted': [0]}), 'access_control', root)
+    feature_store.write_frame(cctv_frame, 'cctv', root)
+    feature_store.write_frame(cctv_frame.assign(zone='lobby'), 'cctv', root)
+    loaded = feature_store.load_frame('cctv', columns=['camera_id', 'zone'], root=root)
+    assert len(loaded) == 6
+    assert loaded['zone'].isna().sum() == 3
+    assert feature_store.load_frame('intercom', columns=['timestamp'], root=root).empty
+
+
+def test_staged_runs_are_invisible_until_committed(tmp_path, cctv_frame):
+    # Test that a run's files only reach the store on commit, and that a rebuild replaces the stored rows
+    root = str(tmp_path)
+    feature_store.write_frame(cctv_frame, 'cctv', root)
+    run_id = feature_store.begin_run(root)
+    feature_store.write_frame(cctv_frame.iloc[:1], 'cctv', feature_store.staging_path(run_id, root))
+    assert len(feature_store.load_frame('cctv', root=root)) == 3
+
+    assert feature_store.commit_run(run_id, metadata={'cctv': 'mark'}, root=root) == {'cctv': 'mark'}
+    feature_store.discard_run(run_id, root)
+    assert len(feature_store.load_frame('cctv', root=root)) == 4
+    assert feature_store.staged_runs(root) == []
+
+    run_id = feature_store.begin_run(root)
+    feature_store.write_frame(cctv_frame.iloc[:2], 'cctv', feature_store.staging_path(run_id, root))
+    feature_store.commit_run(run_id, replace=['cctv', 'intercom'], metadata={}, root=root)
+    assert feature_store.finish_run(run_id, root) == {}  # repeating a finished commit is harmless
+    assert len(feature_store.load_frame('cctv', root=root)) == 2
+
+
+def test_training_file_is_refreshed_after_commit(tmp_path, cctv_frame):
+    # Test that a commit drops the stale training file and the next load exports it again with the new rows
+    root = str(tmp_path)
+    feature_store.write_frame(cctv_frame, 'cctv', root)
+    feature_store.write_frame(cctv_frame, 'cctv', root)  # two files, streamed into the export batch by batch
+    path = feature_store.export_training_file('cctv', root=root)
+    assert len(feature_store.load_training_frame('cctv', root=root)) == 6
+
+    run_id = feature_store.begin_run(root)
+    feature_store.write_frame(cctv_frame.iloc[:1], 'cctv', feature_store.staging_path(run_id, root))
+    feature_store.commit_run(run_id, root=root)
+    assert not os.path.exists(path)
+    assert len(feature_store.load_training_frame('cctv', root=root)) == 7
@@ -0,0 +1,41 @@
+import pytest
+import numpy as np
+import forest_compiler
+from sklearn.ensemble import RandomForestClassifier
+from forest_compiler import CompiledForest, compile_forest
+
+
+@pytest.fixture
+def forest_data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 4)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int)
+    return X, y
+
+
+def test_compiled_forest_matches_sklearn(forest_data):
+    # Test that probabilities and predictions are identical to sklearn, including rows equal to split thresholds
+    X, y = forest_data
+    model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=42).fit(X, y)
+    forest = CompiledForest(model)
+    X_test = np.vstack([X[:50], np.random.default_rng(1).normal(size=(500, 4)).astype(np.float32)])
+    np.testing.assert_array_equal(forest.compiled_proba(X_test), model.predict_proba(X_test))
+    np.testing.assert_array_equal(forest.predict(X_test[:1]), model.predict(X_test[:1]))
+
+
+def test_large_batches_use_sklearn(forest_data, mocker):
+    # Test that batches above COMPILED_MAX_PAIRS are handed to the sklearn model
+    X, y = forest_data
+    forest = CompiledForest(RandomForestClassifier(n_estimators=5, random_state=42).fit(X, y))
+    mocker.patch.object(forest_compiler, 'COMPILED_MAX_PAIRS', 50)
+    sklearn_proba = mocker.patch.object(forest.model, 'predict_proba', return_value=np.zeros((11, 2)))
+    forest.predict_proba(X[:10])
+    sklearn_proba.assert_not_called()
+    forest.predict_proba(X[:11])
+    sklearn_proba.assert_called_once()
+
+
+def test_compile_forest_falls_back_for_other_models():
+    # Test that models that are not forests are served as they are
+    model = {'model': 'lr'}
+    assert compile_forest(model) is model
@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+import pandas as pd
+from frame_compaction import compact_frame, compact_column, frame_memory
+
+
+@pytest.fixture
+def cctv_logs():
+    rows = 1000
+    return pd.DataFrame({
+        'timestamp': ['2024-10-10 12:00:00'] * rows,
+        'camera_id': [f"CAM_{i % 20 + 1:03}" for i in range(rows)],
+        'status': np.where(np.arange(rows) % 10 == 0, 'offline', 'online').astype(object),
+        'motion_detected': np.arange(rows) % 2,
+        'motion_avg': np.linspace(0, 1, rows)
+    })
+
+
+def test_compact_frame_applies_schema(cctv_logs):
+    # Test that IDs and statuses become categoricals, flags int8 and floats float32
+    before = frame_memory(cctv_logs)
+    compacted = compact_frame(cctv_logs, "CCTV Data")
+    assert isinstance(compacted['camera_id'].dtype, pd.CategoricalDtype)
+    assert isinstance(compacted['status'].dtype, pd.CategoricalDtype)
+    assert compacted['motion_detected'].dtype == 'int8'
+    assert compacted['motion_avg'].dtype == 'float32'
+    assert pd.api.types.is_datetime64_any_dtype(compacted['timestamp'])
+    assert frame_memory(compacted) < before / 2
+
+
+def test_flag_with_gaps_stays_int8():
+    # Test that a flag column with missing values uses the nullable Int8 dtype
+    series = compact_column(pd.Series([1, None, 0]), 'int8')
+    assert series.dtype == 'Int8'
+    assert series.isna().sum() == 1
+
+
+def test_unknown_columns_are_inferred():
+    # Test downcasting of columns outside the schema
+    df = compact_frame(pd.DataFrame({'count': [1, 2, 300], 'ratio': [0.1, 0.2, 0.3], 'note': ['a', 'b', 'c']}))
+    assert df['count'].dtype == 'int16'
+    assert df['ratio'].dtype == 'float32'
+    assert df['note'].dtype != 'category'  # every value unique, so not worth a categorical
@@ -1,5 +1,11 @@
 import pytest
-from model_integration import preprocess_data, predict_failures, handle_alerts
+import asyncio
+import numpy as np
+import psycopg2
+from model_integration import preprocess_data, predict_failures, handle_alerts, MicroBatcher, parse_inference_row, predict_batch
+from model_integration import save_predictions_to_db, SourcePoller, run_monitoring_cycle, real_time_monitoring
+from model_registry import ModelBundle
+from feature_pipeline import FeaturePipeline
 import pandas as pd
 
 @pytest.fixture
@@ -13,20 +19,180 @@ def sample_real_time_data():
     }
     return pd.DataFrame(data)
 
-def test_preprocess_data(sample_real_time_data):
+@pytest.fixture
+def model_bundle(sample_real_time_data, mocker):
+    # Registry bundle with mocked models, so no model files are needed
+    rf_model = mocker.Mock()
+    rf_model.predict.return_value = np.array([1, 0])
+    lr_model = mocker.Mock()
+    lr_model.predict.return_value = np.array([0, 0])
+    lr_model.classes_ = np.array([0, 1])
+    lr_model.predict_proba.return_value = np.array([[0.98, 0.02], [0.4, 0.6]])
+    bundle = ModelBundle('test', rf_model, lr_model, FeaturePipeline().fit(sample_real_time_data))
+    mocker.patch('model_integration.model_registry.current', return_value=bundle)
+    return bundle
+
+def test_preprocess_data(sample_real_time_data, model_bundle):
     # Test preprocessing of real-time data
     processed_data = preprocess_data(sample_real_time_data)
     assert 'motion_avg' in processed_data.columns
     assert 'online_delta' in processed_data.columns
 
-def test_predict_failures(sample_real_time_data, mocker):
-    # Mock model predictions
-    mock_rf_model = mocker.patch('model_integration.rf_model.predict', return_value=[1, 0])
-    predictions = predict_failures(sample_real_time_data)
+def test_predict_failures(sample_real_time_data, model_bundle, mocker):
+    # Test predictions with the mocked models from the registry, in both prediction modes
+    mocker.patch('model_integration.PREDICTION_MODE', 'forest')
+    predictions = predict_failures(preprocess_data(sample_real_time_data))
     assert 'predictions' in predictions.columns
+    model_bundle.rf_model.predict.assert_called_once()
+
+def test_predict_failures_cascade(sample_real_time_data, model_bundle, mocker):
+    # Test that only the row the logistic regression is unsure about reaches the random forest
+    mocker.patch('model_integration.PREDICTION_MODE', 'cascade')
+    model_bundle.rf_model.predict.return_value = np.array([0])
+    predictions = predict_failures(preprocess_data(sample_real_time_data))
+    assert predictions['predictions'].tolist() == [0, 0]
+    assert len(model_bundle.rf_model.predict.call_args[0][0]) == 1
 
 def test_handle_alerts(sample_real_time_data, mocker):
     # Test alert handling (trigger email alert)
     mocker.patch('model_integration.send_alert_email', return_value=None)
     handle_alerts(sample_real_time_data, threshold=0.5)
     assert True  # If no exception, test passes
+
+def test_micro_batcher_batches_and_splits(mocker):
+    # Test that concurrent submissions share one model call and each caller gets its own predictions
+    predict_batch = mocker.patch('model_integration.predict_batch', side_effect=lambda rows: [len(rows)] * len(rows))
+
+    async def run():
+        batcher = MicroBatcher(max_batch=10, max_wait=0.05)
+        batcher.start()
+        results = await asyncio.gather(batcher.submit([{}] * 2), batcher.submit([{}]), batcher.submit([{}] * 3))
+        await batcher.close()
+        return results
+
+    assert asyncio.run(run()) == [[6, 6], [6], [6, 6, 6]]
+    predict_batch.assert_called_once()
+
+def test_parse_inference_row_rejects_bad_rows():
+    # Test inference request validation
+    row = parse_inference_row({'camera_id': 'CAM_001', 'status': 'online', 'motion_detected': True})
+    assert row['motion_detected'] == 1
+    with pytest.raises(ValueError):
+        parse_inference_row({'camera_id': 'CAM_001', 'status': 'online', 'motion_detected': 'yes'})
+    for timestamp in ('', 'NaT', 'nan'):
+        with pytest.raises(ValueError):
+            parse_inference_row({'timestamp': timestamp, 'camera_id': 'CAM_001', 'status': 'online', 'motion_detected': 1})
+
+def test_predict_batch_rejects_dropped_rows(mocker):
+    # Test that a batch whose preprocessing drops rows fails instead of shifting predictions between callers
+    mocker.patch('model_integration.model_registry')
+    mocker.patch('model_integration.preprocess_data', side_effect=lambda df, bundle: df.iloc[1:])
+    mocker.patch('model_integration.predict_failures', side_effect=lambda df, bundle: df.assign(predictions=1))
+    rows = [parse_inference_row({'camera_id': f'CAM_00{i}', 'status': 'online', 'motion_detected': 1}) for i in range(3)]
+    with pytest.raises(RuntimeError):
+        predict_batch(rows)
+
+@pytest.fixture
+def prediction_data():
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-10-10 12:00:00', '2024-10-10 12:05:00']),
+        'motion_detected': [1, 0], 'motion_avg': [0.5, float('nan')], 'online_delta': [0.0, -1.0],
+        'hour_of_day': [12, 12], 'predictions': [1, 0], 'camera_id': ['CAM_001', 'CAM_002']
+    })
+
+def test_save_predictions_copies_one_batch(prediction_data, mocker):
+    # Test that a batch is written with a single COPY on a pooled connection, which is returned afterwards
+    pool = mocker.patch('model_integration.get_db_pool').return_value
+    conn = pool.getconn.return_value
+    conn.closed = 0
+    cursor = conn.cursor.return_value.__enter__.return_value
+    save_predictions_to_db(prediction_data)
+    sql, buffer = cursor.copy_expert.call_args[0]
+    assert sql.startswith("COPY prediction_logs (timestamp, motion_detected")
+    assert buffer.getvalue().splitlines() == ['2024-10-10 12:00:00,1,0.5,0.0,12,1', '2024-10-10 12:05:00,0,,-1.0,12,0']
+    conn.commit.assert_called_once()
+    pool.putconn.assert_called_once_with(conn, close=False)
+
+def test_save_predictions_falls_back_to_execute_values(prediction_data, mocker):
+    # Test the multi-row INSERT fallback when COPY is rejected
+    pool = mocker.patch('model_integration.get_db_pool').return_value
+    pool.getconn.return_value.closed = 0
+    cursor = pool.getconn.return_value.cursor.return_value.__enter__.return_value
+    cursor.copy_expert.side_effect = psycopg2.Error("COPY not supported")
+    execute_values = mocker.patch('model_integration.execute_values')
+    save_predictions_to_db(prediction_data)
+    rows = execute_values.call_args[0][2]
+    assert len(rows) == 2 and rows[1][2] is None
+
+def test_source_poller_advances_watermarks(mocker):
+    # Test one query per source per poll, each resuming after the newest ingested row once the tick commits
+    mocker.patch('model_integration.pooled_connection')
+    cctv = pd.DataFrame({'timestamp': pd.to_datetime(['2024-10-10 11:00:00', '2024-10-10 12:00:30']),
+                         'camera_id': ['CAM_001', 'CAM_002'], 'status': ['online', 'online'], 'motion_detected': [1, 0],
+                         'ingested_at': pd.to_datetime(['2024-10-10 12:00:40', '2024-10-10 12:00:35'])})
+    empty = pd.DataFrame({'timestamp': pd.to_datetime([]), 'ingested_at': pd.to_datetime([])})
+    read_sql = mocker.patch('model_integration.pd.read_sql_query', side_effect=[cctv, empty, empty] * 3)
+    poller = SourcePoller()
+    frames = poller.poll()
+    assert read_sql.call_count == 3
+    assert 'ingested_at' not in frames['cctv'].columns
+    assert poller.watermarks['cctv'] is None  # not committed yet
+
+    poller.poll()
+    assert 'NOW() - make_interval' in read_sql.call_args_list[3][0][0]
+    poller.commit()
+    assert poller.watermarks == {'cctv': pd.Timestamp('2024-10-10 12:00:40'), 'access_control': None, 'intercom': None}
+    poller.poll()
+    assert read_sql.call_args_list[6][1]['params']['since'] == pd.Timestamp('2024-10-10 12:00:40')
+    assert 'ingested_at > %(since)s' in read_sql.call_args_list[6][0][0]
+
+def test_monitoring_cycle_scores_cctv_once(sample_real_time_data, mocker):
+    # Test that a tick feeds door and intercom events to the correlation state and scores CCTV rows once
+    access = pd.DataFrame({'timestamp': [], 'door_id': [], 'access_granted': []})
+    intercom = pd.DataFrame({'timestamp': [], 'intercom_id': [], 'status': []})
+    poller = mocker.Mock()
+    poller.poll.return_value = {'cctv': sample_real_time_data, 'access_control': access, 'intercom': intercom}
+    correlation_state = mocker.patch('model_integration.get_correlation_state').return_value
+    correlation_state.features.side_effect = lambda df: df
+    mocker.patch('model_integration.model_registry')
+    mocker.patch('model_integration.preprocess_data', side_effect=lambda df, bundle: df)
+    predict = mocker.patch('model_integration.predict_failures', side_effect=lambda df, bundle: df)
+    mocker.patch('model_integration.handle_alerts')
+    save = mocker.patch('model_integration.save_predictions_to_db', return_value=True)
+    run_monitoring_cycle(poller)
+    correlation_state.update.assert_called_once_with(access, intercom)
+    predict.assert_called_once()
+    save.assert_called_once()
+    poller.commit.assert_called_once()
+
+def test_monitoring_cycle_keeps_watermarks_when_save_fails(sample_real_time_data, mocker):
+    # Test that rows whose predictions were not saved are neither alerted on nor skipped by the next poll
+    poller = mocker.Mock()
+    poller.poll.return_value = {'cctv': sample_real_time_data, 'access_control': None, 'intercom': None}
+    mocker.patch('model_integration.get_correlation_state').return_value.features.side_effect = lambda df: df
+    mocker.patch('model_integration.model_registry')
+    mocker.patch('model_integration.preprocess_data', side_effect=lambda df, bundle: df)
+    mocker.patch('model_integration.predict_failures', side_effect=[None, sample_real_time_data])
+    alerts = mocker.patch('model_integration.handle_alerts')
+    mocker.patch('model_integration.save_predictions_to_db', return_value=False)
+
+    assert run_monitoring_cycle(poller) is None  # not scored
+    assert run_monitoring_cycle(poller) is None  # scored, not saved
+    alerts.assert_not_called()
+    poller.commit.assert_not_called()
+
+def test_monitoring_survives_failed_tick(sample_real_time_data, mocker):
+    # Test that a poll error is logged and the next tick polls again instead of stopping the loop
+    poller = mocker.Mock(interval=60)
+    poller.poll.side_effect = [psycopg2.OperationalError("could not connect"),
+                               {'cctv': sample_real_time_data, 'access_control': None, 'intercom': None}]
+    mocker.patch('model_integration.get_correlation_state').return_value.features.side_effect = lambda df: df
+    mocker.patch('model_integration.model_registry')
+    mocker.patch('model_integration.preprocess_data', side_effect=lambda df, bundle: df)
+    mocker.patch('model_integration.predict_failures', side_effect=lambda df, bundle: df)
+    mocker.patch('model_integration.handle_alerts')
+    save = mocker.patch('model_integration.save_predictions_to_db', return_value=True)
+    mocker.patch('model_integration.time.sleep', side_effect=[None, KeyboardInterrupt])
+    real_time_monitoring(poller)
+    assert poller.poll.call_count == 2
+    save.assert_called_once()
@@ -0,0 +1,50 @@
+import os
+import joblib
+import pandas as pd
+from feature_pipeline import FeaturePipeline
+from model_registry import ModelRegistry, MODEL_FILES, latest_version, publish_version
+
+
+def write_artifacts(directory, label):
+    os.makedirs(directory, exist_ok=True)
+    cctv_data = pd.DataFrame({'timestamp': pd.to_datetime(['2024-10-10 12:00:00', '2024-10-10 13:00:00']),
+                              'camera_id': ['CAM_001', 'CAM_001'], 'status': ['online', 'offline'],
+                              'motion_detected': [1, 0]})
+    joblib.dump({'model': 'rf', 'label': label}, os.path.join(directory, MODEL_FILES['rf_model']))
+    joblib.dump({'model': 'lr', 'label': label}, os.path.join(directory, MODEL_FILES['lr_model']))
+    FeaturePipeline().fit(cctv_data).save(os.path.join(directory, MODEL_FILES['feature_pipeline']))
+    return [os.path.join(directory, file) for file in MODEL_FILES.values()]
+
+
+def test_registry_loads_lazily(tmp_path, mocker):
+    # Test that nothing is read until the first current() call
+    write_artifacts(str(tmp_path / 'models' / '001'), 'v1')
+    load = mocker.spy(joblib, 'load')
+    registry = ModelRegistry(model_dir=str(tmp_path / 'models'))
+    assert load.call_count == 0
+    assert registry.current().rf_model['label'] == 'v1'
+    assert registry.current() is registry.current()
+
+
+def test_refresh_swaps_in_newer_version(tmp_path):
+    # Test that a published version replaces the served one while old bundles stay usable
+    models = str(tmp_path / 'models')
+    write_artifacts(os.path.join(models, '001'), 'v1')
+    registry = ModelRegistry(model_dir=models)
+    old_bundle = registry.current()
+    assert registry.refresh() is False
+
+    publish_version(write_artifacts(str(tmp_path / 'trained'), 'v2'), models, version='002')
+    assert registry.refresh() is True
+    assert registry.current().version == '002'
+    assert registry.current().lr_model['label'] == 'v2'
+    assert old_bundle.lr_model['label'] == 'v1'
+
+
+def test_incomplete_versions_are_ignored(tmp_path):
+    # Test that staging directories and versions with missing files are never served
+    models = str(tmp_path / 'models')
+    write_artifacts(os.path.join(models, '001'), 'v1')
+    write_artifacts(os.path.join(models, '.003.tmp'), 'staging')
+    os.makedirs(os.path.join(models, '002'))
+    assert latest_version(models) == '001'
@@ -0,0 +1,41 @@
+import pytest
+import numpy as np
+import pandas as pd
+from parallel_preprocessing import run_partitioned, partition_bounds, plan_tasks
+
+
+# Per-device rolling mean over 3 rows, so each row needs up to 2 rows of halo
+def rolling_motion(df):
+    df['motion_avg'] = df.groupby('camera_id', observed=True)['motion_detected'].transform(
+        lambda s: s.rolling(3, min_periods=1).mean())
+    return df
+
+
+@pytest.fixture
+def cctv_logs():
+    rng = np.random.default_rng(7)
+    rows = 600
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp('2024-10-10') + pd.to_timedelta(np.sort(rng.integers(0, 3 * 86400, rows)), unit='s'),
+        'camera_id': pd.Categorical(rng.choice(['CAM_001', 'CAM_002', 'CAM_003'], rows)),
+        'motion_detected': rng.integers(0, 2, rows).astype('int8')
+    })
+
+
+def test_partitioned_matches_single_pass_across_partition_boundaries(cctv_logs):
+    # Test that rolling features see the previous day's rows through the halo and the order is restored
+    single_pass = rolling_motion(cctv_logs.copy())
+    partitioned = run_partitioned(cctv_logs.copy(), 'camera_id', rolling_motion, halo_rows=2,
+                                  task_rows=50, min_rows=0)
+    pd.testing.assert_frame_equal(partitioned, single_pass, check_dtype=False)
+
+
+def test_plan_tasks_limits_halo_to_the_same_device():
+    # Test that tasks never take halo rows from another device
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2024-10-10', '2024-10-11', '2024-10-11', '2024-10-10', '2024-10-11']),
+        'camera_id': ['CAM_001', 'CAM_001', 'CAM_001', 'CAM_002', 'CAM_002']
+    })
+    partitions, device_starts = partition_bounds(df, 'camera_id')
+    assert partitions == [(0, 1), (1, 3), (3, 4), (4, 5)]
+    assert plan_tasks(partitions, device_starts, task_rows=1, halo_rows=5) == [(0, 1, 0), (1, 3, 1), (3, 4, 0), (4, 5, 1)]
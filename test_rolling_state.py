@@ -0,0 +1,44 @@
+import pytest
+import numpy as np
+import pandas as pd
+from feature_pipeline import build_features
+from rolling_state import RollingState
+
+
+@pytest.fixture
+def cctv_data():
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-10-10 12:00:00', periods=8, freq='30s'),
+        'camera_id': ['CAM_001', 'CAM_002', 'CAM_001', 'CAM_001', 'CAM_002', 'CAM_003', 'CAM_001', 'CAM_002'],
+        'status': ['online', 'online', 'offline', 'online', 'offline', 'online', 'online', 'online'],
+        'motion_detected': [1, 0, 0, 1, 1, 1, 1, 0]
+    })
+
+
+def test_batches_match_full_history(cctv_data):
+    # Test that features built batch by batch equal the per-camera window features over the whole frame
+    expected = build_features(cctv_data)
+    state = RollingState(window=3, capacity=2)  # also forces the slot arrays to grow
+    batches = [build_features(cctv_data.iloc[:3], state=state), build_features(cctv_data.iloc[3:], state=state)]
+    result = pd.concat(batches, ignore_index=True)
+    np.testing.assert_allclose(result['motion_avg'], expected['motion_avg'])
+    np.testing.assert_array_equal(result['online_delta'], expected['online_delta'])
+
+
+def test_ewma_per_device(cctv_data):
+    # Test that the EWMA starts at the first value and follows each camera separately
+    state = RollingState(window=3, alpha=0.5)
+    features = build_features(cctv_data, state=state)
+    camera_1 = cctv_data['camera_id'] == 'CAM_001'
+    assert features.loc[camera_1, 'motion_ewma'].tolist() == pytest.approx([1.0, 0.5, 0.75, 0.875])
+
+
+def test_replayed_events_are_not_applied_twice(cctv_data):
+    # Test that rows from an overlapping poll get the current values without moving the windows
+    state = RollingState(window=3)
+    first = build_features(cctv_data, state=state)
+    ring = state.ring.copy()
+    replay = build_features(cctv_data.iloc[-2:], state=state)
+    np.testing.assert_array_equal(state.ring, ring)
+    np.testing.assert_allclose(replay['motion_avg'], first['motion_avg'].iloc[-2:])
+    assert replay['online_delta'].tolist() == [0, 0]
@@ -0,0 +1,53 @@
+import pytest
+from datetime import datetime
+from schema_management import partition_start, partition_ranges, partition_name, create_partition, create_schema, ensure_ingestion_column
+
+
+def test_partition_start_weekly_aligns_to_monday():
+    # Test that weekly partitions start on Monday
+    assert partition_start(datetime(2024, 10, 10, 15, 30), 'weekly') == datetime(2024, 10, 7)
+    assert partition_start(datetime(2024, 10, 10, 15, 30), 'daily') == datetime(2024, 10, 10)
+
+
+def test_partition_ranges_cover_span():
+    # Test that daily ranges are contiguous and cover both ends of the span
+    ranges = partition_ranges(datetime(2024, 10, 10, 23, 59), datetime(2024, 10, 12, 0, 1), 'daily')
+    assert ranges == [(datetime(2024, 10, 10), datetime(2024, 10, 11)),
+                      (datetime(2024, 10, 11), datetime(2024, 10, 12)),
+                      (datetime(2024, 10, 12), datetime(2024, 10, 13))]
+    assert partition_name('cctv_logs', ranges[0][0]) == 'cctv_logs_p20241010'
+
+
+def test_create_partition_moves_default_rows_before_attach(mocker):
+    # Test that rows parked in the default partition are moved before the range is attached
+    cursor = mocker.MagicMock()
+    cursor.fetchone.return_value = None
+    assert create_partition(cursor, 'cctv_logs', datetime(2024, 10, 10), datetime(2024, 10, 11))
+
+    statements = [call[0][0] for call in cursor.execute.call_args_list]
+    assert statements[1].startswith("CREATE TABLE cctv_logs_p20241010")
+    assert "DELETE FROM cctv_logs_default" in statements[2]
+    assert statements[3].startswith("ALTER TABLE cctv_logs ATTACH PARTITION cctv_logs_p20241010")
+
+
+def test_create_schema_takes_advisory_lock_first(mocker):
+    # Test that concurrent collectors serialise schema changes behind a transaction-level advisory lock
+    cursor = mocker.MagicMock()
+    cursor.fetchone.return_value = ('p',)
+    create_schema(cursor)
+    assert cursor.execute.call_args_list[0][0][0] == "SELECT pg_advisory_xact_lock(hashtext(%s))"
+
+
+def test_ensure_ingestion_column_adds_it_once(mocker):
+    # Test that ingested_at is added without a table rewrite (nullable, default set separately) and only when missing
+    cursor = mocker.MagicMock()
+    cursor.fetchone.return_value = None
+    assert ensure_ingestion_column(cursor, 'cctv_logs')
+    statements = [call[0][0] for call in cursor.execute.call_args_list]
+    assert statements[1] == "ALTER TABLE cctv_logs ADD COLUMN ingested_at TIMESTAMP"
+    assert statements[2] == "ALTER TABLE cctv_logs ALTER COLUMN ingested_at SET DEFAULT clock_timestamp()"
+
+    cursor.reset_mock()
+    cursor.fetchone.return_value = (1,)
+    assert not ensure_ingestion_column(cursor, 'cctv_logs')
+    assert cursor.execute.call_count == 1
@@ -0,0 +1,32 @@
+import pytest
+from sharding import ConsistentHashRing, resolve_shard_index
+
+
+@pytest.fixture
+def device_ids():
+    return {'cctv_logs': [f"CAM_{i:03}" for i in range(1, 5001)],
+            'access_control_logs': [f"DOOR_{i:03}" for i in range(1, 1001)]}
+
+
+def test_assign_partitions_every_device(device_ids):
+    # Test that each device is owned by exactly one shard
+    ring = ConsistentHashRing(4)
+    shards = [ring.assign(device_ids, index) for index in range(4)]
+    for table, ids in device_ids.items():
+        assigned = [device_id for shard in shards for device_id in shard[table]]
+        assert sorted(assigned) == sorted(ids)
+
+
+def test_scale_out_moves_about_one_in_k(device_ids):
+    # Test that adding a fifth shard moves roughly a fifth of the fleet
+    before, after = ConsistentHashRing(4), ConsistentHashRing(5)
+    ids = device_ids['cctv_logs']
+    moved = sum(before.shard_for(device_id) != after.shard_for(device_id) for device_id in ids) / len(ids)
+    assert 0.1 < moved < 0.3
+
+
+def test_resolve_shard_index_from_pod_name():
+    # Test that StatefulSet pod ordinals are used when SHARD_INDEX is unset
+    assert resolve_shard_index(3, None, 'security-system-collector-2') == 2
+    with pytest.raises(ValueError):
+        resolve_shard_index(3, 5)
@@ -0,0 +1,87 @@
+import os
+import pytest
+from datetime import datetime
+from telemetry_spool import TelemetrySpool
+
+COLUMNS = {'intercom_logs': ('timestamp', 'intercom_id', 'status')}
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return TelemetrySpool(str(tmp_path), segment_bytes=200, fsync=False)
+
+
+def test_append_rotates_segments(spool):
+    # Test that segments rotate once they pass the size limit
+    for i in range(5):
+        spool.append({'intercom_logs': [{'timestamp': datetime(2024, 10, 10, 12, i), 'intercom_id': f"INT_{i:03}",
+                                         'status': 'active'}] * 3}, COLUMNS)
+    assert len(spool.segments()) > 1
+
+
+def test_replay_drains_in_order_and_stops_on_failure(spool):
+    # Test that replay merges batches per segment and keeps unreplayed segments after a failure
+    for i in range(4):
+        spool.append({'intercom_logs': [{'timestamp': datetime(2024, 10, 10, 12, i), 'intercom_id': 'INT_001',
+                                         'status': 'inactive'}] * 3}, COLUMNS)
+    segment_count = len(spool.segments())
+    written = []
+
+    def flaky_write(collected):
+        if written:
+            raise ConnectionError("database down")
+        written.append(collected)
+
+    with pytest.raises(ConnectionError):
+        spool.replay(flaky_write)
+    assert len(spool.segments()) == segment_count - 1
+    assert written[0]['intercom_logs'][0] == {'timestamp': '2024-10-10 12:00:00', 'intercom_id': 'INT_001', 'status': 'inactive'}
+
+    spool.replay(lambda collected: None)
+    assert not spool.pending()
+
+
+def test_replay_quarantines_permanent_failures(spool):
+    # Test that a segment rejected with a permanent error is moved aside and later segments still replay
+    for i in range(4):
+        spool.append({'intercom_logs': [{'timestamp': datetime(2024, 10, 10, 12, i), 'intercom_id': 'INT_001',
+                                         'status': 'inactive'}] * 3}, COLUMNS)
+    segment_count = len(spool.segments())
+    written = []
+
+    def write(collected):
+        if not written:
+            written.append(None)
+            raise ValueError("invalid input syntax for type integer")
+        written.append(collected)
+
+    spool.replay(write, quarantine_on=(ValueError,))
+    assert not spool.pending()
+    assert len(written) == segment_count
+    assert len(os.listdir(spool.quarantine_directory)) == 1
+
+
+def test_replay_streams_large_segments_and_resumes(tmp_path):
+    # Test that a segment is replayed in bounded sub-batches and an interrupted replay resumes after the last commit
+    spool = TelemetrySpool(str(tmp_path), fsync=False, replay_batch_rows=6)
+    for i in range(5):
+        spool.append({'intercom_logs': [{'timestamp': datetime(2024, 10, 10, 12, i), 'intercom_id': f"INT_{i:03}",
+                                         'status': 'active'}] * 3}, COLUMNS)
+    assert len(spool.segments()) == 1
+    written = []
+
+    def write(collected):
+        if len(written) == 1:
+            written.append(None)
+            raise ConnectionError("database down")
+        written.append(collected)
+
+    with pytest.raises(ConnectionError):
+        spool.replay(write)
+    assert [len(batch['intercom_logs']) for batch in written[:1]] == [6]
+
+    spool.replay(write)
+    replayed = [row['intercom_id'] for batch in written if batch for row in batch['intercom_logs']]
+    assert replayed == [f"INT_{i:03}" for i in range(5) for _ in range(3)]  # each row exactly once
+    assert not spool.pending()
+    assert os.listdir(tmp_path) == ['quarantine']